@@ -23,12 +23,48 @@ def create_app():
     app.config['SECRET_KEY'] = os.getenv('SECRET_KEY', 'a_very_secret_key')
     app.config['SQLALCHEMY_DATABASE_URI'] = os.getenv('DATABASE_URL', 'sqlite:///lms.db')
     app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-    app.config['MAIL_SERVER'] = 'smtp.gmail.com'
-    app.config['MAIL_PORT'] = 587
-    app.config['MAIL_USE_TLS'] = True
+    app.config['MAIL_SERVER'] = os.getenv('MAIL_SERVER', 'smtp.gmail.com')
+    app.config['MAIL_PORT'] = int(os.getenv('MAIL_PORT', 587))
+    app.config['MAIL_USE_TLS'] = os.getenv('MAIL_USE_TLS', 'true').lower() == 'true'
+    app.config['MAIL_DEFAULT_SENDER'] = os.getenv('MAIL_DEFAULT_SENDER', 'noreply@sus-lms.com')
     app.config['MAIL_USERNAME'] = os.environ.get('EMAIL_USER')
     app.config['MAIL_PASSWORD'] = os.environ.get('EMAIL_PASS')
-    app.config['MAIL_DEBUG'] = True
+    app.config['MAIL_BATCH_SIZE'] = int(os.getenv('MAIL_BATCH_SIZE', 100))  # messages per SMTP connection
+    app.config['MAIL_RATE_LIMIT'] = float(os.getenv('MAIL_RATE_LIMIT', 10))  # messages/second per worker process, 0 = unlimited
+    app.config['MAIL_MAX_ATTEMPTS'] = int(os.getenv('MAIL_MAX_ATTEMPTS', 5))
+    app.config['MAIL_RETRY_BACKOFF'] = float(os.getenv('MAIL_RETRY_BACKOFF', 30))  # seconds, doubled per attempt
+    app.config['MAIL_LEASE_SECONDS'] = int(os.getenv('MAIL_LEASE_SECONDS', 300))
+    app.config['MAIL_POLL_INTERVAL'] = float(os.getenv('MAIL_POLL_INTERVAL', 2))
+    app.config['MAIL_WORKER_THREADS'] = int(os.getenv('MAIL_WORKER_THREADS', 0))  # in-process delivery loops, 0 = use `flask mail worker`
+    # Outside static/ so videos are only reachable through the authenticated /course/<id>/video route
+    app.config['MEDIA_ROOT'] = os.getenv('MEDIA_ROOT', os.path.join(app.instance_path, 'media'))
+    app.config['MEDIA_MAX_AGE'] = int(os.getenv('MEDIA_MAX_AGE', 365 * 24 * 3600))
+    # '', 'x-accel-redirect' (nginx) or 'x-sendfile' (Apache mod_xsendfile / lighttpd)
+    app.config['MEDIA_SENDFILE'] = os.getenv('MEDIA_SENDFILE', '')
+    app.config['MEDIA_ACCEL_PREFIX'] = os.getenv('MEDIA_ACCEL_PREFIX', '/protected-media/')
+    app.config['USE_X_SENDFILE'] = app.config['MEDIA_SENDFILE'] == 'x-sendfile'
+    app.config['UPLOAD_CHUNK_SIZE'] = int(os.getenv('UPLOAD_CHUNK_SIZE', 8 * 1024 * 1024))
+    app.config['UPLOAD_MAX_SIZE'] = int(os.getenv('UPLOAD_MAX_SIZE', 20 * 1024 ** 3))
+    app.config['JOB_LEASE_SECONDS'] = int(os.getenv('JOB_LEASE_SECONDS', 6 * 3600))  # a running job older than this is retried
+    app.config['JOB_POLL_INTERVAL'] = float(os.getenv('JOB_POLL_INTERVAL', 5))
+    app.config['TRANSCRIBE_MODEL'] = os.getenv('WHISPER_MODEL', 'base')
+    app.config['TRANSCRIBE_WORKERS'] = int(os.getenv('TRANSCRIBE_WORKERS', 1))  # processes per video for long lectures
+    app.config['TRANSLATION_API_URL'] = os.getenv('TRANSLATION_API_URL', 'https://api.mymemory.translated.net/get')
+    app.config['TRANSLATION_TIMEOUT'] = float(os.getenv('TRANSLATION_TIMEOUT', 15))
+    app.config['TRANSLATION_MAX_BATCH_BYTES'] = int(os.getenv('TRANSLATION_MAX_BATCH_BYTES', 500))  # MyMemory's limit for q
+    app.config['TRANSLATION_CONCURRENCY'] = int(os.getenv('TRANSLATION_CONCURRENCY', 4))  # requests in flight per job
+    app.config['HLS_MAX_AGE'] = int(os.getenv('HLS_MAX_AGE', 24 * 3600))  # segments; playlists are revalidated
+    app.config['CACHE_URL'] = os.getenv('CACHE_URL')  # e.g. redis://localhost:6379/0, shared by all workers
+    app.config['USER_CACHE_TTL'] = int(os.getenv('USER_CACHE_TTL', 300))
+    app.config['USER_CACHE_SIZE'] = int(os.getenv('USER_CACHE_SIZE', 10000))
+    app.config['RAZORPAY_KEY_ID'] = os.getenv('RAZORPAY_KEY_ID')
+    app.config['RAZORPAY_KEY_SECRET'] = os.getenv('RAZORPAY_KEY_SECRET')
+    app.config['RAZORPAY_BASE_URL'] = os.getenv('RAZORPAY_BASE_URL', 'https://api.razorpay.com')
+    app.config['RAZORPAY_CONNECT_TIMEOUT'] = float(os.getenv('RAZORPAY_CONNECT_TIMEOUT', 3.05))
+    app.config['RAZORPAY_READ_TIMEOUT'] = float(os.getenv('RAZORPAY_READ_TIMEOUT', 10))
+    app.config['RAZORPAY_RETRIES'] = int(os.getenv('RAZORPAY_RETRIES', 3))
+    app.config['RAZORPAY_BACKOFF'] = float(os.getenv('RAZORPAY_BACKOFF', 0.3))
+    app.config['RAZORPAY_POOL_SIZE'] = int(os.getenv('RAZORPAY_POOL_SIZE', 10))
 
     # --- Initialize Extensions ---
     db.init_app(app)
@@ -39,21 +75,58 @@ def create_app():
     # --- Login Manager Setup ---
     login_manager.login_view = 'auth.login'
 
-    @login_manager.user_loader
-    def load_user(user_id):
-        # Import here to avoid circular import errors
-        from .models import User
-        return User.query.get(int(user_id))
+    # Import here to avoid circular import errors
+    from .user_cache import user_cache, load_user
+    user_cache.init_app(app)
+    login_manager.user_loader(load_user)
+
+    from .catalog import catalog_cache
+    catalog_cache.init_app(app)
+
+    from .entitlements import entitlement_cache
+    entitlement_cache.init_app(app)
+
+    from .subtitles import missing_cache
+    missing_cache.init_app(app)
+
+    from . import payments
+    payments.init_app(app)
+
+    from . import mailer
+    mailer.init_app(app)
+
+    # hls and transcription register their job handlers and attach hooks on import
+    from . import jobs, hls, transcription, translation
+    jobs.init_app(app)
+    translation.init_app(app)
 
     # --- Register Blueprints ---
     # Use a context to ensure the app is ready before importing routes
     with app.app_context():
-        from .routes import auth, student, teacher, admin
+        from .routes import auth, student, teacher, admin, video
 
         app.register_blueprint(auth.bp)
         app.register_blueprint(student.bp)
         app.register_blueprint(teacher.bp)
         app.register_blueprint(admin.bp)
+        app.register_blueprint(video.bp)
+
+    # --- Register CLI Commands ---
+    from . import rollups
+    app.cli.add_command(rollups.cli)
+    app.cli.add_command(mailer.cli)
+
+    from . import uploads
+    app.cli.add_command(uploads.cli)
+
+    from . import media
+    app.cli.add_command(media.cli)
+    app.cli.add_command(jobs.cli)
+    app.cli.add_command(hls.cli)
+    from . import subtitles
+    app.cli.add_command(subtitles.cli)
+    from . import search
+    app.cli.add_command(search.cli)
 
     return app
 
@@ -0,0 +1,93 @@
+"""
+Announcement read tracking.
+
+Each user has a watermark: every announcement with an id at or below it has
+been read. Announcements dismissed out of order are kept as sparse
+AnnouncementRead rows above the watermark, and are folded into the watermark
+as soon as the gap below them closes. Storage is therefore one row per user
+plus a handful of exceptions, rather than users x announcements.
+"""
+from sqlalchemy import func, select, exists
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import IntegrityError
+
+from app import db
+from app.models import Announcement, AnnouncementRead, AnnouncementWatermark
+
+
+def _watermark(user_id):
+    return (
+        select(func.coalesce(func.max(AnnouncementWatermark.read_up_to), 0))
+        .where(AnnouncementWatermark.user_id == user_id)
+        .scalar_subquery()
+    )
+
+
+def _unread_query(user_id):
+    read = exists().where(AnnouncementRead.user_id == user_id,
+                          AnnouncementRead.announcement_id == Announcement.id)
+    return Announcement.query.filter(Announcement.id > _watermark(user_id), ~read)
+
+
+def unread_announcements(user_id):
+    """Returns the user's unread announcements, newest first, in a single anti-join query."""
+    return _unread_query(user_id).order_by(Announcement.timestamp.desc()).all()
+
+
+def unread_count(user_id):
+    """Counts the user's unread announcements in a single query."""
+    return _unread_query(user_id).count()
+
+
+def _set_watermark(user_id, read_up_to):
+    """Raises the user's watermark to `read_up_to`, creating it if needed, safely against concurrent calls."""
+    dialect = db.session.get_bind().dialect.name
+    if dialect in ('sqlite', 'postgresql'):
+        insert = sqlite.insert if dialect == 'sqlite' else postgresql.insert
+        db.session.execute(insert(AnnouncementWatermark).values(user_id=user_id, read_up_to=0)
+                           .on_conflict_do_nothing())
+    elif db.session.get(AnnouncementWatermark, user_id) is None:
+        db.session.add(AnnouncementWatermark(user_id=user_id, read_up_to=0))
+        db.session.flush()
+    # A conditional UPDATE, so a slower request never moves the watermark back down
+    (AnnouncementWatermark.query
+     .filter(AnnouncementWatermark.user_id == user_id, AnnouncementWatermark.read_up_to < read_up_to)
+     .update({'read_up_to': read_up_to}, synchronize_session=False))
+    AnnouncementRead.query.filter(AnnouncementRead.user_id == user_id,
+                                  AnnouncementRead.announcement_id <= read_up_to).delete()
+
+
+def mark_read(user_id, announcement_id):
+    """
+    Marks one announcement as read and advances the watermark over any closed
+    gap. Returns False, storing nothing, if there is no such announcement.
+    """
+    watermark = db.session.get(AnnouncementWatermark, user_id)
+    current = watermark.read_up_to if watermark else 0
+    if announcement_id <= current:
+        return True
+    if db.session.get(Announcement, announcement_id) is None:
+        return False
+    if not AnnouncementRead.query.filter_by(user_id=user_id, announcement_id=announcement_id).first():
+        db.session.add(AnnouncementRead(user_id=user_id, announcement_id=announcement_id))
+        try:
+            db.session.flush()
+        except IntegrityError:
+            # Another request recorded the same read first
+            db.session.rollback()
+            return True
+    # The watermark can move up to just below the oldest announcement that is still unread
+    oldest_unread = _unread_query(user_id).with_entities(func.min(Announcement.id)).scalar()
+    if oldest_unread is None:
+        oldest_unread = (db.session.query(func.max(Announcement.id)).scalar() or 0) + 1
+    if oldest_unread - 1 > current:
+        _set_watermark(user_id, oldest_unread - 1)
+    db.session.commit()
+    return True
+
+
+def mark_all_read(user_id):
+    """Marks every current announcement as read by moving the watermark to the newest one."""
+    newest = db.session.query(func.max(Announcement.id)).scalar() or 0
+    _set_watermark(user_id, newest)
+    db.session.commit()
@@ -0,0 +1,121 @@
+"""
+Small caching layer shared by the hot read paths.
+
+Each `Cache` is a namespace with a bounded size and a TTL. By default entries
+live in a per-process LRU; when `CACHE_URL` points at a Redis server the
+namespace is stored there instead, so every gunicorn worker sees the same
+entries and the same invalidations. Values must be JSON-serialisable.
+"""
+import json
+import threading
+import time
+from collections import OrderedDict
+
+try:
+    import redis
+except ImportError:  # optional: only needed when CACHE_URL is set
+    redis = None
+
+
+class LocalBackend:
+    """Thread-safe, size-bounded LRU with per-entry expiry."""
+
+    def __init__(self, maxsize, ttl):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            expires, value = entry
+            if expires < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl=None):
+        with self._lock:
+            self._data[key] = (time.monotonic() + (ttl or self.ttl), value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+class RedisBackend:
+    """Shared backend; Redis enforces the TTL and its own memory bound."""
+
+    def __init__(self, url, namespace, ttl):
+        if redis is None:
+            raise RuntimeError('CACHE_URL is set but the "redis" package is not installed.')
+        self.client = redis.Redis.from_url(url)
+        self.prefix = f'lms:{namespace}:'
+        self.ttl = ttl
+
+    def get(self, key):
+        raw = self.client.get(self.prefix + str(key))
+        return json.loads(raw) if raw is not None else None
+
+    def set(self, key, value, ttl=None):
+        self.client.set(self.prefix + str(key), json.dumps(value), ex=ttl or self.ttl)
+
+    def delete(self, key):
+        self.client.delete(self.prefix + str(key))
+
+    def clear(self):
+        for key in self.client.scan_iter(self.prefix + '*'):
+            self.client.delete(key)
+
+
+class Cache:
+    """
+    A named cache configured from the app: `<NAMESPACE>_CACHE_TTL` (seconds),
+    `<NAMESPACE>_CACHE_SIZE` (entries, local backend only) and `CACHE_URL`.
+    """
+
+    def __init__(self, namespace, ttl=300, maxsize=10000):
+        self.namespace = namespace
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self.backend = LocalBackend(maxsize, ttl)
+        self.hits = 0
+        self.misses = 0
+
+    def init_app(self, app):
+        prefix = self.namespace.upper()
+        self.ttl = int(app.config.get(f'{prefix}_CACHE_TTL', self.ttl))
+        self.maxsize = int(app.config.get(f'{prefix}_CACHE_SIZE', self.maxsize))
+        url = app.config.get('CACHE_URL')
+        if url:
+            self.backend = RedisBackend(url, self.namespace, self.ttl)
+        else:
+            self.backend = LocalBackend(self.maxsize, self.ttl)
+
+    def get(self, key):
+        value = self.backend.get(str(key))
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    def set(self, key, value, ttl=None):
+        self.backend.set(str(key), value, ttl)
+
+    def delete(self, key):
+        self.backend.delete(str(key))
+
+    def clear(self):
+        self.backend.clear()
@@ -0,0 +1,55 @@
+"""
+Versioned course-catalog cache.
+
+The full catalog (one small dict per course) is cached under its version
+number. Every request reads the current version from the cache_version table,
+a single primary-key lookup, and reuses the cached catalog for that version.
+Creating, editing or deleting a course bumps the version in the same
+transaction, so every worker picks up the change on its next request.
+"""
+from sqlalchemy.orm import joinedload
+
+from app import db
+from app.cache import Cache
+from app.models import Course, CacheVersion
+
+CATALOG = 'catalog'
+
+catalog_cache = Cache('catalog', ttl=3600, maxsize=4)
+
+
+def current_version():
+    return db.session.query(CacheVersion.version).filter_by(name=CATALOG).scalar() or 0
+
+
+def bump_version():
+    """Invalidates the catalog for all workers once the caller's transaction commits."""
+    updated = CacheVersion.query.filter_by(name=CATALOG).update({CacheVersion.version: CacheVersion.version + 1})
+    if not updated:
+        db.session.add(CacheVersion(name=CATALOG, version=1))
+
+
+def describe(c):
+    """A course as it appears in the catalog (and in search results)."""
+    return {'id': c.id, 'title': c.title, 'description': c.description, 'price': c.price,
+            'teacher_id': c.teacher_id, 'teacher_name': c.teacher.username if c.teacher else None}
+
+
+def _load_catalog():
+    courses = Course.query.options(joinedload(Course.teacher)).order_by(Course.id).all()
+    return [describe(c) for c in courses]
+
+
+def get_catalog():
+    """Returns every course as a dict, from the cache for the current catalog version."""
+    key = f'v{current_version()}'
+    courses = catalog_cache.get(key)
+    if courses is None:
+        courses = _load_catalog()
+        catalog_cache.set(key, courses)
+    return courses
+
+
+def available_courses(owned_course_ids):
+    """The catalog minus the courses a student already owns, computed in memory."""
+    return [c for c in get_catalog() if c['id'] not in owned_course_ids]
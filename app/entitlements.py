@@ -0,0 +1,58 @@
+"""
+Per-user entitlement sets: which courses a user owns.
+
+The owned course ids are loaded once per user with a single indexed query and
+cached as a sorted list, so access checks are a binary search instead of a
+relationship load. Purchases are never revoked, so a cached hit is always
+authoritative; a miss is double-checked against the database (one lookup on
+uq_purchase_student_course) because another worker may have recorded the
+purchase after this cache entry was filled.
+"""
+from bisect import bisect_left, insort
+
+from app import db
+from app.cache import Cache
+from app.models import Purchase
+
+entitlement_cache = Cache('entitlement', ttl=3600, maxsize=50000)
+
+
+def owned_course_ids(user_id):
+    """Returns the sorted list of course ids the user owns."""
+    owned = entitlement_cache.get(user_id)
+    if owned is None:
+        owned = sorted(course_id for (course_id,) in
+                       db.session.query(Purchase.course_id).filter(Purchase.student_id == user_id))
+        remember(user_id, owned)
+    return owned
+
+
+def remember(user_id, course_ids):
+    """Replaces the cached entitlement set with a freshly loaded one."""
+    entitlement_cache.set(user_id, sorted(course_ids))
+
+
+def _contains(owned, course_id):
+    i = bisect_left(owned, course_id)
+    return i < len(owned) and owned[i] == course_id
+
+
+def has_course(user_id, course_id):
+    """True if the user owns the course."""
+    if _contains(owned_course_ids(user_id), course_id):
+        return True
+    owned = db.session.query(
+        Purchase.query.filter_by(student_id=user_id, course_id=course_id).exists()
+    ).scalar()
+    if owned:
+        grant(user_id, course_id)
+    return owned
+
+
+def grant(user_id, course_id):
+    """Adds a committed purchase to the user's cached entitlement set, if one is cached."""
+    owned = entitlement_cache.get(user_id)
+    if owned is not None and not _contains(owned, course_id):
+        owned = list(owned)
+        insort(owned, course_id)
+        entitlement_cache.set(user_id, owned)
@@ -0,0 +1,153 @@
+"""
+Adaptive-bitrate HLS packaging for stored videos.
+
+Attaching a video to a course queues an 'hls' job keyed by the blob's hash
+(so a video shared by several courses is packaged once). The job transcodes
+the source into every rendition of the ladder at or below its own height,
+running one ffmpeg per rendition in parallel with the cores split between
+them, then writes a master playlist. Output goes to the blob's derived
+directory and is swapped into place only when every rendition succeeded.
+A failed packaging is queued again when the video is attached again, or for
+every failed video by `flask hls retry`.
+"""
+import json
+import os
+import shutil
+import subprocess
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import click
+from flask.cli import AppGroup
+
+from app import db, jobs, media
+from app.models import MediaBlob
+
+cli = AppGroup('hls', help='Manage adaptive streaming packages.')
+
+# (height, video kbit/s, audio kbit/s), highest first
+LADDER = [
+    (1080, 5000, 192),
+    (720, 2800, 128),
+    (480, 1400, 128),
+    (360, 800, 96),
+]
+SEGMENT_SECONDS = 6
+
+
+def hls_dir(sha256):
+    return os.path.join(media.derived_dir(sha256), 'hls')
+
+
+def probe(source):
+    """Returns (width, height, has_audio) for the first video stream of `source`."""
+    out = subprocess.run(
+        ['ffprobe', '-v', 'error', '-show_entries', 'stream=codec_type,width,height', '-of', 'json', source],
+        check=True, capture_output=True, text=True,
+    ).stdout
+    streams = json.loads(out).get('streams', [])
+    video = next((s for s in streams if s.get('codec_type') == 'video'), None)
+    if video is None:
+        raise ValueError('no video stream')
+    has_audio = any(s.get('codec_type') == 'audio' for s in streams)
+    return int(video['width']), int(video['height']), has_audio
+
+
+def ladder_for(height):
+    """Renditions no taller than the source; a small source still gets its own size."""
+    rungs = [r for r in LADDER if r[0] <= height]
+    return rungs or [(height - height % 2, LADDER[-1][1], LADDER[-1][2])]
+
+
+def _transcode(source, out_dir, rung, threads, has_audio):
+    height, video_kbps, audio_kbps = rung
+    rendition_dir = os.path.join(out_dir, f'{height}p')
+    os.makedirs(rendition_dir)
+    command = [
+        'ffmpeg', '-nostdin', '-v', 'error', '-y', '-i', source,
+        '-map', '0:v:0', '-vf', f'scale=-2:{height}',
+        '-c:v', 'libx264', '-preset', 'veryfast', '-profile:v', 'main',
+        '-b:v', f'{video_kbps}k', '-maxrate', f'{int(video_kbps * 1.07)}k', '-bufsize', f'{video_kbps * 2}k',
+        # Keyframe on every segment boundary regardless of frame rate, so renditions switch cleanly
+        '-force_key_frames', f'expr:gte(t,n_forced*{SEGMENT_SECONDS})', '-sc_threshold', '0',
+        '-threads', str(threads),
+    ]
+    if has_audio:
+        command += ['-map', '0:a:0', '-c:a', 'aac', '-b:a', f'{audio_kbps}k', '-ac', '2']
+    command += [
+        '-f', 'hls', '-hls_time', str(SEGMENT_SECONDS), '-hls_playlist_type', 'vod',
+        '-hls_segment_filename', os.path.join(rendition_dir, 'seg_%05d.ts'),
+        os.path.join(rendition_dir, 'index.m3u8'),
+    ]
+    result = subprocess.run(command, capture_output=True)
+    if result.returncode:
+        raise RuntimeError(f'ffmpeg failed for {height}p: {result.stderr.decode(errors="replace")[-500:]}')
+
+
+def package(source, dest):
+    """Writes the HLS package for `source` to `dest` and returns the rendition heights."""
+    width, height, has_audio = probe(source)
+    rungs = ladder_for(height)
+    cores = os.cpu_count() or 1
+    workers = min(len(rungs), cores)
+    threads = max(1, cores // workers)
+    staging = f'{dest}.tmp-{uuid.uuid4().hex[:8]}'
+    os.makedirs(staging)
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            # list() re-raises the first ffmpeg failure
+            list(pool.map(lambda rung: _transcode(source, staging, rung, threads, has_audio), rungs))
+        lines = ['#EXTM3U', '#EXT-X-VERSION:3']
+        for rung_height, video_kbps, audio_kbps in rungs:
+            rung_width = round(width * rung_height / height / 2) * 2
+            bandwidth = int((video_kbps * 1.07 + (audio_kbps if has_audio else 0)) * 1000)
+            lines.append(f'#EXT-X-STREAM-INF:BANDWIDTH={bandwidth},RESOLUTION={rung_width}x{rung_height}')
+            lines.append(f'{rung_height}p/index.m3u8')
+        with open(os.path.join(staging, 'master.m3u8'), 'w') as f:
+            f.write('\n'.join(lines) + '\n')
+        if os.path.isdir(dest):
+            shutil.rmtree(dest)
+        os.replace(staging, dest)
+    except BaseException:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+    return [rung[0] for rung in rungs]
+
+
+@media.on_attach
+def request_packaging(blob):
+    """Queues packaging the first time a blob is attached to a course, or again after it failed."""
+    if blob.hls_status in (None, 'failed'):
+        blob.hls_status = 'pending'
+        jobs.enqueue('hls', blob.sha256)
+
+
+@jobs.handler('hls')
+def package_job(job):
+    blob = db.session.get(MediaBlob, job.key)
+    if blob is None:
+        return  # garbage-collected since it was queued
+    blob.hls_status = 'processing'
+    db.session.commit()
+    try:
+        heights = package(media.blob_path(blob.sha256, blob.ext), hls_dir(blob.sha256))
+    except Exception:
+        db.session.rollback()
+        blob.hls_status = 'failed'
+        db.session.commit()
+        raise
+    blob.hls_status = 'ready'
+    blob.hls_renditions = ','.join(str(h) for h in heights)
+    db.session.commit()
+
+
+@cli.command('retry')
+def retry_command():
+    """Queue packaging again for stored videos whose packaging failed."""
+    queued = 0
+    for blob in MediaBlob.query.filter(MediaBlob.hls_status == 'failed', MediaBlob.refcount > 0):
+        blob.hls_status = 'pending'
+        jobs.enqueue('hls', blob.sha256)
+        queued += 1
+    db.session.commit()
+    click.echo(f'Queued {queued} video(s); run `flask jobs worker --kind hls` to process them.')
@@ -0,0 +1,189 @@
+"""
+Generic background jobs.
+
+Modules register a handler per job kind with `@handler('kind')`; routes call
+`enqueue(kind, key)` and return. A Job row is unique on (kind, key), so asking
+for the same work again while it is queued or running is a no-op, and asking
+after it failed queues it once more. `flask jobs worker` claims queued jobs,
+runs their handlers and records timings, errors and any summary the handler
+returns on the row. A job whose worker died is picked up again once
+JOB_LEASE_SECONDS have passed.
+"""
+import json
+import os
+import socket
+import threading
+import uuid
+from datetime import datetime, timedelta
+
+import click
+from flask import current_app
+from flask.cli import AppGroup
+from sqlalchemy import and_, func, or_
+from sqlalchemy.dialects import postgresql, sqlite
+
+from app import db, metrics
+from app.models import Job
+
+cli = AppGroup('jobs', help='Run background jobs.')
+
+HANDLERS = {}
+
+_wakeup = threading.Event()
+
+
+def handler(kind):
+    """
+    Registers the decorated function as the runner for `kind`. It receives the
+    Job and may return a JSON-serialisable summary to store in Job.result.
+    """
+    def register(fn):
+        HANDLERS[kind] = fn
+        return fn
+    return register
+
+
+def init_app(app):
+    metrics.gauge('jobs.queued', lambda: Job.query.filter_by(state='queued').count())
+    metrics.gauge('jobs.running', lambda: Job.query.filter_by(state='running').count())
+    metrics.gauge('jobs.failed', lambda: Job.query.filter_by(state='failed').count())
+
+
+def enqueue(kind, key, force=False):
+    """
+    Queues `kind` work for `key` unless it is already queued or running (or,
+    without `force`, already done). Returns the Job; the caller commits.
+    """
+    now = datetime.utcnow()
+    dialect = db.session.get_bind().dialect.name
+    if dialect in ('sqlite', 'postgresql'):
+        insert = sqlite.insert if dialect == 'sqlite' else postgresql.insert
+        db.session.execute(insert(Job).values(kind=kind, key=key, state='queued', attempts=0, created_at=now)
+                           .on_conflict_do_nothing())
+    elif Job.query.filter_by(kind=kind, key=key).first() is None:
+        db.session.add(Job(kind=kind, key=key, state='queued', attempts=0, created_at=now))
+        db.session.flush()
+    rerun = ['failed', 'done'] if force else ['failed']
+    (Job.query.filter(Job.kind == kind, Job.key == key, Job.state.in_(rerun))
+     .update({'state': 'queued', 'error': None, 'result': None, 'created_at': now, 'started_at': None,
+              'finished_at': None},
+             synchronize_session=False))
+    return Job.query.filter_by(kind=kind, key=key).populate_existing().one()
+
+
+def notify():
+    """Wakes idle worker loops in this process after jobs are committed."""
+    _wakeup.set()
+
+
+def claim(kinds=None):
+    """Marks the oldest runnable job of `kinds` as running for this worker and returns it."""
+    now = datetime.utcnow()
+    lease = timedelta(seconds=current_app.config['JOB_LEASE_SECONDS'])
+    runnable = or_(Job.state == 'queued', and_(Job.state == 'running', Job.started_at < now - lease))
+    kinds = list(kinds or HANDLERS)
+    candidates = [job_id for (job_id,) in (
+        db.session.query(Job.id).filter(runnable, Job.kind.in_(kinds))
+        .order_by(Job.id).limit(5)
+        .with_for_update(skip_locked=True)
+    )]
+    token = f'{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:12]}'
+    for job_id in candidates:
+        claimed = (Job.query.filter(Job.id == job_id, runnable)
+                   .update({'state': 'running', 'claimed_by': token, 'started_at': now,
+                            'attempts': Job.attempts + 1}, synchronize_session=False))
+        db.session.commit()
+        if claimed:
+            return db.session.get(Job, job_id)
+    db.session.rollback()
+    return None
+
+
+def run(job):
+    """Runs a claimed job's handler and records the outcome."""
+    fn = HANDLERS[job.kind]
+    try:
+        with metrics.timed(f'jobs.{job.kind}'):
+            result = fn(job)
+    except Exception as e:
+        db.session.rollback()
+        current_app.logger.exception('Job %s %s:%s failed', job.id, job.kind, job.key)
+        job.state = 'failed'
+        job.error = f'{type(e).__name__}: {e}'[:2000]
+        metrics.incr(f'jobs.{job.kind}.failed')
+    else:
+        job.state = 'done'
+        job.error = None
+        job.result = json.dumps(result) if result is not None else None
+    job.finished_at = datetime.utcnow()
+    job.claimed_by = None
+    db.session.commit()
+    return job.state == 'done'
+
+
+def run_worker(app, kinds=None, threads=1, once=False):
+    """
+    Runs `threads` job loops in the foreground. With `once`, each loop exits
+    when nothing is runnable. Returns the number of jobs that succeeded.
+    """
+    stop = threading.Event()
+    totals = []
+
+    def loop():
+        done = 0
+        with app.app_context():
+            try:
+                while not stop.is_set():
+                    try:
+                        job = claim(kinds)
+                        if job is not None:
+                            done += run(job)
+                            continue
+                    except Exception:
+                        app.logger.exception('Job worker loop failed; retrying shortly')
+                        db.session.rollback()
+                    if once:
+                        break
+                    if _wakeup.wait(app.config['JOB_POLL_INTERVAL']):
+                        _wakeup.clear()
+            finally:
+                db.session.remove()
+                totals.append(done)
+
+    workers = [threading.Thread(target=loop, name=f'job-worker-{i}', daemon=True) for i in range(threads)]
+    for worker in workers:
+        worker.start()
+    try:
+        for worker in workers:
+            while worker.is_alive():
+                worker.join(0.5)
+    except KeyboardInterrupt:
+        stop.set()
+        _wakeup.set()
+        for worker in workers:
+            worker.join()
+    return sum(totals)
+
+
+@cli.command('worker')
+@click.option('--kind', 'kinds', multiple=True, help='Only run these job kinds (repeatable).')
+@click.option('--threads', default=1, show_default=True, help='Jobs to run at once.')
+@click.option('--once', is_flag=True, help='Exit when no job is runnable.')
+def worker_command(kinds, threads, once):
+    """Run queued jobs until interrupted."""
+    unknown = set(kinds) - set(HANDLERS)
+    if unknown:
+        raise click.BadParameter(f"unknown kind(s): {', '.join(sorted(unknown))}", param_hint='--kind')
+    app = current_app._get_current_object()
+    done = run_worker(app, kinds=kinds or None, threads=threads, once=once)
+    click.echo(f'Completed {done} job(s).')
+
+
+@cli.command('status')
+def status_command():
+    """Show job counts by kind and state, and recent failures."""
+    rows = db.session.query(Job.kind, Job.state, func.count(Job.id)).group_by(Job.kind, Job.state).order_by(Job.kind)
+    for kind, state, count in rows:
+        click.echo(f'{kind:12} {state:8} {count}')
+    for job in Job.query.filter_by(state='failed').order_by(Job.finished_at.desc()).limit(10):
+        click.echo(f'failed {job.kind}:{job.key}: {job.error}')
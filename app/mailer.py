@@ -0,0 +1,366 @@
+"""
+Durable outbound mail queue.
+
+Routes never talk to the SMTP server: they add MailJob rows in the same
+transaction as the change that caused them (a live-class fan-out is a single
+INSERT ... SELECT over the course's purchases) and return. `flask mail worker`
+claims due jobs in batches under a lease, sends each batch over one SMTP
+connection, paces itself with a token bucket and reschedules failures with
+exponential backoff. Jobs leased by a worker that died are picked up again
+once the lease expires. Small deployments can instead set
+MAIL_WORKER_THREADS to run a bounded number of delivery loops inside each web
+process.
+"""
+import os
+import smtplib
+import socket
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+
+import click
+from flask import current_app, render_template
+from flask.cli import AppGroup
+from flask_mail import Message
+from sqlalchemy import and_, func, insert, literal, or_, select
+from sqlalchemy.orm import joinedload
+
+from app import db, mail, metrics
+from app.models import LiveClass, MailJob, Purchase, User
+
+cli = AppGroup('mail', help='Deliver queued email.')
+
+# Set after jobs are committed so idle delivery loops in this process wake at once
+_wakeup = threading.Event()
+_start_lock = threading.Lock()
+
+# The session is unusable after these; everything else is a problem with one message
+CONNECTION_ERRORS = (smtplib.SMTPServerDisconnected, smtplib.SMTPConnectError,
+                     smtplib.SMTPHeloError, smtplib.SMTPAuthenticationError, ConnectionError, socket.timeout)
+
+
+class TokenBucket:
+    """Allows `rate` operations per second on average, in bursts of up to `burst`."""
+
+    def __init__(self, rate, burst=None):
+        self.rate = rate
+        self.capacity = burst or max(1.0, rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        if not self.rate:
+            return
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+def init_app(app):
+    metrics.gauge('mail.queued', lambda: MailJob.query.filter_by(status='queued').count())
+    metrics.gauge('mail.failed', lambda: MailJob.query.filter_by(status='failed').count())
+    metrics.gauge('mail.oldest_queued_seconds', _oldest_queued_age)
+
+
+def _oldest_queued_age():
+    oldest = db.session.query(func.min(MailJob.created_at)).filter(MailJob.status == 'queued').scalar()
+    return (datetime.utcnow() - oldest).total_seconds() if oldest else 0
+
+
+# --- Enqueueing ---
+
+def enqueue(recipient, subject, body, kind='transactional', user_id=None):
+    """
+    Queues a pre-rendered plain-text email. The caller commits, then calls
+    `notify()`; nothing touches the SMTP server on the request thread.
+    """
+    job = MailJob(kind=kind, recipient=recipient, user_id=user_id, subject=subject, body=body)
+    db.session.add(job)
+    return job
+
+
+def enqueue_live_class(live_class, course):
+    """
+    Queues a notification for every student enrolled in `course`. Runs inside
+    the caller's transaction, so the jobs exist if and only if the class does.
+    Returns the number of jobs queued.
+    """
+    db.session.flush()
+    now = datetime.utcnow()
+    students = (
+        select(literal('live_class'), User.email, User.id, literal(live_class.id),
+               literal(f'Live Class Scheduled: {course.title}'), literal('queued'), literal(0),
+               literal(now), literal(now))
+        .join(Purchase, Purchase.student_id == User.id)
+        .where(Purchase.course_id == course.id)
+    )
+    result = db.session.execute(insert(MailJob).from_select(
+        ['kind', 'recipient', 'user_id', 'live_class_id', 'subject', 'status', 'attempts',
+         'next_attempt_at', 'created_at'],
+        students))
+    return result.rowcount
+
+
+def delivery_progress(live_class_id):
+    """Returns job counts by status for one live class's notifications."""
+    counts = dict(
+        db.session.query(MailJob.status, func.count(MailJob.id))
+        .filter(MailJob.live_class_id == live_class_id)
+        .group_by(MailJob.status)
+    )
+    progress = {status: counts.get(status, 0) for status in ('queued', 'sending', 'sent', 'failed')}
+    progress['total'] = sum(counts.values())
+    return progress
+
+
+# --- Delivery ---
+
+def _due(now):
+    lease = timedelta(seconds=current_app.config['MAIL_LEASE_SECONDS'])
+    return or_(
+        and_(MailJob.status == 'queued', MailJob.next_attempt_at <= now),
+        and_(MailJob.status == 'sending', MailJob.claimed_at < now - lease),
+    )
+
+
+def claim_batch(limit):
+    """
+    Leases up to `limit` due jobs to the caller and returns them. The
+    conditional UPDATE guarantees two workers never hold the same job.
+    """
+    now = datetime.utcnow()
+    token = f'{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:12]}'
+    ids = [job_id for (job_id,) in (
+        db.session.query(MailJob.id).filter(_due(now))
+        .order_by(MailJob.id).limit(limit)
+        .with_for_update(skip_locked=True)
+    )]
+    if not ids:
+        db.session.rollback()
+        return []
+    (db.session.query(MailJob)
+     .filter(MailJob.id.in_(ids), _due(now))
+     .update({'status': 'sending', 'claimed_by': token, 'claimed_at': now}, synchronize_session=False))
+    db.session.commit()
+    return MailJob.query.filter_by(claimed_by=token, status='sending').order_by(MailJob.id).all()
+
+
+def renew_lease(token):
+    """Restarts the lease on the jobs `token` still holds and returns their ids."""
+    (db.session.query(MailJob)
+     .filter_by(claimed_by=token, status='sending')
+     .update({'claimed_at': datetime.utcnow()}, synchronize_session=False))
+    held = {job_id for (job_id,) in db.session.query(MailJob.id).filter_by(claimed_by=token, status='sending')}
+    db.session.commit()
+    return held
+
+
+def build_message(job, live_classes, users):
+    """Turns a job into a Flask-Mail message, rendering live-class notifications on demand."""
+    msg = Message(job.subject, recipients=[job.recipient])
+    if job.kind == 'live_class':
+        live_class = live_classes[job.live_class_id]
+        msg.html = render_template(
+            'email/live_class_notification.html',
+            user=users[job.user_id],
+            course=live_class.course,
+            live_class=live_class,
+        )
+    else:
+        msg.body = job.body
+    return msg
+
+
+def build_messages(jobs):
+    """
+    Returns {job id: message, or the exception raised building it}. The batch's
+    live classes and students are loaded with one query each, and everything
+    is rendered before the first per-job commit expires them.
+    """
+    live_class_ids = {job.live_class_id for job in jobs if job.live_class_id}
+    user_ids = {job.user_id for job in jobs if job.user_id}
+    live_classes = {lc.id: lc for lc in LiveClass.query.options(joinedload(LiveClass.course))
+                    .filter(LiveClass.id.in_(live_class_ids))} if live_class_ids else {}
+    users = {user.id: user for user in User.query.filter(User.id.in_(user_ids))} if user_ids else {}
+    messages = {}
+    for job in jobs:
+        try:
+            messages[job.id] = build_message(job, live_classes, users)
+        except Exception as e:
+            messages[job.id] = e
+    return messages
+
+
+def _is_permanent(error):
+    if isinstance(error, smtplib.SMTPRecipientsRefused):
+        return all(code >= 500 for code, _ in error.recipients.values())
+    return isinstance(error, smtplib.SMTPResponseException) and error.smtp_code >= 500
+
+
+def _reschedule(job, error, count_attempt=True):
+    config = current_app.config
+    if count_attempt:
+        job.attempts += 1
+    job.last_error = f'{type(error).__name__}: {error}'[:1000]
+    job.claimed_by = job.claimed_at = None
+    if count_attempt and (_is_permanent(error) or job.attempts >= config['MAIL_MAX_ATTEMPTS']):
+        job.status = 'failed'
+        metrics.incr('mail.failed')
+    else:
+        metrics.incr('mail.retried')
+        job.status = 'queued'
+        delay = config['MAIL_RETRY_BACKOFF'] * 2 ** max(job.attempts - 1, 0)
+        job.next_attempt_at = datetime.utcnow() + timedelta(seconds=delay)
+
+
+def deliver(jobs, bucket=None):
+    """
+    Sends claimed jobs over a single SMTP connection, committing each result
+    as it goes so a crash re-sends at most one message. The lease is renewed
+    every half lease, since the rate limit can stretch a batch past it. If the
+    connection drops, the rest of the batch is released for a later attempt.
+    Returns the number of messages sent.
+    """
+    messages = build_messages(jobs)
+    pending = list(jobs)
+    token = jobs[0].claimed_by if jobs else None
+    lease = current_app.config['MAIL_LEASE_SECONDS']
+    renewed = time.monotonic()
+    sent = 0
+    in_flight = None
+    try:
+        with mail.connect() as conn:
+            while pending:
+                if time.monotonic() - renewed > lease / 2:
+                    # Jobs another worker took over after a lapsed lease are its to send now
+                    held = renew_lease(token)
+                    pending = [job for job in pending if job.id in held]
+                    renewed = time.monotonic()
+                    continue
+                job = in_flight = pending[0]
+                if bucket is not None:
+                    bucket.acquire()
+                try:
+                    message = messages[job.id]
+                    if isinstance(message, Exception):
+                        raise message
+                    with metrics.timed('mail.send'):
+                        conn.send(message)
+                except CONNECTION_ERRORS:
+                    raise
+                except Exception as e:
+                    _reschedule(job, e)
+                else:
+                    job.status = 'sent'
+                    job.sent_at = datetime.utcnow()
+                    job.claimed_by = None
+                    job.last_error = None
+                    job.body = None  # may hold a reset link; not needed once delivered
+                    metrics.incr('mail.sent')
+                    metrics.observe('mail.queue_delay', (job.sent_at - job.created_at).total_seconds())
+                    sent += 1
+                pending.pop(0)
+                db.session.commit()
+                in_flight = None
+    except CONNECTION_ERRORS as e:
+        current_app.logger.warning('SMTP connection failed, releasing %d job(s): %s', len(pending), e)
+        # Only the message being sent when the connection died counts as an attempt
+        for job in pending:
+            _reschedule(job, e, count_attempt=job is in_flight)
+        db.session.commit()
+    return sent
+
+
+def _start_loops(app, threads, once, stop):
+    """Starts `threads` delivery loops sharing one rate limit; returns (threads, per-loop totals)."""
+    config = app.config
+    bucket = TokenBucket(config['MAIL_RATE_LIMIT'])
+    totals = []
+
+    def loop():
+        sent = 0
+        with app.app_context():
+            try:
+                while not stop.is_set():
+                    try:
+                        jobs = claim_batch(config['MAIL_BATCH_SIZE'])
+                        if jobs:
+                            sent += deliver(jobs, bucket)
+                            continue
+                    except Exception:
+                        app.logger.exception('Mail worker loop failed; retrying shortly')
+                        db.session.rollback()
+                    if once:
+                        break
+                    if _wakeup.wait(config['MAIL_POLL_INTERVAL']):
+                        _wakeup.clear()
+            finally:
+                db.session.remove()
+                totals.append(sent)
+
+    workers = [threading.Thread(target=loop, name=f'mail-worker-{i}', daemon=True) for i in range(threads)]
+    for worker in workers:
+        worker.start()
+    return workers, totals
+
+
+def run_worker(app, threads=1, once=False):
+    """
+    Runs `threads` delivery loops in the foreground. With `once`, each loop
+    exits when nothing is due; otherwise they poll until interrupted.
+    Returns the number of messages sent.
+    """
+    stop = threading.Event()
+    workers, totals = _start_loops(app, threads, once, stop)
+    try:
+        for worker in workers:
+            while worker.is_alive():
+                worker.join(0.5)
+    except KeyboardInterrupt:
+        stop.set()
+        _wakeup.set()
+        for worker in workers:
+            worker.join()
+    return sum(totals)
+
+
+def notify():
+    """
+    Tells delivery loops that new jobs were committed. When MAIL_WORKER_THREADS
+    is set, the first call in a web process also starts its in-process loops,
+    so commands like `flask db upgrade` never spawn them.
+    """
+    app = current_app._get_current_object()
+    threads = app.config['MAIL_WORKER_THREADS']
+    if threads and not app.extensions.get('mail_workers'):
+        with _start_lock:
+            if not app.extensions.get('mail_workers'):
+                app.extensions['mail_workers'], _ = _start_loops(app, threads, False, threading.Event())
+    _wakeup.set()
+
+
+@cli.command('worker')
+@click.option('--threads', default=1, show_default=True, help='Concurrent SMTP connections.')
+@click.option('--once', is_flag=True, help='Exit when the queue has no due jobs.')
+def worker_command(threads, once):
+    """Deliver queued mail until interrupted."""
+    app = current_app._get_current_object()
+    sent = run_worker(app, threads=threads, once=once)
+    click.echo(f'Sent {sent} message(s).')
+
+
+@cli.command('status')
+def status_command():
+    """Show the number of queued, in-flight, sent and failed jobs."""
+    counts = dict(db.session.query(MailJob.status, func.count(MailJob.id)).group_by(MailJob.status))
+    for status in ('queued', 'sending', 'sent', 'failed'):
+        click.echo(f'{status:8} {counts.get(status, 0)}')
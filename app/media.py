@@ -0,0 +1,293 @@
+"""
+Content-addressed media storage.
+
+Each video is stored once, at MEDIA_ROOT/<first two hex digits>/<sha256><ext>,
+and tracked by a MediaBlob row whose refcount is the number of courses using
+it. Uploading bytes that are already stored writes nothing new, and because a
+blob's basename is its hash, everything derived from it (subtitles, audio,
+renditions) is keyed by the hash too and reused across courses.
+`flask media gc` deletes unreferenced blobs, their derived files and any
+orphaned files left by interrupted uploads.
+"""
+import hashlib
+import mimetypes
+import os
+import shutil
+import time
+import uuid
+
+import click
+from flask import abort, current_app, request, send_file
+from flask.cli import AppGroup
+from sqlalchemy.dialects import postgresql, sqlite
+from werkzeug.security import safe_join
+from werkzeug.utils import secure_filename
+
+from app import db
+from app.models import Course, MediaBlob, SubtitleTrack, UploadSession
+
+cli = AppGroup('media', help='Manage the content-addressed media store.')
+
+READ_SIZE = 1 << 20
+# Called with the blob whenever a course starts using it, e.g. to queue derived work
+ATTACH_HOOKS = []
+# Files younger than this may belong to an upload that has not committed yet
+ORPHAN_GRACE_SECONDS = 3600
+
+
+def media_root():
+    return current_app.config['MEDIA_ROOT']
+
+
+def incoming_path(name):
+    """Scratch location for a file being received; on the same filesystem as the store."""
+    return os.path.join(media_root(), '.incoming', name)
+
+
+def blob_path(sha256, ext=''):
+    return os.path.join(media_root(), sha256[:2], sha256 + ext)
+
+
+def derived_dir(sha256):
+    """Directory for files generated from a blob (renditions, audio, ...)."""
+    return os.path.join(media_root(), sha256[:2], sha256 + '.d')
+
+
+def subtitles_dir():
+    """Where caption files live, named <key>.vtt, <key>.json and <key>.<lang>.vtt."""
+    return os.path.join(current_app.root_path, 'static', 'subtitles')
+
+
+def subtitle_paths(sha256):
+    subtitles = subtitles_dir()
+    return [os.path.join(subtitles, name) for name in os.listdir(subtitles)
+            if name.split('.', 1)[0] == sha256] if os.path.isdir(subtitles) else []
+
+
+def blob_url(blob):
+    """The blob's path within the store, as recorded in Course.video_url (served by video.course_video)."""
+    return f'media/{blob.sha256[:2]}/{blob.sha256}{blob.ext}'
+
+
+def _send(path, mimetype, etag, max_age):
+    config = current_app.config
+    if config['MEDIA_SENDFILE'] == 'x-accel-redirect':
+        if not os.path.isfile(path):
+            abort(404)
+        response = current_app.response_class(mimetype=mimetype)
+        relative = os.path.relpath(path, media_root()).replace(os.sep, '/')
+        response.headers['X-Accel-Redirect'] = config['MEDIA_ACCEL_PREFIX'].rstrip('/') + '/' + relative
+        response.set_etag(etag)
+        response.cache_control.max_age = max_age
+        response = response.make_conditional(request)
+    else:
+        # X-Sendfile is applied by send_file itself when USE_X_SENDFILE is on
+        response = send_file(path, mimetype=mimetype, etag=etag, conditional=True, max_age=max_age)
+    # Only enrolled users may fetch it, so shared caches must not keep a copy
+    response.cache_control.public = False
+    response.cache_control.private = True
+    return response
+
+
+def send_blob(blob):
+    """
+    Responds with a stored blob. Its hash is a strong ETag and its content can
+    never change, so clients may cache it for MEDIA_MAX_AGE; Range and
+    If-None-Match are answered with 206/304. With MEDIA_SENDFILE set, the
+    body is left to the front-end server (nginx X-Accel-Redirect or Apache
+    X-Sendfile) so no Python worker is tied up for the length of a stream.
+    """
+    mimetype = mimetypes.guess_type('x' + blob.ext)[0] or 'application/octet-stream'
+    response = _send(blob_path(blob.sha256, blob.ext), mimetype, blob.sha256, current_app.config['MEDIA_MAX_AGE'])
+    response.cache_control.immutable = True
+    return response
+
+
+def send_derived(sha256, name, mimetype, max_age):
+    """
+    Responds with a file under a blob's derived directory, e.g. 'hls/720p/index.m3u8'.
+    These can be regenerated, so they are validated by mtime and size rather than
+    marked immutable.
+    """
+    path = safe_join(derived_dir(sha256), name)
+    if path is None or not os.path.isfile(path):
+        abort(404)
+    stat = os.stat(path)
+    return _send(path, mimetype, f'{sha256[:16]}-{int(stat.st_mtime)}-{stat.st_size}', max_age)
+
+
+def extension(filename):
+    ext = os.path.splitext(secure_filename(filename or ''))[1].lower()
+    return ext if len(ext) <= 16 and ext[1:].isalnum() else ''
+
+
+def owned_blob(teacher_id, sha256, size):
+    """Returns the blob if one of this teacher's courses already uses exactly this content."""
+    return (MediaBlob.query.join(Course, Course.media_sha256 == MediaBlob.sha256)
+            .filter(Course.teacher_id == teacher_id, MediaBlob.sha256 == sha256, MediaBlob.size == size)
+            .first())
+
+
+def ingest(path, sha256, size, ext):
+    """
+    Moves a fully received file at `path` into the store and returns its blob.
+    If the content is already stored the file is simply discarded. The caller
+    attaches the blob and commits.
+    """
+    dialect = db.session.get_bind().dialect.name
+    if dialect in ('sqlite', 'postgresql'):
+        insert = sqlite.insert if dialect == 'sqlite' else postgresql.insert
+        db.session.execute(insert(MediaBlob).values(sha256=sha256, size=size, ext=ext, refcount=0)
+                           .on_conflict_do_nothing())
+    elif db.session.get(MediaBlob, sha256) is None:
+        db.session.add(MediaBlob(sha256=sha256, size=size, ext=ext, refcount=0))
+        db.session.flush()
+    blob = db.session.get(MediaBlob, sha256, populate_existing=True)
+    target = blob_path(blob.sha256, blob.ext)
+    if os.path.exists(target):
+        os.remove(path)
+    else:
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        os.replace(path, target)
+    return blob
+
+
+def store_file(file_storage):
+    """Hashes a werkzeug upload into the store (the non-chunked form fallback)."""
+    temp = incoming_path(uuid.uuid4().hex)
+    os.makedirs(os.path.dirname(temp), exist_ok=True)
+    hasher = hashlib.sha256()
+    size = 0
+    with open(temp, 'wb') as f:
+        for block in iter(lambda: file_storage.stream.read(READ_SIZE), b''):
+            f.write(block)
+            hasher.update(block)
+            size += len(block)
+    return ingest(temp, hasher.hexdigest(), size, extension(file_storage.filename))
+
+
+def _adjust(sha256, delta):
+    (MediaBlob.query.filter_by(sha256=sha256)
+     .update({'refcount': MediaBlob.refcount + delta}, synchronize_session=False))
+
+
+def on_attach(fn):
+    """Registers `fn(blob)` to run in the attaching transaction."""
+    ATTACH_HOOKS.append(fn)
+    return fn
+
+
+def attach(course, blob):
+    """Points `course` at `blob`, moving the reference from its previous video."""
+    if course.media_sha256 != blob.sha256:
+        _adjust(blob.sha256, 1)
+        if course.media_sha256:
+            _adjust(course.media_sha256, -1)
+        course.media_sha256 = blob.sha256
+    course.video_url = blob_url(blob)
+    for hook in ATTACH_HOOKS:
+        hook(blob)
+
+
+def detach(course):
+    """Drops `course`'s reference to its video, e.g. before the course is deleted."""
+    if course.media_sha256:
+        _adjust(course.media_sha256, -1)
+        course.media_sha256 = None
+
+
+def _remove(path):
+    if os.path.isdir(path):
+        shutil.rmtree(path, ignore_errors=True)
+    elif os.path.exists(path):
+        os.remove(path)
+
+
+def collect_garbage(dry_run=False):
+    """
+    Deletes blobs no course references, plus their files and derived files,
+    and stray files in MEDIA_ROOT that belong to no blob or open upload.
+    Returns (blobs, files) removed.
+    """
+    in_use = db.session.query(Course.id).filter(Course.media_sha256 == MediaBlob.sha256).exists()
+    # Refcounts are an optimisation; the courses themselves are the source of truth
+    unused = db.session.query(MediaBlob.sha256, MediaBlob.ext).filter(~in_use).all()
+    blobs = 0
+    for sha256, ext in unused:
+        if not dry_run:
+            # Re-checked in the DELETE itself in case a course attached it meanwhile
+            deleted = MediaBlob.query.filter(MediaBlob.sha256 == sha256, ~in_use).delete(synchronize_session=False)
+            if deleted:
+                SubtitleTrack.query.filter_by(key=sha256).delete(synchronize_session=False)
+            db.session.commit()
+            if not deleted:
+                continue
+            for path in [blob_path(sha256, ext), derived_dir(sha256)] + subtitle_paths(sha256):
+                _remove(path)
+        blobs += 1
+
+    # Blob files and derived directories start with the hash; partial uploads are named after their session
+    known = {sha for (sha,) in db.session.query(MediaBlob.sha256)}
+    known.update(sid for (sid,) in db.session.query(UploadSession.id).filter_by(status='uploading'))
+    cutoff = time.time() - ORPHAN_GRACE_SECONDS
+    files = 0
+    for dirpath, dirnames, filenames in os.walk(media_root()):
+        derived = [d for d in dirnames if d.endswith('.d')]
+        dirnames[:] = [d for d in dirnames if not d.endswith('.d')]
+        for name in filenames + derived:
+            path = os.path.join(dirpath, name)
+            if name.split('.', 1)[0] in known or os.path.getmtime(path) > cutoff:
+                continue
+            if not dry_run:
+                _remove(path)
+            files += 1
+    return blobs, files
+
+
+@cli.command('gc')
+@click.option('--dry-run', is_flag=True, help='Only report what would be deleted.')
+def gc_command(dry_run):
+    """Delete unreferenced media and orphaned upload files."""
+    blobs, files = collect_garbage(dry_run)
+    verb = 'Would remove' if dry_run else 'Removed'
+    click.echo(f'{verb} {blobs} unreferenced blob(s) and {files} orphaned file(s).')
+
+
+@cli.command('import-legacy')
+def import_legacy_command():
+    """Move videos saved under static/uploads into the media store."""
+    moved = {}
+    courses = Course.query.filter(Course.media_sha256.is_(None), Course.video_url.isnot(None)).all()
+    for course in courses:
+        source = os.path.join(current_app.root_path, course.video_url)
+        if source not in moved:
+            if not os.path.isfile(source):
+                click.echo(f'course {course.id}: {course.video_url} is missing, skipped')
+                continue
+            hasher = hashlib.sha256()
+            with open(source, 'rb') as f:
+                for block in iter(lambda: f.read(READ_SIZE), b''):
+                    hasher.update(block)
+            size = os.path.getsize(source)
+            temp = incoming_path(uuid.uuid4().hex)
+            os.makedirs(os.path.dirname(temp), exist_ok=True)
+            os.replace(source, temp)
+            blob = ingest(temp, hasher.hexdigest(), size, extension(source))
+            # Subtitles were keyed by the upload's basename; copy them under the hash
+            old_key = os.path.splitext(os.path.basename(source))[0]
+            subtitles = subtitles_dir()
+            for suffix in ('.vtt', '.en.vtt', '.json'):
+                old, new = os.path.join(subtitles, old_key + suffix), os.path.join(subtitles, blob.sha256 + suffix)
+                if os.path.exists(old) and not os.path.exists(new):
+                    shutil.copyfile(old, new)
+            # Before attaching, so the copied captions are not transcribed again
+            if os.path.exists(os.path.join(subtitles, blob.sha256 + '.vtt')):
+                from app import subtitles as manifest
+                lang, label = manifest.read_metadata(blob.sha256)
+                manifest.record_track(blob.sha256, lang, blob.sha256 + '.vtt', True, label)
+                if lang != 'en' and os.path.exists(os.path.join(subtitles, blob.sha256 + '.en.vtt')):
+                    manifest.record_track(blob.sha256, 'en', blob.sha256 + '.en.vtt', False)
+            moved[source] = blob
+        attach(course, moved[source])
+        db.session.commit()
+        click.echo(f'course {course.id}: {moved[source].sha256}')
@@ -0,0 +1,91 @@
+"""
+In-process metrics: counters, latency timers and gauges.
+
+Each gunicorn worker keeps its own registry; `snapshot()` is exposed to admins
+at /admin/api/metrics. Timers keep a bounded reservoir of recent samples so
+percentiles cost O(1) memory no matter how long the process runs.
+"""
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+RESERVOIR_SIZE = 1024
+
+_lock = threading.Lock()
+_counters = {}
+_timers = {}
+_gauges = {}
+
+
+def incr(name, amount=1):
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + amount
+
+
+def value(name):
+    """The current value of a counter (0 if it was never incremented)."""
+    with _lock:
+        return _counters.get(name, 0)
+
+
+def observe(name, seconds):
+    """Records one latency sample (in seconds) for the named timer."""
+    with _lock:
+        timer = _timers.get(name)
+        if timer is None:
+            timer = _timers[name] = {'count': 0, 'total': 0.0, 'max': 0.0, 'recent': deque(maxlen=RESERVOIR_SIZE)}
+        timer['count'] += 1
+        timer['total'] += seconds
+        timer['max'] = max(timer['max'], seconds)
+        timer['recent'].append(seconds)
+
+
+@contextmanager
+def timed(name):
+    """Times the enclosed block into the named timer, whether or not it raises."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(name, time.perf_counter() - start)
+
+
+def gauge(name, fn):
+    """Registers a callable evaluated whenever a snapshot is taken."""
+    with _lock:
+        _gauges[name] = fn
+
+
+def _percentile(samples, q):
+    return samples[min(len(samples) - 1, int(q * len(samples)))]
+
+
+def snapshot():
+    """Returns every metric as plain JSON-serialisable data; latencies are in milliseconds."""
+    with _lock:
+        counters = dict(_counters)
+        timers = {name: dict(t, recent=sorted(t['recent'])) for name, t in _timers.items()}
+        gauges = dict(_gauges)
+    result = {'counters': counters, 'timers': {}, 'gauges': {}}
+    for name, t in timers.items():
+        recent = t['recent']
+        result['timers'][name] = {
+            'count': t['count'],
+            'mean_ms': t['total'] * 1000 / t['count'],
+            'max_ms': t['max'] * 1000,
+            'p50_ms': _percentile(recent, 0.50) * 1000,
+            'p99_ms': _percentile(recent, 0.99) * 1000,
+        }
+    for name, fn in gauges.items():
+        try:
+            result['gauges'][name] = fn()
+        except Exception as e:
+            result['gauges'][name] = f'error: {e}'
+    return result
+
+
+def reset():
+    with _lock:
+        _counters.clear()
+        _timers.clear()
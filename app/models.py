@@ -6,6 +6,9 @@ from datetime import datetime
 
 class User(db.Model, UserMixin):
     """User model for students, teachers, and admins."""
+    __table_args__ = (
+        db.Index('ix_user_role_id', 'role', 'id'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     username = db.Column(db.String(150), unique=True, nullable=False)
     email = db.Column(db.String(150), unique=True, nullable=False)
@@ -19,15 +22,27 @@ class User(db.Model, UserMixin):
 
 class Course(db.Model):
     """Course model."""
+    __table_args__ = (
+        db.Index('ix_course_teacher_id_id', 'teacher_id', 'id'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(100), nullable=False)
     description = db.Column(db.Text, nullable=False)
     price = db.Column(db.Float, nullable=False)
     teacher_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     video_url = db.Column(db.String(200), nullable=True) 
+    # Content hash of the video in the media store (app.media); derived files share this key
+    media_sha256 = db.Column(db.String(64), db.ForeignKey('media_blob.sha256'), nullable=True, index=True)
+
+    media = db.relationship('MediaBlob')
 
 class Purchase(db.Model):
     """Represents a student's purchase of a course."""
+    __table_args__ = (
+        # A student can own a course only once, even under concurrent enrollment
+        db.Index('uq_purchase_student_course', 'student_id', 'course_id', unique=True),
+        db.Index('ix_purchase_course_id', 'course_id'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     student_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     course_id = db.Column(db.Integer, db.ForeignKey('course.id'), nullable=False)
@@ -37,6 +52,10 @@ class Purchase(db.Model):
 
 class Transaction(db.Model):
     """Represents the financial transaction for a purchase."""
+    __table_args__ = (
+        db.Index('uq_transaction_purchase_id', 'purchase_id', unique=True),
+        db.Index('ix_transaction_status_id', 'status', 'id'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     purchase_id = db.Column(db.Integer, db.ForeignKey('purchase.id'), nullable=False)
     teacher_amount = db.Column(db.Float, nullable=False)
@@ -45,19 +64,36 @@ class Transaction(db.Model):
 
 class Announcement(db.Model):
     """Model for general announcements."""
+    __table_args__ = (
+        db.Index('ix_announcement_timestamp', 'timestamp'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(100), nullable=False)
     content = db.Column(db.Text, nullable=False)
     timestamp = db.Column(db.DateTime, default=datetime.utcnow)
 
 class AnnouncementRead(db.Model):
-    """Tracks which user has read which announcement."""
+    """
+    Records an announcement read out of order, i.e. above the user's watermark.
+    Everything at or below the watermark is read and has no row here.
+    """
+    __table_args__ = (
+        db.Index('uq_announcement_read_user_announcement', 'user_id', 'announcement_id', unique=True),
+    )
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     announcement_id = db.Column(db.Integer, db.ForeignKey('announcement.id'), nullable=False)
 
+class AnnouncementWatermark(db.Model):
+    """Every announcement with an id up to and including `read_up_to` has been read by the user."""
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
+    read_up_to = db.Column(db.Integer, nullable=False, default=0)
+
 class SupportMessage(db.Model):
     """Model for support messages from users."""
+    __table_args__ = (
+        db.Index('ix_support_message_timestamp_id', 'timestamp', 'id'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     subject = db.Column(db.String(100), nullable=False)
@@ -73,3 +109,189 @@ class LiveClass(db.Model):
     teacher_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
 
     course = db.relationship('Course', backref='live_classes')
+
+class TeacherStats(db.Model):
+    """Running revenue and enrollment totals per teacher, maintained by app.rollups."""
+    teacher_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
+    revenue = db.Column(db.Float, nullable=False, default=0.0)
+    earnings = db.Column(db.Float, nullable=False, default=0.0)
+    enrollments = db.Column(db.Integer, nullable=False, default=0)
+    students = db.Column(db.Integer, nullable=False, default=0)
+    best_course_id = db.Column(db.Integer, db.ForeignKey('course.id'), nullable=True)
+
+    teacher = db.relationship('User')
+    best_course = db.relationship('Course')
+
+class CourseStats(db.Model):
+    """Running revenue and enrollment totals per course, maintained by app.rollups."""
+    course_id = db.Column(db.Integer, db.ForeignKey('course.id'), primary_key=True)
+    revenue = db.Column(db.Float, nullable=False, default=0.0)
+    enrollments = db.Column(db.Integer, nullable=False, default=0)
+    sales = db.Column(db.Integer, nullable=False, default=0)
+
+    course = db.relationship('Course')
+
+class DailyStats(db.Model):
+    """Running platform totals per calendar day (UTC), maintained by app.rollups."""
+    day = db.Column(db.Date, primary_key=True)
+    revenue = db.Column(db.Float, nullable=False, default=0.0)
+    platform_earnings = db.Column(db.Float, nullable=False, default=0.0)
+    enrollments = db.Column(db.Integer, nullable=False, default=0)
+    sales = db.Column(db.Integer, nullable=False, default=0)
+
+class CacheVersion(db.Model):
+    """Version counters for shared caches; bumping one invalidates every worker's copy."""
+    name = db.Column(db.String(50), primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+
+class Payment(db.Model):
+    """
+    Ledger of captured gateway payments, keyed by the Razorpay payment id so a
+    replayed capture returns the stored result instead of enrolling twice.
+    """
+    id = db.Column(db.Integer, primary_key=True)
+    razorpay_payment_id = db.Column(db.String(100), nullable=False, unique=True)
+    razorpay_order_id = db.Column(db.String(100), nullable=True)
+    student_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    course_id = db.Column(db.Integer, db.ForeignKey('course.id'), nullable=False)
+    purchase_id = db.Column(db.Integer, db.ForeignKey('purchase.id'), nullable=True)
+    amount = db.Column(db.Float, nullable=False)
+    # 'captured', or 'already_enrolled' when the student already owned the course (needs a refund)
+    status = db.Column(db.String(50), nullable=False)
+    timestamp = db.Column(db.DateTime, default=datetime.utcnow)
+
+class PaymentOrder(db.Model):
+    """
+    A gateway order as created by /student/create_order. A payment is only
+    captured against the student, course and amount its order was made for.
+    """
+    id = db.Column(db.Integer, primary_key=True)
+    razorpay_order_id = db.Column(db.String(100), nullable=False, unique=True)
+    student_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    course_id = db.Column(db.Integer, db.ForeignKey('course.id'), nullable=False)
+    # In paise, as sent to the gateway
+    amount = db.Column(db.Integer, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+class MailJob(db.Model):
+    """
+    One outbound email, queued by a route and delivered by `flask mail worker`.
+    Live-class jobs are rendered at send time from `live_class_id`/`user_id`;
+    other kinds carry their rendered `subject` and `body`.
+    """
+    __table_args__ = (
+        # Workers claim due jobs in id order
+        db.Index('ix_mail_job_status_next_attempt_at', 'status', 'next_attempt_at', 'id'),
+        # Scheduling the same class twice must not mail a student twice
+        db.Index('uq_mail_job_live_class_user', 'live_class_id', 'user_id', unique=True),
+    )
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(50), nullable=False)
+    recipient = db.Column(db.String(150), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=True)
+    live_class_id = db.Column(db.Integer, db.ForeignKey('live_class.id'), nullable=True)
+    subject = db.Column(db.String(200), nullable=True)
+    body = db.Column(db.Text, nullable=True)
+    # 'queued' -> 'sending' (leased by a worker) -> 'sent' or 'failed'
+    status = db.Column(db.String(20), nullable=False, default='queued')
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    next_attempt_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    claimed_by = db.Column(db.String(64), nullable=True)
+    claimed_at = db.Column(db.DateTime, nullable=True)
+    sent_at = db.Column(db.DateTime, nullable=True)
+    last_error = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+class UploadSession(db.Model):
+    """
+    A resumable, chunked video upload. Chunks are appended to a partial file
+    in the media store's scratch area; on completion the file is ingested into
+    the store and the course is created (or, with `course_id`, updated).
+    """
+    id = db.Column(db.String(32), primary_key=True)
+    teacher_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    course_id = db.Column(db.Integer, db.ForeignKey('course.id'), nullable=True)
+    filename = db.Column(db.String(200), nullable=False)
+    size = db.Column(db.BigInteger, nullable=False)
+    received = db.Column(db.BigInteger, nullable=False, default=0)
+    # Course fields applied on completion
+    title = db.Column(db.String(100), nullable=True)
+    description = db.Column(db.Text, nullable=True)
+    price = db.Column(db.Float, nullable=True)
+    # 'uploading' or 'complete'
+    status = db.Column(db.String(20), nullable=False, default='uploading')
+    sha256 = db.Column(db.String(64), nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class MediaBlob(db.Model):
+    """
+    One stored media file, addressed by the SHA-256 of its content.
+    `refcount` is the number of courses using it; `flask media gc` removes
+    blobs nobody references.
+    """
+    sha256 = db.Column(db.String(64), primary_key=True)
+    size = db.Column(db.BigInteger, nullable=False)
+    ext = db.Column(db.String(16), nullable=False, default='')
+    refcount = db.Column(db.Integer, nullable=False, default=0)
+    # Adaptive streaming package (app.hls): None, 'pending', 'processing', 'ready' or 'failed'
+    hls_status = db.Column(db.String(20), nullable=True)
+    hls_renditions = db.Column(db.String(100), nullable=True)  # e.g. '720,480,360'
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+class Job(db.Model):
+    """
+    A unit of background work run by `flask jobs worker`. (kind, key) is
+    unique, so requesting work that is already queued or running coalesces
+    into the existing row instead of doing it twice.
+    """
+    __table_args__ = (
+        db.Index('uq_job_kind_key', 'kind', 'key', unique=True),
+        # Workers claim queued jobs of their kinds in id order
+        db.Index('ix_job_state_kind_id', 'state', 'kind', 'id'),
+    )
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(50), nullable=False)
+    key = db.Column(db.String(200), nullable=False)
+    # 'queued' -> 'running' -> 'done' or 'failed'
+    state = db.Column(db.String(20), nullable=False, default='queued')
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    claimed_by = db.Column(db.String(64), nullable=True)
+    error = db.Column(db.Text, nullable=True)
+    result = db.Column(db.Text, nullable=True)  # JSON summary returned by the handler, e.g. step timings
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime, nullable=True)
+    finished_at = db.Column(db.DateTime, nullable=True)
+
+class TranslationMemory(db.Model):
+    """
+    A translated caption line, shared by every video. Keyed by the SHA-256 of
+    the normalised source text and the language pair (e.g. 'es|en'), so a
+    line like "Okay" is sent to the translation service once per language.
+    """
+    __table_args__ = (
+        db.Index('uq_translation_memory_pair_hash', 'lang_pair', 'source_hash', unique=True),
+    )
+    id = db.Column(db.Integer, primary_key=True)
+    lang_pair = db.Column(db.String(20), nullable=False)
+    source_hash = db.Column(db.String(64), nullable=False)
+    source_text = db.Column(db.Text, nullable=False)
+    translated_text = db.Column(db.Text, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+class SubtitleTrack(db.Model):
+    """
+    One caption file in the subtitle store: a video's original track or a
+    translation of it. `key` is the video's hash, or its file name for videos
+    that predate the media store.
+    """
+    __table_args__ = (
+        db.Index('uq_subtitle_track_key_lang', 'key', 'lang', unique=True),
+    )
+    id = db.Column(db.Integer, primary_key=True)
+    key = db.Column(db.String(200), nullable=False)
+    lang = db.Column(db.String(16), nullable=False)
+    label = db.Column(db.String(50), nullable=False)
+    filename = db.Column(db.String(255), nullable=False)
+    is_original = db.Column(db.Boolean, nullable=False, default=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
@@ -0,0 +1,68 @@
+"""
+Keyset (cursor) pagination helpers.
+
+A page is fetched with `WHERE (sort columns) < (last row's values)` instead of
+OFFSET, so every page is an index range scan of `limit` rows no matter how deep
+into the table it is. Cursors are opaque, URL-safe tokens encoding the sort key
+of the last row on the previous page.
+"""
+import base64
+import json
+from datetime import datetime
+
+from sqlalchemy import literal, tuple_
+
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+
+
+class InvalidCursor(ValueError):
+    """Raised when a client sends a cursor that was not produced by `encode_cursor`."""
+
+
+def encode_cursor(values):
+    """Packs a row's sort-key values into an opaque cursor string."""
+    packed = [{'dt': v.isoformat()} if isinstance(v, datetime) else v for v in values]
+    raw = json.dumps(packed, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Unpacks a cursor produced by `encode_cursor` back into sort-key values."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        packed = json.loads(raw)
+        return [datetime.fromisoformat(v['dt']) if isinstance(v, dict) else v for v in packed]
+    except (ValueError, TypeError, KeyError) as e:
+        raise InvalidCursor(str(e))
+
+
+def page_size(value):
+    """Clamps a client-supplied page size to [1, MAX_PAGE_SIZE]."""
+    try:
+        return max(1, min(int(value), MAX_PAGE_SIZE))
+    except (TypeError, ValueError):
+        return DEFAULT_PAGE_SIZE
+
+
+def keyset_page(query, columns, cursor=None, limit=DEFAULT_PAGE_SIZE):
+    """
+    Returns `(items, next_cursor)` for one page of `query`, newest first.
+
+    `columns` is the sort key, most significant first, and must end with a
+    unique column (normally the primary key) so that the order is total.
+    `next_cursor` is None on the last page.
+    """
+    if cursor:
+        values = decode_cursor(cursor)
+        if len(values) != len(columns):
+            raise InvalidCursor('cursor does not match this listing')
+        bounds = [literal(v, c.type) for c, v in zip(columns, values)]
+        query = query.filter(tuple_(*columns) < tuple_(*bounds))
+    rows = query.order_by(*(c.desc() for c in columns)).limit(limit + 1).all()
+    items = rows[:limit]
+    next_cursor = None
+    if len(rows) > limit:
+        last = items[-1]
+        next_cursor = encode_cursor([getattr(last, c.key) for c in columns])
+    return items, next_cursor
@@ -0,0 +1,146 @@
+"""
+Process-wide Razorpay client.
+
+One client is built at app startup around a pooled `requests` session, so
+checkouts reuse kept-alive TLS connections to the gateway instead of opening a
+new one per request. The session applies a default timeout, retries with
+exponential backoff (connection failures for every call, 5xx responses only
+for idempotent methods, so an order is never created twice), and records the
+latency of every gateway call in app.metrics.
+
+`record_order` stores each order created for a checkout, and `capture`, the
+idempotent, single-transaction payment capture path, only accepts a payment
+whose order was made for that student, course and amount.
+"""
+from urllib.parse import urlsplit
+
+import razorpay
+import requests
+from flask import current_app
+from requests.adapters import HTTPAdapter
+from sqlalchemy.exc import IntegrityError
+from urllib3.util.retry import Retry
+
+from app import db, metrics, rollups
+from app.models import Payment, PaymentOrder, Purchase, Transaction
+
+
+class GatewaySession(requests.Session):
+    """A requests session with connection pooling, retries, a default timeout and latency metrics."""
+
+    def __init__(self, timeout, retries, backoff, pool_size):
+        super().__init__()
+        self.timeout = timeout
+        retry = Retry(total=retries, connect=retries, read=retries, status=retries, backoff_factor=backoff,
+                      status_forcelist=(429, 500, 502, 503, 504), raise_on_status=False)
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+        self.mount('https://', adapter)
+        self.mount('http://', adapter)
+
+    def request(self, method, url, **kwargs):
+        kwargs.setdefault('timeout', self.timeout)
+        # Name the timer after the resource, e.g. razorpay.post.orders, without ids in it
+        segments = [s for s in urlsplit(url).path.split('/') if s and s != 'v1']
+        name = f"razorpay.{method.lower()}.{segments[0] if segments else 'root'}"
+        try:
+            with metrics.timed(name):
+                response = super().request(method, url, **kwargs)
+        except requests.RequestException:
+            metrics.incr(name + '.errors')
+            raise
+        if response.status_code >= 400:
+            metrics.incr(name + '.errors')
+        return response
+
+
+def init_app(app):
+    session = GatewaySession(
+        timeout=(app.config['RAZORPAY_CONNECT_TIMEOUT'], app.config['RAZORPAY_READ_TIMEOUT']),
+        retries=app.config['RAZORPAY_RETRIES'],
+        backoff=app.config['RAZORPAY_BACKOFF'],
+        pool_size=app.config['RAZORPAY_POOL_SIZE'],
+    )
+    app.extensions['razorpay'] = razorpay.Client(
+        session=session,
+        auth=(app.config['RAZORPAY_KEY_ID'], app.config['RAZORPAY_KEY_SECRET']),
+        base_url=app.config['RAZORPAY_BASE_URL'],
+    )
+
+
+def get_client():
+    """Returns the shared Razorpay client for the current app."""
+    return current_app.extensions['razorpay']
+
+
+def order_amount(course):
+    """The course price in paise, as the gateway charges it."""
+    return int(round(course.price * 100))
+
+
+def record_order(student_id, course, order):
+    """Stores a gateway order returned by `order.create`. The caller commits."""
+    db.session.add(PaymentOrder(razorpay_order_id=order['id'], student_id=student_id,
+                                course_id=course.id, amount=order['amount']))
+
+
+def _result(payment):
+    if payment.status == 'captured':
+        return {'success': True, 'purchase_id': payment.purchase_id}, 200
+    return {'error': 'You are already enrolled in this course.'}, 409
+
+
+def capture(student_id, course, order_id, payment_id):
+    """
+    Records a verified payment exactly once and returns `(json_payload, status_code)`.
+
+    The ledger row, Purchase, Transaction and rollups are written in a single
+    commit. A replay of the same payment id, sequential or concurrent from
+    another worker, hits uq on payment.razorpay_payment_id and gets the result
+    stored by whichever request won.
+
+    The order must have been recorded for this student, course and amount, so
+    a signature for one course cannot be replayed to enrol in another.
+    """
+    order = PaymentOrder.query.filter_by(razorpay_order_id=order_id).first()
+    if (order is None or order.student_id != student_id or order.course_id != course.id
+            or order.amount != order_amount(course)):
+        metrics.incr('payments.order_mismatch')
+        return {'error': 'Payment does not match the order.'}, 400
+
+    existing = Payment.query.filter_by(razorpay_payment_id=payment_id).first()
+    if existing is not None:
+        metrics.incr('payments.replayed')
+        return _result(existing) if existing.student_id == student_id else ({'error': 'Payment mismatch'}, 409)
+
+    payment = Payment(razorpay_payment_id=payment_id, razorpay_order_id=order_id, student_id=student_id,
+                      course_id=course.id, amount=course.price, status='captured')
+    try:
+        purchase = Purchase(student_id=student_id, course_id=course.id, amount=course.price)
+        db.session.add_all([payment, purchase])
+        db.session.flush()
+        transaction = Transaction(purchase_id=purchase.id, teacher_amount=course.price * 0.9,
+                                  admin_amount=course.price * 0.1, status='paid')
+        db.session.add(transaction)
+        payment.purchase_id = purchase.id
+        rollups.record_enrollment(purchase, course, transaction)
+        db.session.commit()
+        metrics.incr('payments.captured')
+        return _result(payment)
+    except IntegrityError:
+        db.session.rollback()
+
+    # Either this payment id was captured concurrently, or the student already owns the course
+    existing = Payment.query.filter_by(razorpay_payment_id=payment_id).first()
+    if existing is not None:
+        metrics.incr('payments.replayed')
+        return _result(existing) if existing.student_id == student_id else ({'error': 'Payment mismatch'}, 409)
+    payment = Payment(razorpay_payment_id=payment_id, razorpay_order_id=order_id, student_id=student_id,
+                      course_id=course.id, amount=course.price, status='already_enrolled')
+    db.session.add(payment)
+    try:
+        db.session.commit()
+    except IntegrityError:
+        db.session.rollback()
+        payment = Payment.query.filter_by(razorpay_payment_id=payment_id).one()
+    metrics.incr('payments.already_enrolled')
+    return _result(payment)
@@ -0,0 +1,237 @@
+"""
+Incrementally maintained revenue and enrollment rollups.
+
+`record_enrollment` is called by the enrollment and payment routes before they
+commit, so the rollup rows change in the same database transaction as the
+Purchase/Transaction rows they summarise. The dashboards then read a single
+rollup row instead of re-aggregating every purchase.
+
+`flask rollups verify` recomputes everything from the source rows and reports
+drift; `flask rollups rebuild` does the same and overwrites the rollups.
+"""
+from datetime import datetime
+
+import click
+from flask.cli import AppGroup
+from sqlalchemy import func
+from sqlalchemy.dialects import postgresql, sqlite
+
+from app import db
+from app.models import Course, Purchase, Transaction, TeacherStats, CourseStats, DailyStats
+
+cli = AppGroup('rollups', help='Maintain the revenue and enrollment rollup tables.')
+
+
+def _locked_row(model, **key):
+    """Returns the rollup row for `key`, creating it if needed, locked for update."""
+    dialect = db.session.get_bind().dialect.name
+    if dialect in ('sqlite', 'postgresql'):
+        insert = sqlite.insert if dialect == 'sqlite' else postgresql.insert
+        db.session.execute(insert(model).values(**key).on_conflict_do_nothing())
+    elif db.session.get(model, tuple(key.values())) is None:
+        db.session.add(model(**key))
+        db.session.flush()
+    return model.query.filter_by(**key).with_for_update().populate_existing().one()
+
+
+def record_enrollment(purchase, course, transaction=None):
+    """
+    Adds a new purchase (and its transaction, if paid) to the rollups.
+    Must be called after the rows are added to the session and before commit.
+    """
+    db.session.flush()
+    day = (purchase.timestamp or datetime.utcnow()).date()
+
+    course_stats = _locked_row(CourseStats, course_id=course.id)
+    course_stats.enrollments += 1
+    course_stats.revenue += purchase.amount
+
+    teacher_stats = _locked_row(TeacherStats, teacher_id=course.teacher_id)
+    teacher_stats.enrollments += 1
+    teacher_stats.revenue += purchase.amount
+    returning_student = db.session.query(
+        Purchase.query.join(Course)
+        .filter(Course.teacher_id == course.teacher_id,
+                Purchase.student_id == purchase.student_id,
+                Purchase.id != purchase.id)
+        .exists()
+    ).scalar()
+    if not returning_student:
+        teacher_stats.students += 1
+    best = db.session.get(CourseStats, teacher_stats.best_course_id) if teacher_stats.best_course_id else None
+    if best is None or course_stats.enrollments > best.enrollments:
+        teacher_stats.best_course_id = course.id
+
+    daily_stats = _locked_row(DailyStats, day=day)
+    daily_stats.enrollments += 1
+    daily_stats.revenue += purchase.amount
+
+    if transaction is not None:
+        course_stats.sales += 1
+        teacher_stats.earnings += transaction.teacher_amount
+        daily_stats.sales += 1
+        daily_stats.platform_earnings += transaction.admin_amount
+
+
+def forget_course(course):
+    """
+    Drops a course's rollup row before the course is deleted and recomputes its
+    teacher's totals from the remaining source rows.
+    """
+    CourseStats.query.filter_by(course_id=course.id).delete()
+    expected = _expected_teacher_stats(Course.teacher_id == course.teacher_id, exclude_course_id=course.id)
+    TeacherStats.query.filter_by(teacher_id=course.teacher_id).delete()
+    for values in expected.values():
+        db.session.add(TeacherStats(**values))
+
+
+# --- Recomputing from source rows ---
+
+def _expected_course_stats():
+    rows = (
+        db.session.query(Purchase.course_id, func.count(Purchase.id), func.coalesce(func.sum(Purchase.amount), 0.0))
+        .join(Course, Course.id == Purchase.course_id)
+        .group_by(Purchase.course_id)
+    )
+    stats = {cid: {'course_id': cid, 'enrollments': n, 'revenue': revenue, 'sales': 0} for cid, n, revenue in rows}
+    sales = (
+        db.session.query(Purchase.course_id, func.count(Transaction.id))
+        .join(Transaction, Transaction.purchase_id == Purchase.id)
+        .join(Course, Course.id == Purchase.course_id)
+        .group_by(Purchase.course_id)
+    )
+    for cid, n in sales:
+        stats[cid]['sales'] = n
+    return stats
+
+
+def _expected_teacher_stats(*criteria, exclude_course_id=None):
+    def scoped(query):
+        query = query.filter(*criteria)
+        if exclude_course_id is not None:
+            query = query.filter(Course.id != exclude_course_id)
+        return query
+
+    rows = scoped(
+        db.session.query(Course.teacher_id, func.count(Purchase.id), func.count(func.distinct(Purchase.student_id)),
+                         func.coalesce(func.sum(Purchase.amount), 0.0))
+        .join(Purchase, Purchase.course_id == Course.id)
+    ).group_by(Course.teacher_id)
+    stats = {
+        tid: {'teacher_id': tid, 'enrollments': n, 'students': students, 'revenue': revenue,
+              'earnings': 0.0, 'best_course_id': None}
+        for tid, n, students, revenue in rows
+    }
+    earnings = scoped(
+        db.session.query(Course.teacher_id, func.sum(Transaction.teacher_amount))
+        .join(Purchase, Purchase.course_id == Course.id)
+        .join(Transaction, Transaction.purchase_id == Purchase.id)
+    ).group_by(Course.teacher_id)
+    for tid, amount in earnings:
+        stats[tid]['earnings'] = amount
+    per_course = scoped(
+        db.session.query(Course.teacher_id, Course.id, func.count(Purchase.id))
+        .join(Purchase, Purchase.course_id == Course.id)
+    ).group_by(Course.teacher_id, Course.id).order_by(Course.id)
+    best_counts = {}
+    for tid, cid, n in per_course:
+        if n > best_counts.get(tid, 0):
+            best_counts[tid] = n
+            stats[tid]['best_course_id'] = cid
+    return stats
+
+
+def _expected_daily_stats():
+    day = func.date(Purchase.timestamp)
+    rows = (
+        db.session.query(day, func.count(Purchase.id), func.coalesce(func.sum(Purchase.amount), 0.0))
+        .group_by(day)
+    )
+    stats = {
+        str(d): {'day': d, 'enrollments': n, 'revenue': revenue, 'sales': 0, 'platform_earnings': 0.0}
+        for d, n, revenue in rows if d is not None
+    }
+    paid = (
+        db.session.query(day, func.count(Transaction.id), func.sum(Transaction.admin_amount))
+        .join(Transaction, Transaction.purchase_id == Purchase.id)
+        .group_by(day)
+    )
+    for d, n, amount in paid:
+        if d is not None:
+            stats[str(d)]['sales'] = n
+            stats[str(d)]['platform_earnings'] = amount
+    for values in stats.values():
+        if isinstance(values['day'], str):
+            values['day'] = datetime.strptime(values['day'], '%Y-%m-%d').date()
+    return stats
+
+
+def _diff(label, model, key_attr, expected, compare):
+    """Yields a human-readable line for every rollup row that disagrees with `expected`."""
+    stored = {str(getattr(row, key_attr)): row for row in model.query.all()}
+    expected = {str(key): values for key, values in expected.items()}
+    for key in sorted(set(stored) | set(expected)):
+        row, values = stored.get(key), expected.get(key)
+        if row is None:
+            yield f"{label} {key}: missing rollup row"
+        elif values is None:
+            if any(getattr(row, field) for field in compare):
+                yield f"{label} {key}: rollup row has no source rows"
+        else:
+            for field in compare:
+                have, want = getattr(row, field), values[field]
+                if isinstance(want, float) and abs((have or 0.0) - want) < 0.005:
+                    continue
+                if have != want:
+                    yield f"{label} {key}: {field} is {have}, expected {want}"
+
+
+def find_drift():
+    """Compares every rollup row with a fresh aggregate over the source rows."""
+    drift = []
+    drift += _diff('course', CourseStats, 'course_id', _expected_course_stats(),
+                   ('enrollments', 'sales', 'revenue'))
+    teachers = _expected_teacher_stats()
+    drift += _diff('teacher', TeacherStats, 'teacher_id', teachers,
+                   ('enrollments', 'students', 'revenue', 'earnings'))
+    # Ties are legitimate, so the best course only drifts if it sells fewer than the real best
+    course_counts = {cid: values['enrollments'] for cid, values in _expected_course_stats().items()}
+    for row in TeacherStats.query.all():
+        want = teachers.get(row.teacher_id, {}).get('best_course_id')
+        if course_counts.get(row.best_course_id, 0) != course_counts.get(want, 0):
+            drift.append(f"teacher {row.teacher_id}: best_course_id is {row.best_course_id}, expected {want}")
+    drift += _diff('day', DailyStats, 'day', _expected_daily_stats(),
+                   ('enrollments', 'sales', 'revenue', 'platform_earnings'))
+    return drift
+
+
+def rebuild():
+    """Replaces every rollup row with values recomputed from the source rows."""
+    for model in (TeacherStats, CourseStats, DailyStats):
+        model.query.delete()
+    for model, expected in ((CourseStats, _expected_course_stats()),
+                            (TeacherStats, _expected_teacher_stats()),
+                            (DailyStats, _expected_daily_stats())):
+        db.session.add_all(model(**values) for values in expected.values())
+    db.session.commit()
+
+
+@cli.command('verify')
+def verify_command():
+    """Report any drift between the rollups and the source rows."""
+    drift = find_drift()
+    for line in drift:
+        click.echo(line)
+    if drift:
+        raise SystemExit(f"{len(drift)} rollup value(s) drifted; run 'flask rollups rebuild'.")
+    click.echo('Rollups match the source rows.')
+
+
+@cli.command('rebuild')
+def rebuild_command():
+    """Recompute the rollups from the source rows, reporting what changed."""
+    drift = find_drift()
+    for line in drift:
+        click.echo(line)
+    rebuild()
+    click.echo(f"Rollups rebuilt ({len(drift)} drifted value(s) corrected).")
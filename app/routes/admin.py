@@ -1,55 +1,168 @@
-from flask import Blueprint, render_template, request, redirect, url_for, flash
-from flask_login import login_required
-from app.models import User, Course, Transaction, SupportMessage, Announcement
-from collections import defaultdict
-from collections import Counter
-from app import db
+from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify, abort
+from flask_login import login_required, current_user
+from functools import wraps
+from datetime import datetime, timedelta
+from sqlalchemy import func
+from sqlalchemy.orm import joinedload
+from app.models import User, Course, Purchase, Transaction, SupportMessage, Announcement, TeacherStats, CourseStats, DailyStats
+from app.pagination import keyset_page, page_size
+from app import db, metrics
 
 bp = Blueprint('admin', __name__)
 
+def platform_stats():
+    """Reads the dashboard headline numbers from the rollup tables (see app.rollups)."""
+    total_users = db.session.query(func.count(User.id)).scalar()
+    total_courses = db.session.query(func.count(Course.id)).scalar()
+    total_transactions, platform_earnings = db.session.query(
+        func.coalesce(func.sum(DailyStats.sales), 0), func.coalesce(func.sum(DailyStats.platform_earnings), 0.0)
+    ).one()
+    top_teacher = (
+        db.session.query(User)
+        .join(TeacherStats, TeacherStats.teacher_id == User.id)
+        .filter(TeacherStats.earnings > 0)
+        .order_by(TeacherStats.earnings.desc(), User.id)
+        .first()
+    )
+    popular_course = (
+        db.session.query(Course)
+        .join(CourseStats, CourseStats.course_id == Course.id)
+        .filter(CourseStats.sales > 0)
+        .order_by(CourseStats.sales.desc(), Course.id)
+        .first()
+    )
+    return {
+        'total_users': total_users,
+        'total_courses': total_courses,
+        'total_transactions': total_transactions,
+        'platform_earnings': platform_earnings,
+        'top_teacher': top_teacher,
+        'popular_course': popular_course,
+    }
+
+# --- Keyset-paginated listings ---
+
+def _date_arg(args, name, end_of_day=False):
+    """Parses an ISO date/datetime query parameter; a bare `until` date includes the whole day."""
+    value = args.get(name)
+    if not value:
+        return None
+    parsed = datetime.fromisoformat(value)
+    if end_of_day and len(value) == 10:
+        parsed += timedelta(days=1)
+    return parsed
+
+def _users_query(args):
+    query = User.query
+    if args.get('role'):
+        query = query.filter(User.role == args['role'])
+    return query
+
+def _courses_query(args):
+    query = Course.query.options(joinedload(Course.teacher))
+    if args.get('teacher_id'):
+        query = query.filter(Course.teacher_id == int(args['teacher_id']))
+    return query
+
+def _transactions_query(args):
+    query = Transaction.query
+    since, until = _date_arg(args, 'since'), _date_arg(args, 'until', end_of_day=True)
+    if args.get('teacher_id') or since or until:
+        query = query.join(Purchase, Purchase.id == Transaction.purchase_id)
+    if args.get('teacher_id'):
+        query = query.join(Course, Course.id == Purchase.course_id).filter(Course.teacher_id == int(args['teacher_id']))
+    if since:
+        query = query.filter(Purchase.timestamp >= since)
+    if until:
+        query = query.filter(Purchase.timestamp < until)
+    if args.get('status'):
+        query = query.filter(Transaction.status == args['status'])
+    return query
+
+def _support_query(args):
+    query = SupportMessage.query
+    since, until = _date_arg(args, 'since'), _date_arg(args, 'until', end_of_day=True)
+    if since:
+        query = query.filter(SupportMessage.timestamp >= since)
+    if until:
+        query = query.filter(SupportMessage.timestamp < until)
+    if args.get('user_id'):
+        query = query.filter(SupportMessage.user_id == int(args['user_id']))
+    return query
+
+# listing name -> (filtered query builder, sort key ending in a unique column, JSON serializer)
+LISTINGS = {
+    'users': (_users_query, (User.id,),
+              lambda u: {'id': u.id, 'username': u.username, 'email': u.email, 'role': u.role}),
+    'courses': (_courses_query, (Course.id,),
+                lambda c: {'id': c.id, 'title': c.title, 'price': c.price, 'teacher_id': c.teacher_id,
+                           'teacher': c.teacher.username if c.teacher else None}),
+    'transactions': (_transactions_query, (Transaction.id,),
+                     lambda t: {'id': t.id, 'purchase_id': t.purchase_id, 'teacher_amount': t.teacher_amount,
+                                'admin_amount': t.admin_amount, 'status': t.status}),
+    'support': (_support_query, (SupportMessage.timestamp, SupportMessage.id),
+                lambda m: {'id': m.id, 'user_id': m.user_id, 'subject': m.subject, 'message': m.message,
+                           'timestamp': m.timestamp.isoformat() if m.timestamp else None}),
+}
+
+def listing_page(name, args):
+    """Returns `(items, next_cursor)` for one page of the named listing, honouring the request filters."""
+    build_query, columns, _ = LISTINGS[name]
+    return keyset_page(build_query(args), columns, cursor=args.get('cursor'), limit=page_size(args.get('limit')))
+
+def admin_required(view):
+    @wraps(view)
+    def wrapped(*args, **kwargs):
+        if current_user.role != 'admin':
+            abort(403)
+        return view(*args, **kwargs)
+    return wrapped
+
+@bp.route('/admin/api/<listing>')
+@login_required
+@admin_required
+def api_listing(listing):
+    if listing not in LISTINGS:
+        abort(404)
+    try:
+        items, next_cursor = listing_page(listing, request.args)
+    except ValueError:  # also covers InvalidCursor
+        return jsonify({'error': 'Invalid cursor or filter value.'}), 400
+    serialize = LISTINGS[listing][2]
+    return jsonify({'items': [serialize(item) for item in items], 'next_cursor': next_cursor})
+
+@bp.route('/admin/api/metrics')
+@login_required
+@admin_required
+def api_metrics():
+    return jsonify(metrics.snapshot())
+
 @bp.route('/admin/dashboard')
 @login_required
 def dashboard():
-    users = User.query.all()
-    courses = Course.query.all()
-    transactions = Transaction.query.all()
-    platform_earnings = sum(t.admin_amount for t in transactions)
-    total_users = len(users)
-    total_courses = len(courses)
-    total_transactions = len(transactions)
-    # Top-earning teacher
-    teacher_earnings = defaultdict(float)
-    for t in transactions:
-        if t.purchase and t.purchase.course:
-            teacher_earnings[t.purchase.course.teacher_id] += t.teacher_amount
-    top_teacher = None
-    if teacher_earnings:
-        top_teacher_id = max(teacher_earnings, key=teacher_earnings.get)
-        top_teacher = User.query.get(top_teacher_id)
-    # Most popular course
-    course_counts = Counter([t.purchase.course_id for t in transactions if t.purchase and t.purchase.course_id])
-    popular_course = None
-    if course_counts:
-        popular_course_id = course_counts.most_common(1)[0][0]
-        popular_course = Course.query.get(popular_course_id)
+    # Only the first page of each listing is rendered; the rest is fetched from /admin/api/<listing>
+    users, users_cursor = listing_page('users', {})
+    courses, courses_cursor = listing_page('courses', {})
+    transactions, transactions_cursor = listing_page('transactions', {})
     return render_template(
         'dashboard_admin.html',
         users=users,
         courses=courses,
         transactions=transactions,
-        platform_earnings=platform_earnings,
-        total_users=total_users,
-        total_courses=total_courses,
-        total_transactions=total_transactions,
-        top_teacher=top_teacher,
-        popular_course=popular_course
+        next_cursors={'users': users_cursor, 'courses': courses_cursor, 'transactions': transactions_cursor},
+        **platform_stats()
     )
 
 @bp.route('/admin/support')
 @login_required
 def support():
-    messages = SupportMessage.query.order_by(SupportMessage.timestamp.desc()).all()
-    return render_template('admin_support.html', messages=messages)
+    try:
+        messages, next_cursor = listing_page('support', request.args)
+    except ValueError:  # also covers InvalidCursor
+        flash('Invalid page or date filter.', 'warning')
+        return redirect(url_for('admin.support'))
+    filters = {k: v for k, v in request.args.items() if k in ('since', 'until', 'user_id') and v}
+    return render_template('admin_support.html', messages=messages, next_cursor=next_cursor, filters=filters)
 
 @bp.route('/admin/announcements', methods=['GET', 'POST'])
 @login_required
@@ -2,9 +2,8 @@ from flask import Blueprint, render_template, redirect, url_for, flash, request,
 from flask_login import login_user, logout_user, login_required, current_user
 from werkzeug.security import generate_password_hash, check_password_hash
 from itsdangerous import URLSafeTimedSerializer, SignatureExpired
-from flask_mail import Message
 from app.models import User
-from app import db, mail
+from app import db, mailer
 
 bp = Blueprint('auth', __name__)
 
@@ -92,20 +91,18 @@ def logout():
 
 # --- PASSWORD RESET ROUTES ---
 
-def send_reset_email(user):
+def queue_reset_email(user):
     s = URLSafeTimedSerializer(current_app.config['SECRET_KEY'])
     token = s.dumps(user.email, salt='password-reset-salt')
-    msg = Message('Password Reset Request',
-                  sender='noreply@demo.com',
-                  recipients=[user.email])
     # url_for is safe to use here because this function is only called after the app is running.
     reset_url = url_for('auth.reset_token', token=token, _external=True)
-    msg.body = f'''To reset your password, visit the following link:
+    body = f'''To reset your password, visit the following link:
 {reset_url}
 
 If you did not make this request then simply ignore this email and no changes will be made.
 '''
-    mail.send(msg)
+    # Delivered by the mail worker so a slow SMTP server never holds this request
+    mailer.enqueue(user.email, 'Password Reset Request', body, kind='password_reset', user_id=user.id)
 
 @bp.route("/reset_password", methods=['GET', 'POST'])
 def reset_password_request():
@@ -115,7 +112,10 @@ def reset_password_request():
         email = request.form.get('email')
         user = User.query.filter_by(email=email).first()
         if user:
-            send_reset_email(user)
+            queue_reset_email(user)
+        # Commit and wake the worker either way, so the response time does not reveal whether the address exists
+        db.session.commit()
+        mailer.notify()
         flash('If an account with that email exists, a password reset link has been sent.', 'info')
         return redirect('/login')
     return render_template('reset_password_request.html', title='Reset Password')
@@ -1,13 +1,13 @@
-from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify, current_app
+from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify, current_app, abort
 from flask_login import login_required, current_user
-from app.models import Course, Purchase, Transaction, Announcement, AnnouncementRead
-from app import db
-import razorpay
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import joinedload
+from app.models import Course, Purchase, SubtitleTrack
+from app import db, rollups, announcements, catalog, entitlements, payments, search, subtitles, transcription, translation
+from app.pagination import page_size
 import os
 import time
 import traceback
-import json
-import requests
 import re
 
 # --- THIS IS THE FIX ---
@@ -29,14 +29,19 @@ def enroll_free():
         if course.price and course.price > 0:
             flash('This course is not free.', 'danger')
             return redirect(url_for('student.dashboard'))
-        is_already_purchased = Purchase.query.filter_by(student_id=current_user.id, course_id=course.id).first()
-        if is_already_purchased:
+        if entitlements.has_course(current_user.id, course.id):
             flash('You are already enrolled in this course.', 'info')
             return redirect(url_for('student.dashboard'))
         purchase = Purchase(student_id=current_user.id, course_id=course.id, amount=0)
         db.session.add(purchase)
+        rollups.record_enrollment(purchase, course)
         db.session.commit()
+        entitlements.grant(current_user.id, course.id)
         flash(f'You have successfully enrolled in {course.title}!', 'success')
+    except IntegrityError:
+        # A concurrent request enrolled the same student first (uq_purchase_student_course)
+        db.session.rollback()
+        flash('You are already enrolled in this course.', 'info')
     except Exception as e:
         traceback.print_exc()
         flash('An error occurred while enrolling.', 'danger')
@@ -51,13 +56,15 @@ def create_order():
         course = Course.query.get(course_id)
         if not course: return jsonify({'error': 'Course not found'}), 404
         if not course.price or course.price <= 0: return jsonify({'error': 'This course is not for sale.'}), 400
-        order_amount = int(course.price * 100)
-        razorpay_client = razorpay.Client(auth=(os.getenv('RAZORPAY_KEY_ID'), os.getenv('RAZORPAY_KEY_SECRET')))
+        order_amount = payments.order_amount(course)
+        razorpay_client = payments.get_client()
         order_details = {'amount': order_amount, 'currency': 'INR', 'receipt': f'order_{course_id}_{current_user.id}'}
         order = razorpay_client.order.create(order_details)
+        payments.record_order(current_user.id, course, order)
+        db.session.commit()
         return jsonify({
             'order_id': order['id'], 'amount': order['amount'], 'currency': order['currency'],
-            'key_id': os.getenv('RAZORPAY_KEY_ID'), 'course_id': course_id, 'course_title': course.title
+            'key_id': current_app.config['RAZORPAY_KEY_ID'], 'course_id': course_id, 'course_title': course.title
         })
     except Exception as e:
         traceback.print_exc()
@@ -75,134 +82,125 @@ def payment_success():
         'razorpay_payment_id': data.get('razorpay_payment_id'),
         'razorpay_signature': data.get('razorpay_signature')
     }
-    razorpay_client = razorpay.Client(auth=(os.getenv('RAZORPAY_KEY_ID'), os.getenv('RAZORPAY_KEY_SECRET')))
+    razorpay_client = payments.get_client()
     try:
         razorpay_client.utility.verify_payment_signature(params_dict)
     except Exception:
         return jsonify({'error': 'Payment verification failed'}), 400
-    purchase = Purchase(student_id=current_user.id, course_id=course.id, amount=course.price)
-    db.session.add(purchase)
-    db.session.commit()
-    teacher_amount = course.price * 0.9
-    admin_amount = course.price * 0.1
-    transaction = Transaction(purchase_id=purchase.id, teacher_amount=teacher_amount, admin_amount=admin_amount, status='paid')
-    db.session.add(transaction)
-    db.session.commit()
-    return jsonify({'success': True})
+    result, status = payments.capture(current_user.id, course, params_dict['razorpay_order_id'],
+                                      params_dict['razorpay_payment_id'])
+    if status == 200:
+        entitlements.grant(current_user.id, course.id)
+    return jsonify(result), status
 
 @bp.route('/announcement_read/<int:announcement_id>', methods=['POST'])
 @login_required
 def announcement_read(announcement_id):
-    if not AnnouncementRead.query.filter_by(user_id=current_user.id, announcement_id=announcement_id).first():
-        ar = AnnouncementRead(user_id=current_user.id, announcement_id=announcement_id)
-        db.session.add(ar)
-        db.session.commit()
+    if not announcements.mark_read(current_user.id, announcement_id):
+        abort(404)
     return ('', 204)
 
+@bp.route('/announcements/read_all', methods=['POST'])
+@login_required
+def announcements_read_all():
+    announcements.mark_all_read(current_user.id)
+    return redirect(url_for('student.dashboard'))
+
 @bp.route('/dashboard')
 @login_required
 def dashboard():
-    purchased_ids = [p.course_id for p in current_user.purchases]
-    available_courses = Course.query.filter(~Course.id.in_(purchased_ids)).all()
-    purchased_courses = [p.course for p in current_user.purchases]
-    order_history = current_user.purchases
-    all_announcements = Announcement.query.order_by(Announcement.timestamp.desc()).all()
-    read_ids = {ar.announcement_id for ar in AnnouncementRead.query.filter_by(user_id=current_user.id).all()}
-    unread_announcements = [a for a in all_announcements if a.id not in read_ids]
+    order_history = Purchase.query.options(joinedload(Purchase.course)).filter_by(student_id=current_user.id).all()
+    purchased_courses = [p.course for p in order_history]
+    # The order history is already a fresh read of the entitlement set, so refresh the cached copy from it
+    owned_course_ids = {p.course_id for p in order_history}
+    entitlements.remember(current_user.id, owned_course_ids)
+    search_query = request.args.get('q', '').strip()
+    next_page = None
+    if search_query:
+        # Ranked matches from the whole catalog; courses the student owns are shown with a Watch link
+        available_courses, next_page = search.search(search_query, request.args.get('page', 1, type=int))
+    else:
+        # The shared catalog cache minus this student's entitlement set, instead of a NOT IN query per visit
+        available_courses = catalog.available_courses(owned_course_ids)
+    unread_announcements = announcements.unread_announcements(current_user.id)
     return render_template(
         'dashboard_student.html',
         available_courses=available_courses,
         purchased_courses=purchased_courses,
         order_history=order_history,
-        unread_announcements=unread_announcements
+        unread_announcements=unread_announcements,
+        search_query=search_query,
+        next_page=next_page,
+        owned_course_ids=owned_course_ids
     )
 
-def translate_vtt_content(vtt_content, from_lang, to_lang='en'):
-    """Translates the text portions of a VTT file using MyMemory API."""
-    print(f"--- Attempting translation from '{from_lang}' to '{to_lang}' ---")
-    lines = vtt_content.strip().split('\n')
-    texts_to_translate = [line for line in lines if line.strip() and '-->' not in line and 'WEBVTT' not in line]
-    
-    if not texts_to_translate:
-        print("--- No text found to translate. ---")
-        return None
-
-    try:
-        separator = "|||"
-        text_block = separator.join(texts_to_translate)
-        api_url = f"https://api.mymemory.translated.net/get?q={text_block}&langpair={from_lang}|{to_lang}"
-        
-        response = requests.get(api_url, timeout=15) # Add a timeout
-        response.raise_for_status() # Raise an exception for bad status codes (4xx or 5xx)
-        data = response.json()
-
-        if data['responseStatus'] != 200:
-            print(f"--- Translation API Error: {data.get('responseDetails')} ---")
-            return None
-
-        translated_block = data['responseData']['translatedText']
-        translated_list = translated_block.split(separator)
-
-        if len(texts_to_translate) != len(translated_list):
-            print("--- Translation Error: Mismatch in translated line count. ---")
-            return None
-
-        translation_map = {original: translated.strip() for original, translated in zip(texts_to_translate, translated_list)}
-        
-        reconstructed_lines = [translation_map.get(line, line) for line in lines]
-        print("--- Translation successful! ---")
-        return "\n".join(reconstructed_lines)
-
-    except requests.exceptions.RequestException as e:
-        print(f"--- Translation API call failed: {e} ---")
-        return None
+@bp.route('/courses/search')
+@login_required
+def search_courses():
+    """Ranked, paginated course search: ?q=words&page=1&limit=20."""
+    page = request.args.get('page', 1, type=int)
+    courses, next_page = search.search(request.args.get('q', ''), page, page_size(request.args.get('limit')))
+    owned = entitlements.owned_course_ids(current_user.id)
+    for course in courses:
+        course['owned'] = course['id'] in owned
+    return jsonify({'items': courses, 'page': page, 'next_page': next_page})
 
 @bp.route('/course/<int:course_id>')
 @login_required
 def view_course(course_id):
     course = Course.query.get_or_404(course_id)
-    purchased = any(p.course_id == course_id for p in current_user.purchases)
-    if not purchased:
+    if not entitlements.has_course(current_user.id, course_id):
         flash('You have not purchased this course.', 'danger')
         return redirect(url_for('student.dashboard'))
 
-    subtitle_file, english_subtitle_file, lang_code, lang_name = None, None, 'en', 'English'
+    subtitle_file, lang_code, lang_name, translations = None, 'en', 'English', []
+    translation_pending, job_state = False, None
     if course.video_url:
-        video_filename_only = os.path.basename(course.video_url)
-        base_filename = video_filename_only.rsplit('.', 1)[0]
-        
-        original_vtt_filename = f"{base_filename}.vtt"
-        original_vtt_path = os.path.join(current_app.root_path, 'static', 'subtitles', original_vtt_filename)
-        
-        if os.path.exists(original_vtt_path):
-            subtitle_file = original_vtt_filename
-            metadata_filename = f"{base_filename}.json"
-            metadata_path = os.path.join(current_app.root_path, 'static', 'subtitles', metadata_filename)
-            if os.path.exists(metadata_path):
-                try:
-                    with open(metadata_path, 'r', encoding='utf-8') as f:
-                        metadata = json.load(f)
-                        lang_code = metadata.get('language_code', 'en')
-                        lang_name = metadata.get('language_name', 'English')
-                except (IOError, json.JSONDecodeError): pass
-            
-            english_vtt_filename = f"{base_filename}.en.vtt"
-            english_vtt_path = os.path.join(current_app.root_path, 'static', 'subtitles', english_vtt_filename)
-            
-            if not os.path.exists(english_vtt_path) and lang_code != 'en':
-                with open(original_vtt_path, 'r', encoding='utf-8') as f:
-                    vtt_content = f.read()
-                translated_content = translate_vtt_content(vtt_content, lang_code)
-                if translated_content:
-                    with open(english_vtt_path, 'w', encoding='utf-8') as f:
-                        f.write(translated_content)
-            
-            if os.path.exists(english_vtt_path):
-                english_subtitle_file = english_vtt_filename
+        # Subtitles are keyed by the video's content hash; older uploads by their file name
+        base_filename = course.media_sha256 or os.path.basename(course.video_url).rsplit('.', 1)[0]
+        tracks = subtitles.tracks_for(base_filename)
+        if not tracks and course.media_sha256:
+            job_state = transcription.status(course.media_sha256)
+        if not tracks and job_state is None:
+            # Captions made outside the job worker (e.g. by the Docker tool) are recorded on first view;
+            # a transcribe job records its own, so a key that has one is never probed
+            tracks = subtitles.discover(base_filename)
+            if tracks:
+                db.session.commit()
+        if tracks and tracks[0].is_original:
+            subtitle_file, lang_code, lang_name = tracks[0].filename, tracks[0].lang, tracks[0].label
+            # English first, then any other languages that have been translated
+            translations = sorted(tracks[1:], key=lambda track: track.lang != 'en')
+            if lang_code != 'en' and not any(track.lang == 'en' for track in translations):
+                # Translated in the background; the page polls course_subtitles for it
+                translation_pending = translation.request_track(base_filename, 'en')
+                db.session.commit()
+
+    captions_pending = subtitle_file is None and job_state in ('queued', 'running')
+    if captions_pending:
+        # The captions so far of a transcription that is still running
+        subtitle_file = transcription.partial_track(course.media_sha256)
+        lang_name = 'Captions (in progress)' if subtitle_file else lang_name
 
     return render_template(
         'student_view_course.html', 
         course=course, subtitle_file=subtitle_file,
-        english_subtitle_file=english_subtitle_file,
-        lang_code=lang_code, lang_name=lang_name
+        translations=translations,
+        lang_code=lang_code, lang_name=lang_name,
+        captions_pending=captions_pending, translation_pending=translation_pending
     )
+
+
+@bp.route('/course/<int:course_id>/subtitles')
+@login_required
+def course_subtitles(course_id):
+    """The English track's URL once its background translation has finished."""
+    course = Course.query.get_or_404(course_id)
+    if not entitlements.has_course(current_user.id, course_id):
+        return jsonify({'error': 'not enrolled'}), 403
+    base_filename = course.media_sha256 or os.path.basename(course.video_url or '').rsplit('.', 1)[0]
+    english = SubtitleTrack.query.filter_by(key=base_filename, lang='en', is_original=False).first()
+    if english is not None:
+        return jsonify({'english': url_for('static', filename='subtitles/' + english.filename), 'pending': False})
+    state = translation.status(base_filename, 'en') if base_filename else None
+    return jsonify({'english': None, 'pending': state in ('queued', 'running')})
@@ -1,22 +1,23 @@
-from flask import Blueprint, render_template, request, redirect, url_for, flash, current_app
+from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify, abort
 from flask_login import login_required, current_user
-from app.models import Course, Purchase, Announcement, AnnouncementRead
-from app import db
-import os
-from werkzeug.utils import secure_filename
-from collections import Counter
+from app.models import Course, Purchase, TeacherStats, UploadSession
+from app import db, rollups, announcements, catalog, search, uploads, media, transcription
 
 bp = Blueprint('teacher', __name__)
 
 @bp.route('/teacher/announcement_read/<int:announcement_id>', methods=['POST'])
 @login_required
 def announcement_read(announcement_id):
-    if not AnnouncementRead.query.filter_by(user_id=current_user.id, announcement_id=announcement_id).first():
-        ar = AnnouncementRead(user_id=current_user.id, announcement_id=announcement_id)
-        db.session.add(ar)
-        db.session.commit()
+    if not announcements.mark_read(current_user.id, announcement_id):
+        abort(404)
     return ('', 204)
 
+@bp.route('/teacher/announcements/read_all', methods=['POST'])
+@login_required
+def announcements_read_all():
+    announcements.mark_all_read(current_user.id)
+    return redirect(url_for('teacher.dashboard'))
+
 @bp.route('/teacher/dashboard', methods=['GET', 'POST'])
 @login_required
 def dashboard():
@@ -26,47 +27,35 @@ def dashboard():
         price = float(request.form['price'])
         video_file = request.files.get('video')
         
-        video_url = None
-        
-        # Save video if it exists
-        if video_file and video_file.filename:
-            video_filename = secure_filename(video_file.filename)
-            video_path = os.path.join(current_app.root_path, 'static', 'uploads', video_filename)
-            os.makedirs(os.path.dirname(video_path), exist_ok=True)
-            video_file.save(video_path)
-            # Store the path that the web server can use
-            video_url = f'static/uploads/{video_filename}'
-
         # Create the course object without the old fields
         new_course = Course(
             title=title,
             description=description,
             teacher_id=current_user.id,
-            price=price,
-            video_url=video_url
+            price=price
         )
         db.session.add(new_course)
+
+        # Save video if it exists (browsers with JS use the chunked /teacher/uploads API instead)
+        if video_file and video_file.filename:
+            media.attach(new_course, media.store_file(video_file))
+
+        search.index_course(new_course)
+        catalog.bump_version()
         db.session.commit()
         flash('Course uploaded successfully!', 'success')
         return redirect(url_for('teacher.dashboard'))
 
     # --- This GET request logic remains the same ---
     my_courses = Course.query.filter_by(teacher_id=current_user.id).all()
-    purchases = Purchase.query.join(Course).filter(Course.teacher_id == current_user.id).all()
-    total_earnings = sum(p.amount for p in purchases)
     total_courses = len(my_courses)
-    student_ids = set(p.student_id for p in purchases)
-    total_students = len(student_ids)
-    
-    best_course = None
-    if purchases:
-        course_counts = Counter([p.course_id for p in purchases])
-        best_course_id = course_counts.most_common(1)[0][0]
-        best_course = Course.query.get(best_course_id)
+    # Earnings, students and best course come from the incrementally maintained rollup row
+    stats = db.session.get(TeacherStats, current_user.id)
+    total_earnings = stats.revenue if stats else 0
+    total_students = stats.students if stats else 0
+    best_course = stats.best_course if stats else None
         
-    all_announcements = Announcement.query.order_by(Announcement.timestamp.desc()).all()
-    read_ids = {ar.announcement_id for ar in AnnouncementRead.query.filter_by(user_id=current_user.id).all()}
-    unread_announcements = [a for a in all_announcements if a.id not in read_ids]
+    unread_announcements = announcements.unread_announcements(current_user.id)
     
     return render_template(
         'dashboard_teacher.html',
@@ -94,17 +83,58 @@ def edit_course(course_id):
         
         # Update video if a new one is uploaded
         if video_file and video_file.filename:
-            video_filename = secure_filename(video_file.filename)
-            video_path = os.path.join(current_app.root_path, 'static', 'uploads', video_filename)
-            os.makedirs(os.path.dirname(video_path), exist_ok=True)
-            video_file.save(video_path)
-            course.video_url = f'static/uploads/{video_filename}'
+            media.attach(course, media.store_file(video_file))
             
+        search.index_course(course)
+        catalog.bump_version()
         db.session.commit()
         flash('Course updated successfully!', 'success')
         return redirect(url_for('teacher.dashboard'))
         
-    return render_template('teacher_edit_course.html', course=course)
+    captions = transcription.status(course.media_sha256) if course.media_sha256 else None
+    return render_template('teacher_edit_course.html', course=course, captions=captions)
+
+# --- Resumable video uploads (see app/uploads.py) ---
+
+@bp.route('/teacher/uploads', methods=['POST'])
+@login_required
+def upload_start():
+    data = request.get_json(silent=True) or {}
+    course = None
+    if data.get('course_id'):
+        course = Course.query.get_or_404(data['course_id'])
+        if course.teacher_id != current_user.id:
+            abort(403)
+    try:
+        session = uploads.start(current_user, data.get('filename'), data.get('size'), course,
+                                data.get('title'), data.get('description'), data.get('price'),
+                                data.get('sha256'))
+    except uploads.UploadError as e:
+        return jsonify(error=str(e)), e.status
+    db.session.commit()
+    return jsonify(uploads.describe(session)), 201
+
+def _own_upload(upload_id):
+    session = UploadSession.query.get_or_404(upload_id)
+    if session.teacher_id != current_user.id:
+        abort(403)
+    return session
+
+@bp.route('/teacher/uploads/<upload_id>', methods=['GET'])
+@login_required
+def upload_status(upload_id):
+    return jsonify(uploads.describe(_own_upload(upload_id)))
+
+@bp.route('/teacher/uploads/<upload_id>', methods=['PUT'])
+@login_required
+def upload_chunk(upload_id):
+    session = _own_upload(upload_id)
+    try:
+        uploads.append_chunk(session, request.headers.get('Content-Range'),
+                             request.headers.get('X-Chunk-SHA256'), request.stream)
+    except uploads.UploadError as e:
+        return jsonify(error=str(e), offset=session.received), e.status
+    return jsonify(uploads.describe(session))
 
 @bp.route('/teacher/course/<int:course_id>/delete', methods=['POST'])
 @login_required
@@ -114,34 +144,18 @@ def delete_course(course_id):
         flash('You are not authorized to delete this course.', 'danger')
         return redirect(url_for('teacher.dashboard'))
         
+    rollups.forget_course(course)
+    media.detach(course)
+    search.remove_course(course.id)
     db.session.delete(course)
+    catalog.bump_version()
     db.session.commit()
     flash('Course deleted successfully!', 'success')
     return redirect(url_for('teacher.dashboard'))
-from flask_mail import Message
-from app import mail
-from app.models import LiveClass, User
+from app.models import LiveClass
+from app import mailer
 from datetime import datetime
 
-def send_live_class_email(student, course, live_class):
-    """Helper function to send the notification email."""
-    msg = Message(
-        f'Live Class Scheduled: {course.title}',
-        sender='noreply@sus-lms.com',
-        recipients=[student.email]
-    )
-    msg.html = render_template(
-        'email/live_class_notification.html',
-        user=student,
-        course=course,
-        live_class=live_class
-    )
-    try:
-        mail.send(msg)
-        print(f"Email sent to {student.email}")
-    except Exception as e:
-        print(f"Failed to send email to {student.email}: {e}")
-
 @bp.route('/course/<int:course_id>/schedule', methods=['POST'])
 @login_required
 def schedule_live_class(course_id):
@@ -165,12 +179,18 @@ def schedule_live_class(course_id):
         teacher_id=current_user.id
     )
     db.session.add(live_class)
+    # Emails go out from `flask mail worker`; the jobs commit with the class
+    queued = mailer.enqueue_live_class(live_class, course)
     db.session.commit()
+    mailer.notify()
 
-    enrolled_students = User.query.join(Purchase).filter(Purchase.course_id == course.id).all()
-
-    for student in enrolled_students:
-        send_live_class_email(student, course, live_class)
-
-    flash(f'Live class "{title}" has been scheduled and students have been notified!', 'success')
+    flash(f'Live class "{title}" has been scheduled; {queued} student(s) will be notified shortly.', 'success')
     return redirect(url_for('teacher.edit_course', course_id=course.id))
+
+@bp.route('/course/<int:course_id>/live/<int:live_class_id>/notifications')
+@login_required
+def live_class_notifications(course_id, live_class_id):
+    live_class = LiveClass.query.filter_by(id=live_class_id, course_id=course_id).first_or_404()
+    if live_class.teacher_id != current_user.id:
+        abort(403)
+    return jsonify(mailer.delivery_progress(live_class.id))
@@ -0,0 +1,43 @@
+from flask import Blueprint, abort, current_app
+from flask_login import login_required, current_user
+from app.models import Course, MediaBlob
+from app import db, entitlements, media
+
+bp = Blueprint('video', __name__)
+
+HLS_TYPES = {'.m3u8': 'application/vnd.apple.mpegurl', '.ts': 'video/mp2t'}
+
+
+def _viewable_blob(course_id):
+    """The course's stored video, if the current user may watch it."""
+    course = Course.query.get_or_404(course_id)
+    allowed = (
+        current_user.role == 'admin'
+        or course.teacher_id == current_user.id
+        or entitlements.has_course(current_user.id, course.id)
+    )
+    if not allowed:
+        abort(403)
+    blob = db.session.get(MediaBlob, course.media_sha256) if course.media_sha256 else None
+    if blob is None:
+        abort(404)
+    return blob
+
+
+@bp.route('/course/<int:course_id>/video')
+@login_required
+def course_video(course_id):
+    return media.send_blob(_viewable_blob(course_id))
+
+
+@bp.route('/course/<int:course_id>/hls/<path:name>')
+@login_required
+def course_hls(course_id, name):
+    blob = _viewable_blob(course_id)
+    mimetype = HLS_TYPES.get(name[name.rfind('.'):])
+    if blob.hls_status != 'ready' or mimetype is None:
+        abort(404)
+    # Playlists are relative to this URL, so segments come back through the same check.
+    # Segments never change once packaged; playlists are revalidated in case of a repackage.
+    max_age = 0 if mimetype == HLS_TYPES['.m3u8'] else current_app.config['HLS_MAX_AGE']
+    return media.send_derived(blob.sha256, 'hls/' + name, mimetype, max_age)
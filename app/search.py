@@ -0,0 +1,145 @@
+"""
+Full-text course search.
+
+On SQLite each course's title and description are copied into course_fts, an
+FTS5 table whose rowid is the course id, and matches are ranked with bm25,
+a title match counting for more than a description match. The routes that
+create, edit or delete a course call index_course / remove_course in the same
+transaction, next to catalog.bump_version(). On PostgreSQL the course table
+carries a GIN index over a weighted tsvector of the same columns
+(ix_course_fts), which the database keeps up to date itself, so those calls
+do nothing there. Other databases fall back to LIKE.
+
+Results are ranked, so pages are numbered (OFFSET) rather than keyset
+cursors, and capped at MAX_PAGE. The migrations create course_fts; on a
+database made with `db.create_all()` it is created and filled on first use.
+`flask search reindex` rebuilds it from the course table, e.g. after a bulk
+import.
+"""
+import re
+
+import click
+from flask.cli import AppGroup
+from sqlalchemy import case, or_, text
+from sqlalchemy.orm import joinedload
+
+from app import db
+from app.catalog import describe
+from app.models import Course
+from app.pagination import DEFAULT_PAGE_SIZE
+
+cli = AppGroup('search', help='Maintain the course search index.')
+
+# bm25 column weights for (title, description)
+TITLE_WEIGHT, DESCRIPTION_WEIGHT = 10.0, 1.0
+MAX_PAGE = 50
+MAX_TERMS = 16
+
+SQLITE_TABLE = ("CREATE VIRTUAL TABLE IF NOT EXISTS course_fts USING fts5("
+                "title, description, tokenize = 'unicode61 remove_diacritics 2')")
+FILL_TABLE = ("INSERT INTO course_fts (rowid, title, description) "
+              "SELECT id, coalesce(title, ''), coalesce(description, '') FROM course")
+# Must match the expression ix_course_fts was built on, or PostgreSQL will not use the index
+POSTGRES_DOCUMENT = ("setweight(to_tsvector('simple', coalesce(title, '')), 'A') || "
+                     "setweight(to_tsvector('simple', coalesce(description, '')), 'B')")
+
+_WORD = re.compile(r'\w+')
+# Engines whose course_fts is known to exist
+_ready = set()
+
+
+def _dialect():
+    return db.session.get_bind().dialect.name
+
+
+def _ensure_table():
+    """Creates and fills course_fts once per process if the database has none (`db.create_all()` skips it)."""
+    engine = db.session.get_bind()
+    if engine.url in _ready:
+        return
+    found = db.session.execute(text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'course_fts'")).first()
+    if found is None:
+        db.session.execute(text(SQLITE_TABLE))
+        db.session.execute(text(FILL_TABLE))
+    _ready.add(engine.url)
+
+
+def terms(query):
+    """The words of a user's query, lower-cased; punctuation and operators are dropped."""
+    return _WORD.findall((query or '').lower())[:MAX_TERMS]
+
+
+def index_course(course):
+    """Adds or refreshes a course in course_fts. The caller commits."""
+    if _dialect() != 'sqlite':
+        return
+    if course.id is None:
+        db.session.flush()
+    _ensure_table()
+    db.session.execute(text('DELETE FROM course_fts WHERE rowid = :id'), {'id': course.id})
+    db.session.execute(text('INSERT INTO course_fts (rowid, title, description) VALUES (:id, :title, :description)'),
+                       {'id': course.id, 'title': course.title or '', 'description': course.description or ''})
+
+
+def remove_course(course_id):
+    """Drops a course from course_fts. The caller commits."""
+    if _dialect() == 'sqlite':
+        _ensure_table()
+        db.session.execute(text('DELETE FROM course_fts WHERE rowid = :id'), {'id': course_id})
+
+
+def rebuild():
+    """Recreates course_fts from the course table on SQLite. Returns the number of courses indexed."""
+    if _dialect() == 'sqlite':
+        db.session.execute(text(SQLITE_TABLE))
+        db.session.execute(text('DELETE FROM course_fts'))
+        db.session.execute(text(FILL_TABLE))
+        db.session.commit()
+    return db.session.query(Course.id).count()
+
+
+def _ranked_ids(words, limit, offset):
+    dialect = _dialect()
+    if dialect == 'sqlite':
+        _ensure_table()
+        # Quoted, so user input is never read as FTS5 syntax; the last word also matches as a prefix
+        match = ' '.join(f'"{word}"' for word in words) + '*'
+        rows = db.session.execute(text(
+            'SELECT rowid FROM course_fts WHERE course_fts MATCH :match '
+            'ORDER BY bm25(course_fts, :title_weight, :description_weight), rowid LIMIT :limit OFFSET :offset'),
+            {'match': match, 'title_weight': TITLE_WEIGHT, 'description_weight': DESCRIPTION_WEIGHT,
+             'limit': limit, 'offset': offset})
+    elif dialect == 'postgresql':
+        rows = db.session.execute(text(
+            f'SELECT id FROM course, to_tsquery(\'simple\', :match) AS query WHERE ({POSTGRES_DOCUMENT}) @@ query '
+            f'ORDER BY ts_rank({POSTGRES_DOCUMENT}, query) DESC, id LIMIT :limit OFFSET :offset'),
+            {'match': ' & '.join(words) + ':*', 'limit': limit, 'offset': offset})
+    else:
+        title_match = or_(*(Course.title.ilike(f'%{word}%') for word in words))
+        query = db.session.query(Course.id)
+        for word in words:
+            query = query.filter(or_(Course.title.ilike(f'%{word}%'), Course.description.ilike(f'%{word}%')))
+        rows = query.order_by(case((title_match, 0), else_=1), Course.id).limit(limit).offset(offset)
+    return [row[0] for row in rows]
+
+
+def search(query, page=1, limit=DEFAULT_PAGE_SIZE):
+    """
+    Returns (courses, next_page) for one page of courses matching every word
+    of `query`, best match first; courses are dicts as in the catalog and
+    next_page is None on the last page.
+    """
+    words = terms(query)
+    if not words or page < 1 or page > MAX_PAGE:
+        return [], None
+    ids = _ranked_ids(words, limit + 1, (page - 1) * limit)
+    next_page = page + 1 if len(ids) > limit and page < MAX_PAGE else None
+    ids = ids[:limit]
+    courses = {c.id: c for c in Course.query.options(joinedload(Course.teacher)).filter(Course.id.in_(ids))}
+    return [describe(courses[i]) for i in ids if i in courses], next_page
+
+
+@cli.command('reindex')
+def reindex_command():
+    """Rebuild the course search index from the course table."""
+    click.echo(f'Indexed {rebuild()} course(s).')
@@ -0,0 +1,96 @@
+// Resumable chunked video upload for the course forms.
+// A form marked with data-chunked-upload sends its video through /teacher/uploads
+// in SHA-256-checked chunks; after a network error it asks the server for the
+// current offset and resumes from there instead of starting over.
+(function () {
+    const MAX_RETRIES = 8;
+
+    async function sha256Hex(blob) {
+        const digest = await crypto.subtle.digest('SHA-256', await blob.arrayBuffer());
+        return Array.from(new Uint8Array(digest), b => b.toString(16).padStart(2, '0')).join('');
+    }
+
+    async function json(response) {
+        const body = await response.json().catch(() => ({}));
+        if (!response.ok) {
+            const error = new Error(body.error || response.statusText);
+            error.status = response.status;
+            error.offset = body.offset;
+            throw error;
+        }
+        return body;
+    }
+
+    const sleep = ms => new Promise(resolve => setTimeout(resolve, ms));
+
+    async function upload(file, fields, onProgress) {
+        let session = await json(await fetch('/teacher/uploads', {
+            method: 'POST',
+            headers: {'Content-Type': 'application/json'},
+            body: JSON.stringify(Object.assign({filename: file.name, size: file.size}, fields)),
+        }));
+        let offset = session.offset;
+        let failures = 0;
+        while (session.status !== 'complete') {
+            const end = Math.min(offset + session.chunk_size, file.size);
+            const chunk = file.slice(offset, end);
+            try {
+                session = await json(await fetch(`/teacher/uploads/${session.id}`, {
+                    method: 'PUT',
+                    headers: {
+                        'Content-Range': `bytes ${offset}-${end - 1}/${file.size}`,
+                        'X-Chunk-SHA256': await sha256Hex(chunk),
+                    },
+                    body: chunk,
+                }));
+                offset = session.offset;
+                failures = 0;
+                onProgress(offset / file.size);
+            } catch (error) {
+                if (error.status && error.status !== 409 && error.status !== 422 && error.status < 500) {
+                    throw error;
+                }
+                if (++failures > MAX_RETRIES) {
+                    throw error;
+                }
+                await sleep(Math.min(30000, 500 * 2 ** failures));
+                // Ask where the server got to; the connection may have dropped mid-chunk
+                session = await json(await fetch(`/teacher/uploads/${session.id}`)).catch(() => session);
+                offset = session.offset;
+            }
+        }
+        return session;
+    }
+
+    document.querySelectorAll('form[data-chunked-upload]').forEach(form => {
+        form.addEventListener('submit', async event => {
+            const input = form.querySelector('input[name="video"]');
+            const file = input && input.files[0];
+            if (!file || !window.crypto || !crypto.subtle) {
+                return;  // nothing to upload, or no Web Crypto: plain form post
+            }
+            event.preventDefault();
+            const button = form.querySelector('button[type="submit"]');
+            const label = button.textContent;
+            button.disabled = true;
+            const fields = {
+                title: form.elements.title.value,
+                description: form.elements.description.value,
+                price: form.elements.price.value,
+            };
+            if (form.dataset.courseId) {
+                fields.course_id = Number(form.dataset.courseId);
+            }
+            try {
+                await upload(file, fields, fraction => {
+                    button.textContent = `Uploading… ${Math.floor(fraction * 100)}%`;
+                });
+                window.location = form.dataset.redirect || window.location.href;
+            } catch (error) {
+                button.disabled = false;
+                button.textContent = label;
+                alert(`Upload failed: ${error.message}`);
+            }
+        });
+    });
+})();
@@ -0,0 +1,157 @@
+"""
+The subtitle manifest.
+
+Caption files live in the subtitle store (media.subtitles_dir()) as
+<key>.vtt for the original track, with its language in <key>.json, and
+<key>.<lang>.vtt for translations; <key> is the video's hash, or its file
+name for videos uploaded before the media store. Each file has a
+SubtitleTrack row, written by the transcription and translation jobs, so a
+course page finds every track and language with one query instead of
+probing the filesystem. A key with no rows and no transcribe job costs one
+file lookup (`discover`), which records what it finds, so captions generated
+by hand with the Docker tool show up on their own; a miss is remembered in
+missing_cache for a few minutes, so a video without captions is not probed
+on every view. `flask subtitles index` rebuilds every row from the files.
+"""
+import json
+import os
+import re
+
+import click
+from flask.cli import AppGroup
+from sqlalchemy.dialects import postgresql, sqlite
+
+from app import db, media
+from app.cache import Cache
+from app.models import SubtitleTrack
+
+cli = AppGroup('subtitles', help='Manage generated captions.')
+# Keys whose captions were looked for on disk and not found
+missing_cache = Cache('missing_captions', ttl=300, maxsize=10000)
+
+LANGUAGE_NAMES = {'en': 'English', 'es': 'Spanish', 'ja': 'Japanese', 'fr': 'French', 'de': 'German',
+                  'hi': 'Hindi', 'it': 'Italian', 'pt': 'Portuguese', 'zh': 'Chinese'}
+
+
+# What a translation's <lang> looks like in <key>.<lang>.vtt; anything else after a dot is part of the key
+LANGUAGE_CODE = re.compile(r'^[a-z]{2,3}(-[A-Za-z0-9]+)?$')
+
+
+def language_name(code):
+    return LANGUAGE_NAMES.get(code, code.capitalize())
+
+
+def tracks_for(key):
+    """Every track of `key`, the original first."""
+    return (SubtitleTrack.query.filter_by(key=key)
+            .order_by(SubtitleTrack.is_original.desc(), SubtitleTrack.lang).all())
+
+
+def original_track(key):
+    return SubtitleTrack.query.filter_by(key=key, is_original=True).first()
+
+
+def has_track(key, lang):
+    return db.session.query(SubtitleTrack.id).filter_by(key=key, lang=lang).first() is not None
+
+
+def record_track(key, lang, filename, is_original, label=None):
+    """Adds or updates the manifest row for a caption file. The caller commits."""
+    values = {'key': key, 'lang': lang, 'filename': filename, 'is_original': is_original,
+              'label': label or language_name(lang)}
+    if is_original:
+        # A re-transcription may detect another language; there is only one original per video
+        SubtitleTrack.query.filter(SubtitleTrack.key == key, SubtitleTrack.is_original,
+                                   SubtitleTrack.lang != lang).delete(synchronize_session=False)
+    dialect = db.session.get_bind().dialect.name
+    if dialect in ('sqlite', 'postgresql'):
+        insert = sqlite.insert if dialect == 'sqlite' else postgresql.insert
+        db.session.execute(insert(SubtitleTrack).values(**values).on_conflict_do_nothing())
+    elif SubtitleTrack.query.filter_by(key=key, lang=lang).first() is None:
+        db.session.add(SubtitleTrack(**values))
+        db.session.flush()
+    (SubtitleTrack.query.filter_by(key=key, lang=lang)
+     .update({'filename': filename, 'is_original': is_original, 'label': values['label']},
+             synchronize_session=False))
+
+
+def read_metadata(key):
+    """(language code, language name) from an original track's .json, defaulting to English."""
+    try:
+        with open(os.path.join(media.subtitles_dir(), f'{key}.json'), encoding='utf-8') as f:
+            metadata = json.load(f)
+        return metadata.get('language_code', 'en'), metadata.get('language_name', 'English')
+    except (IOError, json.JSONDecodeError):
+        return 'en', 'English'
+
+
+def classify(names):
+    """
+    Sorts caption file names into (key, lang, filename) triples, lang None for
+    an original. <prefix>.<lang>.vtt is a translation only if <prefix>.vtt
+    exists too, so keys may contain dots (e.g. lecture_1.2 from lecture_1.2.mp4).
+    """
+    names = set(names)
+    tracks = []
+    for name in sorted(names):
+        if not name.endswith('.vtt') or name.startswith('.'):
+            continue
+        stem = name[:-len('.vtt')]
+        prefix, _, lang = stem.rpartition('.')
+        if prefix and LANGUAGE_CODE.match(lang) and f'{prefix}.vtt' in names:
+            tracks.append((prefix, lang, name))
+        else:
+            tracks.append((stem, None, name))
+    return tracks
+
+
+def discover(key):
+    """
+    Records the tracks of a key that has no rows once its captions are
+    complete, i.e. its .json (written after the .vtt) exists. A miss is
+    cached, so the files are looked for at most once per missing_cache TTL.
+    Returns its tracks, original first; the caller commits if there are any.
+    """
+    if missing_cache.get(key):
+        return []
+    store = media.subtitles_dir()
+    if not (os.path.exists(os.path.join(store, f'{key}.json')) and os.path.exists(os.path.join(store, f'{key}.vtt'))):
+        missing_cache.set(key, True)
+        return []
+    lang, label = read_metadata(key)
+    record_track(key, lang, f'{key}.vtt', True, label)
+    if lang != 'en' and os.path.exists(os.path.join(store, f'{key}.en.vtt')):
+        record_track(key, 'en', f'{key}.en.vtt', False)
+    return tracks_for(key)
+
+
+def index_store():
+    """Records a manifest row for every caption file in the store and drops rows whose file is gone."""
+    store = media.subtitles_dir()
+    names = set(os.listdir(store)) if os.path.isdir(store) else set()
+    tracks = classify(names)
+    originals = {}
+    for key, lang, filename in tracks:
+        if lang is None:
+            originals[key], label = read_metadata(key)
+            record_track(key, originals[key], filename, True, label)
+    recorded = len(originals)
+    for key, lang, filename in tracks:
+        # A translation into the original's own language would replace the original's row
+        if lang is not None and lang != originals.get(key):
+            record_track(key, lang, filename, False)
+            recorded += 1
+    removed = 0
+    for track in SubtitleTrack.query.all():
+        if track.filename not in names:
+            db.session.delete(track)
+            removed += 1
+    db.session.commit()
+    return recorded, removed
+
+
+@cli.command('index')
+def index_command():
+    """Rebuild the subtitle manifest from the files in the subtitle store."""
+    recorded, removed = index_store()
+    click.echo(f'Indexed {recorded} track(s); removed {removed} stale row(s).')
@@ -0,0 +1,113 @@
+"""
+Automatic captions for stored videos.
+
+Attaching a video to a course queues a 'transcribe' job keyed by the blob's
+hash unless its captions already exist, so re-uploads and videos shared by
+several courses are transcribed once. The job runs the same Whisper pipeline
+as process_video.py inside `flask jobs worker` (which then needs ffmpeg and
+openai-whisper installed), writes <hash>.vtt, .srt, .cues.json and .json
+into the subtitle store, records the track in the manifest (app.subtitles)
+and queues the English translation (app.translation) if the video is in
+another language. A long video is transcribed in chunks and its .vtt
+grows as they finish, so students see the captions so far;
+TRANSCRIBE_WORKERS above 1 transcribes the chunks in parallel. The model is loaded on the first job and kept for the
+life of the worker process.
+"""
+import os
+import shutil
+import tempfile
+import threading
+
+import click
+from flask import current_app
+
+from app import db, jobs, media, metrics, subtitles, translation
+from app.models import Job, MediaBlob
+
+_transcriber = None
+# One transcription at a time per process; TRANSCRIBE_WORKERS parallelises within a video
+_lock = threading.Lock()
+
+
+def status(sha256):
+    """The transcribe job's state for a video ('queued', 'running', 'done', 'failed'), or None."""
+    return db.session.query(Job.state).filter_by(kind='transcribe', key=sha256).scalar()
+
+
+@media.on_attach
+def request_transcription(blob):
+    """Queues captions for a newly attached video that has none yet."""
+    if subtitles.original_track(blob.sha256) is None:
+        jobs.enqueue('transcribe', blob.sha256)
+
+
+def _get_transcriber():
+    global _transcriber
+    if _transcriber is None:
+        # The captioning pipeline lives beside the app so it can also run standalone in Docker
+        import process_video
+        _transcriber = process_video.Transcriber(current_app.config['TRANSCRIBE_MODEL'],
+                                                 workers=current_app.config['TRANSCRIBE_WORKERS'])
+    return _transcriber
+
+
+def partial_track(sha256):
+    """The .vtt of a first transcription that is still running, or None."""
+    name = f'{sha256}.vtt'
+    if status(sha256) == 'running' and os.path.exists(os.path.join(media.subtitles_dir(), name)):
+        return name
+    return None
+
+
+@jobs.handler('transcribe')
+def transcribe_job(job):
+    blob = db.session.get(MediaBlob, job.key)
+    if blob is None:
+        return None  # garbage-collected since it was queued
+    source = media.blob_path(blob.sha256, blob.ext)
+    store = media.subtitles_dir()
+    os.makedirs(store, exist_ok=True)
+    # A first transcription writes into the store, where its .vtt grows as chunks finish and course
+    # pages show it (partial_track); the .json, written last, and the manifest row publish it.
+    # A re-run is staged beside the store so the published track stays whole until it is replaced.
+    in_place = subtitles.original_track(blob.sha256) is None
+    output = store if in_place else tempfile.mkdtemp(prefix='.transcribe-', dir=store)
+    # The pipeline names its output after the source file, which is the hash
+    suffixes = ('.json', '.srt', '.cues.json', '.vtt')
+    try:
+        with _lock:
+            transcriber = _get_transcriber()
+            timings = transcriber.process(source, output)
+        if not in_place:
+            for suffix in suffixes:
+                os.replace(os.path.join(output, blob.sha256 + suffix), os.path.join(store, blob.sha256 + suffix))
+    except Exception:
+        if in_place:
+            for suffix in suffixes:
+                if os.path.exists(os.path.join(store, blob.sha256 + suffix)):
+                    os.remove(os.path.join(store, blob.sha256 + suffix))
+        raise
+    finally:
+        if not in_place:
+            shutil.rmtree(output, ignore_errors=True)
+    for step, seconds in timings.items():
+        metrics.observe(f'transcribe.{step}', seconds)
+    lang, label = subtitles.read_metadata(blob.sha256)
+    subtitles.record_track(blob.sha256, lang, f'{blob.sha256}.vtt', True, label)
+    if lang != 'en':
+        translation.request_track(blob.sha256, 'en')
+    return {step: round(seconds, 3) for step, seconds in timings.items()}
+
+
+@subtitles.cli.command('generate')
+@click.option('--force', is_flag=True, help='Transcribe again even where captions exist.')
+def generate_command(force):
+    """Queue transcription for stored videos that have no captions."""
+    queued = 0
+    in_use = db.session.query(MediaBlob.sha256).filter(MediaBlob.refcount > 0)
+    for (sha256,) in in_use:
+        if force or subtitles.original_track(sha256) is None:
+            jobs.enqueue('transcribe', sha256, force=force)
+            queued += 1
+    db.session.commit()
+    click.echo(f'Queued {queued} video(s); run `flask jobs worker --kind transcribe` to process them.')
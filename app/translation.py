@@ -0,0 +1,265 @@
+"""
+Subtitle translation, precomputed in the background.
+
+A 'translate' job is keyed by '<subtitle key>:<target language>', so however
+many students open a course before its English track exists, the translation
+runs once (single flight) and the result is written with an atomic rename.
+Jobs are queued when a transcription finishes and, for captions that predate
+that, by the first page view that finds the track missing. The page renders
+at once and polls `student.course_subtitles` until the track is ready.
+TRANSLATION_API_URL points at MyMemory or any stand-in speaking its API.
+
+Translated lines are kept in a TranslationMemory shared by all videos, so
+only lines never seen before for a language pair are sent to the service,
+packed into requests of at most TRANSLATION_MAX_BATCH_BYTES.
+"""
+import hashlib
+import json
+import os
+import tempfile
+import unicodedata
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+import click
+import requests
+from flask import current_app
+from sqlalchemy import func
+from sqlalchemy.dialects import postgresql, sqlite
+
+from app import db, jobs, media, metrics, subtitles
+from app.models import Job, SubtitleTrack, TranslationMemory
+
+# A failed translation is not requested again by page views for this long
+RETRY_SECONDS = 300
+# Joins the lines of one request; the reply is split on it again
+SEPARATOR = ' ||| '
+
+
+def init_app(app):
+    metrics.gauge('translation.memory.entries', lambda: db.session.query(func.count(TranslationMemory.id)).scalar())
+    metrics.gauge('translation.memory.hit_rate', hit_rate)
+
+
+def hit_rate():
+    """Share of lines translated by this process that the memory already knew."""
+    hits, misses = metrics.value('translation.memory.hits'), metrics.value('translation.memory.misses')
+    return round(hits / (hits + misses), 3) if hits + misses else None
+
+
+def job_key(key, to_lang):
+    return f'{key}:{to_lang}'
+
+
+def track_path(key, lang=None):
+    """The original track (lang=None) or a translation of it in the subtitle store."""
+    return os.path.join(media.subtitles_dir(), f'{key}.{lang}.vtt' if lang else f'{key}.vtt')
+
+
+def source_language(key):
+    """The original track's language code, defaulting to English."""
+    track = subtitles.original_track(key)
+    return track.lang if track else subtitles.read_metadata(key)[0]
+
+
+def status(key, to_lang):
+    return db.session.query(Job.state).filter_by(kind='translate', key=job_key(key, to_lang)).scalar()
+
+
+def request_track(key, to_lang='en'):
+    """
+    Queues a translation of `key`'s track unless one is queued, running, done,
+    or failed within RETRY_SECONDS. Returns True if the track is still to come.
+    The caller commits.
+    """
+    job = Job.query.filter_by(kind='translate', key=job_key(key, to_lang)).first()
+    if job is not None and job.state in ('queued', 'running'):
+        return True
+    if job is not None and job.state == 'failed':
+        if job.finished_at and job.finished_at > datetime.utcnow() - timedelta(seconds=RETRY_SECONDS):
+            return False
+    if job is not None and job.state == 'done' and subtitles.has_track(key, to_lang):
+        return False
+    jobs.enqueue('translate', job_key(key, to_lang), force=True)
+    return True
+
+
+def normalize(text):
+    """The form a line is remembered under: NFC with runs of whitespace collapsed."""
+    return ' '.join(unicodedata.normalize('NFC', text).split())
+
+
+def _hash(text):
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+def pack_batches(texts, max_bytes):
+    """
+    Groups texts, in order, into batches whose joined UTF-8 size stays within
+    `max_bytes`. A text that is too long on its own is sent alone.
+    """
+    separator = len(SEPARATOR.encode('utf-8'))
+    batches, batch, size = [], [], 0
+    for text in texts:
+        length = len(text.encode('utf-8'))
+        if batch and size + separator + length > max_bytes:
+            batches.append(batch)
+            batch, size = [], 0
+        size += (separator if batch else 0) + length
+        batch.append(text)
+    if batch:
+        batches.append(batch)
+    return batches
+
+
+def _request_batch(session, settings, texts, lang_pair):
+    """Returns the batch's translations in order, or None if the reply does not line up with it."""
+    url, timeout = settings
+    response = session.get(url, params={'q': SEPARATOR.join(texts), 'langpair': lang_pair}, timeout=timeout)
+    response.raise_for_status()
+    data = response.json()
+    if data['responseStatus'] != 200:
+        raise ValueError(data.get('responseDetails'))
+    parts = data['responseData']['translatedText'].split(SEPARATOR.strip())
+    return [part.strip() for part in parts] if len(parts) == len(texts) else None
+
+
+def _translate_batch(session, settings, logger, texts, lang_pair):
+    """Returns {text: translation} for the batch, falling back to one line per request if it came back misaligned."""
+    try:
+        parts = _request_batch(session, settings, texts, lang_pair)
+    except (requests.exceptions.RequestException, ValueError, KeyError) as e:
+        logger.warning('Translation API call failed: %s', e)
+        return {}
+    if parts is not None:
+        return dict(zip(texts, parts))
+    if len(texts) == 1:
+        return {}
+    translated = {}
+    for text in texts:
+        translated.update(_translate_batch(session, settings, logger, [text], lang_pair))
+    return translated
+
+
+def translate_lines(texts, from_lang, to_lang):
+    """
+    Translates normalised lines through the translation memory. Only lines
+    it has never seen for this language pair are sent, packed into batches of
+    at most TRANSLATION_MAX_BATCH_BYTES; new translations are saved (and
+    committed) even if other batches fail. Returns ({text: translation}, stats).
+    """
+    config = current_app.config
+    lang_pair = f'{from_lang}|{to_lang}'
+    unique = list(dict.fromkeys(texts))
+    hashes = {_hash(text): text for text in unique}
+    translated = {}
+    keys = list(hashes)
+    for start in range(0, len(keys), 500):
+        rows = (db.session.query(TranslationMemory.source_hash, TranslationMemory.translated_text)
+                .filter(TranslationMemory.lang_pair == lang_pair,
+                        TranslationMemory.source_hash.in_(keys[start:start + 500])))
+        translated.update((hashes[source_hash], text) for source_hash, text in rows)
+    hits = len(translated)
+    misses = [text for text in unique if text not in translated]
+
+    batches = pack_batches(misses, config['TRANSLATION_MAX_BATCH_BYTES'])
+    fresh = {}
+    if batches:
+        settings = (config['TRANSLATION_API_URL'], config['TRANSLATION_TIMEOUT'])
+        logger = current_app.logger
+        with requests.Session() as session, \
+                ThreadPoolExecutor(max_workers=config['TRANSLATION_CONCURRENCY']) as pool:
+            for result in pool.map(lambda batch: _translate_batch(session, settings, logger, batch, lang_pair), batches):
+                fresh.update(result)
+    if fresh:
+        values = [{'lang_pair': lang_pair, 'source_hash': _hash(text), 'source_text': text,
+                   'translated_text': translation, 'created_at': datetime.utcnow()}
+                  for text, translation in fresh.items()]
+        dialect = db.session.get_bind().dialect.name
+        if dialect in ('sqlite', 'postgresql'):
+            insert = sqlite.insert if dialect == 'sqlite' else postgresql.insert
+            db.session.execute(insert(TranslationMemory).on_conflict_do_nothing(), values)
+        else:
+            for value in values:
+                if not TranslationMemory.query.filter_by(lang_pair=lang_pair, source_hash=value['source_hash']).first():
+                    db.session.add(TranslationMemory(**value))
+        db.session.commit()
+        translated.update(fresh)
+
+    metrics.incr('translation.memory.hits', hits)
+    metrics.incr('translation.memory.misses', len(misses))
+    stats = {'lines': len(texts), 'unique': len(unique), 'hits': hits, 'misses': len(misses),
+             'requests': len(batches), 'failed': len(misses) - len(fresh)}
+    return translated, stats
+
+
+def translate_vtt(vtt_content, from_lang, to_lang='en'):
+    """
+    Translates the text lines of a VTT file, keeping every other line as is.
+    Returns (content, stats); content is None if any line could not be translated.
+    """
+    lines = vtt_content.strip().split('\n')
+    positions = [i for i, line in enumerate(lines) if line.strip() and '-->' not in line and 'WEBVTT' not in line]
+    if not positions:
+        return None, {'lines': 0}
+    texts = [normalize(lines[i]) for i in positions]
+    translated, stats = translate_lines(texts, from_lang, to_lang)
+    if stats['failed']:
+        return None, stats
+    # Rebuilt by position, so repeated lines each keep their own place
+    for i, text in zip(positions, texts):
+        lines[i] = translated[text]
+    return '\n'.join(lines), stats
+
+
+def translate_vtt_content(vtt_content, from_lang, to_lang='en'):
+    """Translates the text portions of a VTT file. Returns None on failure."""
+    return translate_vtt(vtt_content, from_lang, to_lang)[0]
+
+
+@jobs.handler('translate')
+def translate_job(job):
+    key, to_lang = job.key.rsplit(':', 1)
+    from_lang = source_language(key)
+    with open(track_path(key), encoding='utf-8') as f:
+        vtt_content = f.read()
+    translated, stats = translate_vtt(vtt_content, from_lang, to_lang)
+    if translated is None:
+        raise RuntimeError(f'translation {from_lang}->{to_lang} failed: {stats}')
+    # Written under a temporary name and renamed, so a viewer never loads half a track
+    fd, temp = tempfile.mkstemp(prefix='.translate-', dir=media.subtitles_dir())
+    with os.fdopen(fd, 'w', encoding='utf-8') as f:
+        f.write(translated)
+    os.replace(temp, track_path(key, to_lang))
+    subtitles.record_track(key, to_lang, os.path.basename(track_path(key, to_lang)), False)
+    return dict(stats, **{'from': from_lang, 'to': to_lang})
+
+
+@subtitles.cli.command('translate')
+@click.option('--lang', 'to_lang', default='en', show_default=True, help='Target language.')
+def translate_command(to_lang):
+    """Queue translations for caption tracks that lack one."""
+    queued = 0
+    for track in SubtitleTrack.query.filter_by(is_original=True).filter(SubtitleTrack.lang != to_lang):
+        if not subtitles.has_track(track.key, to_lang):
+            jobs.enqueue('translate', job_key(track.key, to_lang), force=True)
+            queued += 1
+    db.session.commit()
+    click.echo(f'Queued {queued} translation(s).')
+
+
+@subtitles.cli.command('memory')
+def memory_command():
+    """Show translation memory size and its hit rate over recent translations."""
+    for lang_pair, count in (db.session.query(TranslationMemory.lang_pair, func.count(TranslationMemory.id))
+                             .group_by(TranslationMemory.lang_pair).order_by(TranslationMemory.lang_pair)):
+        click.echo(f'{lang_pair:10} {count} line(s)')
+    hits = misses = 0
+    recent = (Job.query.filter_by(kind='translate', state='done').filter(Job.result.isnot(None))
+              .order_by(Job.finished_at.desc()).limit(100).all())
+    for job in recent:
+        summary = json.loads(job.result)
+        hits += summary.get('hits', 0)
+        misses += summary.get('misses', 0)
+    if hits + misses:
+        click.echo(f'hit rate over the last {len(recent)} translation(s): {hits / (hits + misses):.1%}')
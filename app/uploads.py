@@ -0,0 +1,220 @@
+"""
+Chunked, resumable video uploads.
+
+A client opens an UploadSession, then PUTs the file in order as raw chunks
+with `Content-Range: bytes start-end/total` and an `X-Chunk-SHA256` digest.
+Each chunk is streamed from the request body straight into a partial file
+beside the final upload location (no multipart spooling), verified, and
+folded into a running SHA-256 of the whole file. After a dropped connection
+the client asks for the session's offset and carries on from there. The last
+chunk hands the file to the media store (app.media) and creates or updates
+the course.
+"""
+import hashlib
+import os
+import threading
+import uuid
+from datetime import datetime, timedelta
+
+import click
+from flask import current_app
+from flask.cli import AppGroup
+from werkzeug.http import parse_content_range_header
+from werkzeug.utils import secure_filename
+
+from app import db, catalog, media, search
+from app.models import Course, UploadSession
+
+cli = AppGroup('uploads', help='Manage resumable upload sessions.')
+
+READ_SIZE = 1 << 20
+
+# Whole-file hash state for sessions this process is receiving: id -> (offset, hasher).
+# Another worker (or a restart) rebuilds it from the partial file on demand.
+_hashers = {}
+_lock = threading.Lock()
+
+
+class UploadError(Exception):
+    """A rejected upload request; `status` is the HTTP status to answer with."""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+def partial_path(session):
+    return media.incoming_path(session.id)
+
+
+def describe(session):
+    """The JSON view of a session that the uploader uses to resume."""
+    return {
+        'id': session.id,
+        'offset': session.received,
+        'size': session.size,
+        'status': session.status,
+        'chunk_size': current_app.config['UPLOAD_CHUNK_SIZE'],
+        'sha256': session.sha256,
+        'course_id': session.course_id,
+    }
+
+
+def start(teacher, filename, size, course=None, title=None, description=None, price=None, sha256=None):
+    """
+    Validates a new upload and reserves its partial file. If the client sends
+    the file's SHA-256 and this teacher already has that exact video stored,
+    the session completes at once without any bytes being sent. The caller
+    commits.
+    """
+    name = secure_filename(filename or '')
+    if not name:
+        raise UploadError('A file name is required.')
+    try:
+        size = int(size)
+        price = float(price) if price not in (None, '') else None
+    except (TypeError, ValueError):
+        raise UploadError('size and price must be numbers.')
+    if size <= 0:
+        raise UploadError('size must be positive.')
+    if size > current_app.config['UPLOAD_MAX_SIZE']:
+        raise UploadError('File is too large.', 413)
+    if course is None and not (title and description and price is not None):
+        raise UploadError('title, description and price are required for a new course.')
+
+    session = UploadSession(
+        id=uuid.uuid4().hex,
+        teacher_id=teacher.id,
+        course_id=course.id if course else None,
+        filename=name,
+        size=size,
+        received=0,
+        title=title or None,
+        description=description or None,
+        price=price,
+    )
+    db.session.add(session)
+    # Only the teacher's own videos can be claimed by hash: knowing a hash must
+    # not grant access to someone else's content. Other duplicates are caught
+    # after upload, in media.ingest, and still cost no extra storage.
+    existing = media.owned_blob(teacher.id, (sha256 or '').lower(), size) if sha256 else None
+    if existing is not None:
+        session.received = size
+        _complete(session, existing)
+        return session
+    os.makedirs(os.path.dirname(partial_path(session)), exist_ok=True)
+    open(partial_path(session), 'wb').close()
+    return session
+
+
+def _hasher_at(session, offset):
+    """Returns a SHA-256 over the first `offset` bytes of the partial file."""
+    with _lock:
+        entry = _hashers.get(session.id)
+    if entry is not None and entry[0] == offset:
+        return entry[1].copy()
+    hasher = hashlib.sha256()
+    with open(partial_path(session), 'rb') as f:
+        remaining = offset
+        while remaining:
+            block = f.read(min(READ_SIZE, remaining))
+            if not block:
+                break
+            hasher.update(block)
+            remaining -= len(block)
+    return hasher
+
+
+def append_chunk(session, content_range, chunk_sha256, stream):
+    """
+    Streams one chunk from `stream` into the session's partial file and
+    commits the new offset; the final chunk completes the upload. Raises
+    UploadError (after discarding the chunk) if it is out of order,
+    truncated or fails its checksum.
+    """
+    if session.status != 'uploading':
+        raise UploadError('This upload is already complete.', 409)
+    byte_range = parse_content_range_header(content_range)
+    if byte_range is None or byte_range.units != 'bytes' or byte_range.length != session.size:
+        raise UploadError(f'Content-Range must be "bytes <start>-<end>/{session.size}".')
+    if byte_range.start != session.received:
+        raise UploadError(f'Expected a chunk starting at byte {session.received}.', 409)
+    length = byte_range.stop - byte_range.start
+    if length > current_app.config['UPLOAD_CHUNK_SIZE']:
+        raise UploadError('Chunk is larger than the session chunk size.', 413)
+    expected = (chunk_sha256 or '').strip().lower()
+    if len(expected) != 64:
+        raise UploadError('X-Chunk-SHA256 must be the hex SHA-256 of the chunk.')
+
+    file_hasher = _hasher_at(session, byte_range.start)
+    chunk_hasher = hashlib.sha256()
+    written = 0
+    with open(partial_path(session), 'r+b') as f:
+        f.seek(byte_range.start)
+        while written < length:
+            block = stream.read(min(READ_SIZE, length - written))
+            if not block:
+                break
+            f.write(block)
+            chunk_hasher.update(block)
+            file_hasher.update(block)
+            written += len(block)
+        if written != length or chunk_hasher.hexdigest() != expected:
+            f.truncate(byte_range.start)
+            raise UploadError('Chunk was truncated or failed its checksum; resend it.', 422)
+        f.truncate()
+
+    # Only one request may advance the offset past this chunk
+    advanced = (UploadSession.query
+                .filter_by(id=session.id, received=byte_range.start)
+                .update({'received': byte_range.stop, 'updated_at': datetime.utcnow()},
+                        synchronize_session=False))
+    if not advanced:
+        db.session.rollback()
+        raise UploadError('Another request already wrote this chunk.', 409)
+    session.received = byte_range.stop
+    if byte_range.stop == session.size:
+        with _lock:
+            _hashers.pop(session.id, None)
+        blob = media.ingest(partial_path(session), file_hasher.hexdigest(), session.size,
+                            media.extension(session.filename))
+        _complete(session, blob)
+    else:
+        with _lock:
+            _hashers[session.id] = (byte_range.stop, file_hasher)
+    db.session.commit()
+
+
+def _complete(session, blob):
+    """Applies the stored video to the session's course, creating the course if needed."""
+    course = db.session.get(Course, session.course_id) if session.course_id else None
+    if course is None:
+        course = Course(teacher_id=session.teacher_id, title=session.title,
+                        description=session.description, price=session.price)
+        db.session.add(course)
+    else:
+        course.title = session.title or course.title
+        course.description = session.description or course.description
+        if session.price is not None:
+            course.price = session.price
+    media.attach(course, blob)
+    db.session.flush()
+    session.course_id = course.id
+    session.status = 'complete'
+    session.sha256 = blob.sha256
+    search.index_course(course)
+    catalog.bump_version()
+
+
+@cli.command('purge')
+@click.option('--hours', default=48, show_default=True, help='Idle time after which an unfinished upload is dropped.')
+def purge_command(hours):
+    """Delete unfinished uploads that have not received a chunk recently."""
+    cutoff = datetime.utcnow() - timedelta(hours=hours)
+    stale = UploadSession.query.filter(UploadSession.status == 'uploading', UploadSession.updated_at < cutoff).all()
+    for session in stale:
+        if os.path.exists(partial_path(session)):
+            os.remove(partial_path(session))
+        db.session.delete(session)
+    db.session.commit()
+    click.echo(f'Removed {len(stale)} stale upload(s).')
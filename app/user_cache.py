@@ -0,0 +1,54 @@
+"""
+Identity cache behind the Flask-Login user loader.
+
+`load_user` runs on every authenticated request, so the user's profile columns
+are cached (never the password hash) and turned back into a session-attached
+User without a query. Any update or delete of a User row invalidates the entry,
+both at flush time and again after commit, so a concurrent request cannot
+re-cache the old row in between.
+"""
+from sqlalchemy import event
+from sqlalchemy.orm import object_session, make_transient_to_detached
+
+from app import db
+from app.cache import Cache
+from app.models import User
+
+user_cache = Cache('user', ttl=300, maxsize=10000)
+
+CACHED_FIELDS = ('id', 'username', 'email', 'role')
+
+
+def load_user(user_id):
+    """Returns the User for a session's user id, from the cache when possible."""
+    data = user_cache.get(user_id)
+    if data is not None:
+        # merge(load=False) attaches the instance to the session without a SELECT;
+        # uncached columns (password) and relationships still lazy-load on access
+        user = User(**data)
+        make_transient_to_detached(user)
+        return db.session.merge(user, load=False)
+    user = db.session.get(User, int(user_id))
+    if user is not None:
+        user_cache.set(user_id, {field: getattr(user, field) for field in CACHED_FIELDS})
+    return user
+
+
+def invalidate_user(user_id):
+    """Drops a user's cached identity; call after changing a password, role or profile outside the ORM."""
+    user_cache.delete(user_id)
+
+
+@event.listens_for(User, 'after_update')
+@event.listens_for(User, 'after_delete')
+def _user_changed(mapper, connection, target):
+    invalidate_user(target.id)
+    session = object_session(target)
+    if session is not None:
+        session.info.setdefault('changed_user_ids', set()).add(target.id)
+
+
+@event.listens_for(db.session, 'after_commit')
+def _invalidate_committed(session):
+    for user_id in session.info.pop('changed_user_ids', ()):
+        invalidate_user(user_id)
@@ -0,0 +1,102 @@
+"""
+Seeds a throwaway SQLite database, renders /admin/dashboard and reports the
+number of SQL statements it issued and how long it took.
+
+The dashboard must issue the same, small number of queries regardless of the
+size of the tables, so the script renders it at two sizes and fails if the
+query count grows.
+
+Usage: python benchmarks/admin_dashboard.py [--small 100] [--large 20000]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+MAX_QUERIES = 10
+
+
+def seed(db, models, rollups, n_transactions):
+    """Bulk-inserts teachers, students, courses, purchases and transactions."""
+    n_teachers = max(1, n_transactions // 200)
+    n_students = max(1, n_transactions // 5)
+    # Enough courses that every purchase can be a distinct (student, course) pair
+    n_courses = max(1, n_transactions // 50, -(-n_transactions // n_students))
+    users = [{'username': 'admin', 'email': 'admin@example.com', 'password': 'x', 'role': 'admin'}]
+    users += [{'username': f't{i}', 'email': f't{i}@example.com', 'password': 'x', 'role': 'teacher'} for i in range(n_teachers)]
+    users += [{'username': f's{i}', 'email': f's{i}@example.com', 'password': 'x', 'role': 'student'} for i in range(n_students)]
+    db.session.execute(models.User.__table__.insert(), users)
+    db.session.execute(models.Course.__table__.insert(), [
+        {'title': f'Course {i}', 'description': 'd', 'price': 100.0, 'teacher_id': 2 + i % n_teachers}
+        for i in range(n_courses)
+    ])
+    first_student = 2 + n_teachers
+    # Walks the student x course grid, as uq_purchase_student_course allows one purchase per pair
+    db.session.execute(models.Purchase.__table__.insert(), [
+        {'student_id': first_student + i % n_students, 'course_id': 1 + i // n_students, 'amount': 100.0}
+        for i in range(n_transactions)
+    ])
+    db.session.execute(models.Transaction.__table__.insert(), [
+        {'purchase_id': i + 1, 'teacher_amount': 90.0, 'admin_amount': 10.0, 'status': 'paid'}
+        for i in range(n_transactions)
+    ])
+    db.session.commit()
+    rollups.rebuild()
+
+
+def measure(n_transactions):
+    """Renders the admin dashboard against a fresh database of the given size."""
+    from sqlalchemy import event
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(tmp, 'bench.db')
+        from app import create_app, db
+        from app import models, rollups
+
+        app = create_app()
+        with app.app_context():
+            db.create_all()
+            seed(db, models, rollups, n_transactions)
+            admin = models.User.query.filter_by(role='admin').first()
+
+            statements = []
+            listener = lambda conn, cursor, statement, *args: statements.append(statement)
+            client = app.test_client()
+            with client.session_transaction() as sess:
+                sess['_user_id'] = str(admin.id)
+                sess['_fresh'] = True
+
+            event.listen(db.engine, 'before_cursor_execute', listener)
+            start = time.perf_counter()
+            response = client.get('/admin/dashboard')
+            elapsed = time.perf_counter() - start
+            event.remove(db.engine, 'before_cursor_execute', listener)
+            db.session.remove()
+            db.engine.dispose()
+
+    assert response.status_code == 200, response.status_code
+    return len(statements), elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--small', type=int, default=100)
+    parser.add_argument('--large', type=int, default=20000)
+    args = parser.parse_args()
+
+    results = {size: measure(size) for size in (args.small, args.large)}
+    for size, (queries, elapsed) in results.items():
+        print(f"{size:>8} transactions: {queries:>3} queries, {elapsed * 1000:8.1f} ms")
+
+    counts = {queries for queries, _ in results.values()}
+    if len(counts) != 1 or max(counts) > MAX_QUERIES:
+        print(f"FAIL: query count must be constant and <= {MAX_QUERIES}")
+        sys.exit(1)
+    print("OK: query count is independent of table size")
+
+
+if __name__ == '__main__':
+    main()
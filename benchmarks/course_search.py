@@ -0,0 +1,105 @@
+"""
+Seeds a throwaway SQLite catalog of --courses courses with generated titles
+and descriptions, builds course_fts and times search.search() (ranking,
+one page of ids and loading those courses) for several kinds of query:
+a rare word, a common word, two words, a prefix as typed, and a deep page.
+Reports p50/p95/p99 per kind, next to an unranked LIKE query over the same
+columns for scale; LIKE stops at the first page of matches, so it is cheap
+for common words and scans the whole table for rare ones.
+
+Usage: python benchmarks/course_search.py [--courses 100000] [--repeat 300]
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import text
+
+SUBJECTS = ['algebra', 'calculus', 'geometry', 'statistics', 'physics', 'chemistry', 'biology', 'history',
+            'economics', 'python', 'javascript', 'databases', 'networks', 'design', 'marketing', 'finance',
+            'photography', 'music', 'spanish', 'japanese', 'writing', 'philosophy', 'astronomy', 'robotics']
+LEVELS = ['introduction to', 'advanced', 'practical', 'foundations of', 'applied', 'a crash course in']
+FILLER = ('learn the core ideas with worked examples exercises and projects for beginners and '
+          'professionals covering theory practice tools and techniques step by step').split()
+
+
+def seed(conn, courses, rng):
+    # A long tail of rarer topic words on top of the common subjects
+    topics = SUBJECTS + [f'topic{i}' for i in range(5000)]
+    weights = [50] * len(SUBJECTS) + [1] * 5000
+    conn.execute(text("INSERT INTO user (id, username, email, password, role) VALUES (1, 't', 't@example.com', 'x', 'teacher')"))
+    rows = []
+    for i in range(1, courses + 1):
+        subject, other = rng.choices(topics, weights, k=2)
+        rows.append({'id': i, 'title': f'{rng.choice(LEVELS)} {subject}'.capitalize(),
+                     'description': ' '.join(rng.sample(FILLER, 12) + [other, subject])})
+    conn.execute(text('INSERT INTO course (id, title, description, price, teacher_id) '
+                      'VALUES (:id, :title, :description, 100, 1)'), rows)
+
+
+def percentiles(samples):
+    ordered = sorted(samples)
+    pick = lambda q: ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000
+    return pick(0.50), pick(0.95), pick(0.99)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--courses', type=int, default=100000)
+    parser.add_argument('--repeat', type=int, default=300)
+    args = parser.parse_args()
+    rng = random.Random(0)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(tmp, 'bench.db')
+        from app import create_app, db, search
+
+        app = create_app()
+        with app.app_context():
+            db.create_all()
+            start = time.perf_counter()
+            seed(db.session, args.courses, rng)
+            db.session.commit()
+            seeded_s = time.perf_counter() - start
+            start = time.perf_counter()
+            search.rebuild()
+            indexed_s = time.perf_counter() - start
+            print(f"{args.courses} courses seeded in {seeded_s:.1f}s, course_fts built in {indexed_s:.1f}s")
+
+            kinds = {
+                'rare word': lambda: (f'topic{rng.randrange(5000)}', 1),
+                'common word': lambda: (rng.choice(SUBJECTS), 1),
+                'two words': lambda: (f'{rng.choice(SUBJECTS)} {rng.choice(FILLER)}', 1),
+                'prefix as typed': lambda: (rng.choice(SUBJECTS)[:4], 1),
+                'page 10, common word': lambda: (rng.choice(SUBJECTS), 10),
+            }
+            print(f"{'query':22} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}  (unranked LIKE p50 ms)")
+            for name, make in kinds.items():
+                samples, like_samples, hits = [], [], 0
+                for i in range(args.repeat):
+                    query, page = make()
+                    started = time.perf_counter()
+                    courses, _ = search.search(query, page)
+                    samples.append(time.perf_counter() - started)
+                    hits += bool(courses)
+                    if i < 20:
+                        started = time.perf_counter()
+                        db.session.execute(text(
+                            'SELECT id FROM course WHERE title LIKE :q OR description LIKE :q LIMIT 21 OFFSET :offset'),
+                            {'q': f'%{query.split()[0]}%', 'offset': (page - 1) * 20}).all()
+                        like_samples.append(time.perf_counter() - started)
+                p50, p95, p99 = percentiles(samples)
+                print(f"{name:22} {p50:8.2f} {p95:8.2f} {p99:8.2f}  ({statistics.median(like_samples) * 1000:.2f}; "
+                      f"{hits}/{args.repeat} queries matched)")
+            db.session.remove()
+            db.engine.dispose()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,124 @@
+"""
+Seeds a large throwaway SQLite database and shows the query plan and timing of
+each hot lookup path with and without the secondary indexes declared on the
+models (migration c4e81d3f5a27).
+
+Usage: python benchmarks/index_benchmark.py [--purchases 500000] [--repeat 200]
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine, text
+
+from app import db
+from app import models  # noqa: F401  (registers the tables on db.metadata)
+
+# name -> (SQL, parameter factory)
+QUERIES = {
+    'purchase by (student, course)': (
+        'SELECT id FROM purchase WHERE student_id = :s AND course_id = :c',
+        lambda n: {'s': random.randint(1, n['students']), 'c': random.randint(1, n['courses'])}),
+    'courses by teacher': (
+        'SELECT id, title FROM course WHERE teacher_id = :t ORDER BY id DESC LIMIT 20',
+        lambda n: {'t': random.randint(1, n['teachers'])}),
+    'read exception lookup': (
+        'SELECT 1 FROM announcement_read WHERE user_id = :u AND announcement_id = :a',
+        lambda n: {'u': random.randint(1, n['students']), 'a': random.randint(1, n['announcements'])}),
+    'latest announcements': (
+        'SELECT id FROM announcement ORDER BY timestamp DESC LIMIT 20',
+        lambda n: {}),
+    'support keyset page': (
+        'SELECT id FROM support_message ORDER BY timestamp DESC, id DESC LIMIT 20',
+        lambda n: {}),
+    'transaction by purchase': (
+        'SELECT id FROM "transaction" WHERE purchase_id = :p',
+        lambda n: {'p': random.randint(1, n['purchases'])}),
+    'users by role keyset page': (
+        "SELECT id FROM user WHERE role = 'teacher' AND id < :before ORDER BY id DESC LIMIT 20",
+        lambda n: {'before': random.randint(1, n['users'])}),
+}
+
+
+def seed(conn, n):
+    """Bulk-inserts synthetic rows sized from `n`."""
+    rows = lambda stmt, params: conn.execute(text(stmt), params)
+    rows('INSERT INTO user (id, username, email, password, role) VALUES (:id, :u, :e, :p, :r)', [
+        {'id': i, 'u': f'user{i}', 'e': f'user{i}@example.com', 'p': 'x',
+         'r': 'teacher' if i <= n['teachers'] else 'student'}
+        for i in range(1, n['users'] + 1)])
+    rows('INSERT INTO course (id, title, description, price, teacher_id) VALUES (:id, :t, :d, 100, :teacher)', [
+        {'id': i, 't': f'Course {i}', 'd': 'description', 'teacher': 1 + i % n['teachers']}
+        for i in range(1, n['courses'] + 1)])
+    pairs = set()
+    while len(pairs) < n['purchases']:
+        pairs.add((random.randint(n['teachers'] + 1, n['users']), random.randint(1, n['courses'])))
+    rows("INSERT INTO purchase (student_id, course_id, amount, timestamp) VALUES (:s, :c, 100, '2026-01-01 00:00:00')",
+         [{'s': s, 'c': c} for s, c in pairs])
+    rows("INSERT INTO \"transaction\" (purchase_id, teacher_amount, admin_amount, status) VALUES (:p, 90, 10, 'paid')",
+         [{'p': i} for i in range(1, n['purchases'] + 1)])
+    rows("INSERT INTO announcement (title, content, timestamp) VALUES ('t', 'c', datetime('2026-01-01', :m || ' minutes'))",
+         [{'m': i} for i in range(n['announcements'])])
+    reads = {(random.randint(1, n['users']), random.randint(1, n['announcements'])) for _ in range(n['purchases'] // 2)}
+    rows('INSERT INTO announcement_read (user_id, announcement_id) VALUES (:u, :a)',
+         [{'u': u, 'a': a} for u, a in reads])
+    rows("INSERT INTO support_message (user_id, subject, message, timestamp) VALUES (:u, 's', 'm', datetime('2026-01-01', :m || ' minutes'))",
+         [{'u': random.randint(1, n['users']), 'm': i} for i in range(n['purchases'] // 5)])
+
+
+def run(conn, n, repeat):
+    """Returns {query name: (plan, mean ms)} for the current set of indexes."""
+    results = {}
+    for name, (sql, params) in QUERIES.items():
+        plan = ' / '.join(row[-1] for row in conn.execute(text('EXPLAIN QUERY PLAN ' + sql), params(n)))
+        start = time.perf_counter()
+        for _ in range(repeat):
+            conn.execute(text(sql), params(n)).fetchall()
+        results[name] = (plan, (time.perf_counter() - start) * 1000 / repeat)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--purchases', type=int, default=500000)
+    parser.add_argument('--repeat', type=int, default=200)
+    args = parser.parse_args()
+    random.seed(1)
+    n = {'purchases': args.purchases, 'users': max(100, args.purchases // 5), 'teachers': max(10, args.purchases // 500),
+         'courses': max(50, args.purchases // 50), 'announcements': 2000}
+    n['students'] = n['users']
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine('sqlite:///' + os.path.join(tmp, 'bench.db'))
+        db.metadata.create_all(engine)
+        indexes = [index for table in db.metadata.sorted_tables for index in table.indexes]
+        with engine.begin() as conn:
+            for index in indexes:
+                index.drop(conn)
+            print(f"Seeding {n['purchases']} purchases ...")
+            seed(conn, n)
+            conn.execute(text('ANALYZE'))
+        with engine.connect() as conn:
+            before = run(conn, n, args.repeat)
+        with engine.begin() as conn:
+            for index in indexes:
+                index.create(conn)
+            conn.execute(text('ANALYZE'))
+        with engine.connect() as conn:
+            after = run(conn, n, args.repeat)
+        engine.dispose()
+
+    for name in QUERIES:
+        (plan_before, ms_before), (plan_after, ms_after) = before[name], after[name]
+        print(f"\n{name}")
+        print(f"  before: {ms_before:8.3f} ms  {plan_before}")
+        print(f"  after:  {ms_after:8.3f} ms  {plan_after}")
+
+
+if __name__ == '__main__':
+    main()
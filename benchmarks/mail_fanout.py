@@ -0,0 +1,137 @@
+"""
+Schedules a live class for a course with many enrolled students against a local
+SMTP sink, then drains the queue with the mail worker. Reports how long the
+HTTP request took, how long delivery took, and how many SMTP connections the
+sink saw: each worker thread should open one connection per batch, not one per
+message. Use --fail-every to make the sink reject every Nth recipient with a
+4xx so the retry path is exercised.
+
+Usage: python benchmarks/mail_fanout.py [--students 5000] [--threads 4] [--rate 0] [--fail-every 0]
+"""
+import argparse
+import os
+import socketserver
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+class SinkHandler(socketserver.StreamRequestHandler):
+    """Speaks just enough SMTP for smtplib: EHLO, MAIL, RCPT, DATA, RSET, NOOP, QUIT."""
+    disable_nagle_algorithm = True
+    connections = 0
+    messages = 0
+    recipients = 0
+    fail_every = 0
+    lock = threading.Lock()
+
+    def reply(self, line):
+        self.wfile.write(line.encode() + b'\r\n')
+
+    def handle(self):
+        cls = type(self)
+        with cls.lock:
+            cls.connections += 1
+        self.reply('220 sink ready')
+        rejected = False
+        for raw in self.rfile:
+            command = raw.decode(errors='replace').strip().upper()
+            if command.startswith(('EHLO', 'HELO')):
+                self.reply('250 sink')
+            elif command.startswith('MAIL'):
+                rejected = False
+                self.reply('250 OK')
+            elif command.startswith('RCPT'):
+                with cls.lock:
+                    cls.recipients += 1
+                    rejected = bool(cls.fail_every) and cls.recipients % cls.fail_every == 0
+                self.reply('451 try again later' if rejected else '250 OK')
+            elif command == 'DATA':
+                self.reply('354 end with <CRLF>.<CRLF>')
+                for line in self.rfile:
+                    if line in (b'.\r\n', b'.\n'):
+                        break
+                if not rejected:
+                    with cls.lock:
+                        cls.messages += 1
+                self.reply('250 queued')
+            elif command in ('RSET', 'NOOP'):
+                self.reply('250 OK')
+            elif command == 'QUIT':
+                self.reply('221 bye')
+                return
+            else:
+                self.reply('502 not implemented')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--students', type=int, default=5000)
+    parser.add_argument('--threads', type=int, default=4)
+    parser.add_argument('--rate', type=float, default=0, help='MAIL_RATE_LIMIT, 0 = unlimited')
+    parser.add_argument('--fail-every', type=int, default=0)
+    args = parser.parse_args()
+
+    SinkHandler.fail_every = args.fail_every
+    server = socketserver.ThreadingTCPServer(('127.0.0.1', 0), SinkHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(tmp, 'bench.db')
+        os.environ['MAIL_SERVER'] = '127.0.0.1'
+        os.environ['MAIL_PORT'] = str(server.server_address[1])
+        os.environ['MAIL_USE_TLS'] = 'false'
+        os.environ['MAIL_RATE_LIMIT'] = str(args.rate)
+        os.environ['MAIL_RETRY_BACKOFF'] = '0'
+        from app import create_app, db, mailer
+        from app.models import User, Course, Purchase, MailJob
+
+        app = create_app()
+        with app.app_context():
+            db.create_all()
+            teacher = User(username='t', email='t@example.com', password='x', role='teacher')
+            db.session.add(teacher)
+            db.session.commit()
+            course = Course(title='Popular', description='d', price=0, teacher_id=teacher.id)
+            db.session.add(course)
+            db.session.commit()
+            db.session.execute(User.__table__.insert(), [
+                {'username': f's{i}', 'email': f's{i}@example.com', 'password': 'x', 'role': 'student'}
+                for i in range(args.students)])
+            student_ids = [uid for (uid,) in db.session.query(User.id).filter_by(role='student')]
+            db.session.execute(Purchase.__table__.insert(), [
+                {'student_id': sid, 'course_id': course.id, 'amount': 0.0} for sid in student_ids])
+            db.session.commit()
+            teacher_id, course_id = teacher.id, course.id
+
+        client = app.test_client()
+        with client.session_transaction() as sess:
+            sess['_user_id'] = str(teacher_id)
+            sess['_fresh'] = True
+        start = time.perf_counter()
+        client.post(f'/course/{course_id}/schedule', data={
+            'title': 'Review', 'class_time': '2026-11-01T18:00', 'meeting_link': 'https://meet.example.com/x'})
+        request_s = time.perf_counter() - start
+
+        start = time.perf_counter()
+        sent = mailer.run_worker(app, threads=args.threads, once=True)
+        deliver_s = time.perf_counter() - start
+        with app.app_context():
+            live_class_id = db.session.query(MailJob.live_class_id).limit(1).scalar()
+            progress = mailer.delivery_progress(live_class_id)
+            db.engine.dispose()
+
+    server.shutdown()
+    print(f"schedule request: {request_s * 1000:.0f} ms for {args.students} students")
+    print(f"delivery: {sent} sent in {deliver_s:.2f}s with {args.threads} thread(s) "
+          f"({sent / deliver_s if deliver_s else 0:.0f} msg/s)")
+    print(f"sink saw {SinkHandler.messages} message(s) over {SinkHandler.connections} SMTP connection(s)")
+    print(f"progress: {progress}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,114 @@
+"""
+Runs /student/create_order against a local stub of the Razorpay orders API and
+reports gateway latency (from app.metrics) and how many TCP connections the
+stub saw. With the shared pooled client, N checkouts should reuse a single
+kept-alive connection. Use --fail-every to make the stub return 503 for every
+Nth request: order creation is a POST, so those failures surface to the
+caller instead of being retried into duplicate orders.
+
+Usage: python benchmarks/payment_gateway.py [--orders 200] [--latency-ms 20] [--fail-every 0]
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+class StubGateway(BaseHTTPRequestHandler):
+    """Implements just enough of POST /v1/orders for create_order."""
+    protocol_version = 'HTTP/1.1'  # keep-alive
+    disable_nagle_algorithm = True
+    wbufsize = -1  # send headers and body in one segment
+    connections = set()
+    requests = 0
+    latency = 0.0
+    fail_every = 0
+
+    def do_POST(self):
+        cls = type(self)
+        cls.connections.add(self.client_address)
+        cls.requests += 1
+        body = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+        time.sleep(cls.latency)
+        if cls.fail_every and cls.requests % cls.fail_every == 0:
+            self._reply(503, {'error': {'code': 'SERVER_ERROR', 'description': 'stub outage'}})
+        elif self.path.rstrip('/') == '/v1/orders':
+            self._reply(200, {'id': f'order_stub{cls.requests}', 'amount': body.get('amount'),
+                              'currency': body.get('currency'), 'receipt': body.get('receipt')})
+        else:
+            self._reply(404, {'error': {'code': 'BAD_REQUEST_ERROR', 'description': 'not stubbed'}})
+
+    def _reply(self, status, payload):
+        data = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--orders', type=int, default=200)
+    parser.add_argument('--latency-ms', type=float, default=20)
+    parser.add_argument('--fail-every', type=int, default=0)
+    args = parser.parse_args()
+
+    StubGateway.latency = args.latency_ms / 1000
+    StubGateway.fail_every = args.fail_every
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StubGateway)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(tmp, 'bench.db')
+        os.environ['RAZORPAY_BASE_URL'] = f'http://127.0.0.1:{server.server_address[1]}'
+        os.environ.setdefault('RAZORPAY_KEY_ID', 'rzp_test_stub')
+        os.environ.setdefault('RAZORPAY_KEY_SECRET', 'stub_secret')
+        os.environ['RAZORPAY_BACKOFF'] = '0.01'
+        from app import create_app, db, metrics
+        from app.models import User, Course
+
+        app = create_app()
+        with app.app_context():
+            db.create_all()
+            teacher = User(username='t', email='t@example.com', password='x', role='teacher')
+            student = User(username='s', email='s@example.com', password='x', role='student')
+            db.session.add_all([teacher, student])
+            db.session.commit()
+            course = Course(title='Paid', description='d', price=499, teacher_id=teacher.id)
+            db.session.add(course)
+            db.session.commit()
+            student_id, course_id = student.id, course.id
+
+        client = app.test_client()
+        with client.session_transaction() as sess:
+            sess['_user_id'] = str(student_id)
+            sess['_fresh'] = True
+        failures = 0
+        start = time.perf_counter()
+        for _ in range(args.orders):
+            if client.post('/student/create_order', json={'course_id': course_id}).status_code != 200:
+                failures += 1
+        elapsed = time.perf_counter() - start
+        with app.app_context():
+            db.engine.dispose()
+
+    server.shutdown()
+    timer = metrics.snapshot()['timers'].get('razorpay.post.orders', {})
+    print(f"{args.orders} checkouts in {elapsed:.2f}s, {failures} failed")
+    print(f"stub saw {StubGateway.requests} HTTP requests over {len(StubGateway.connections)} TCP connection(s)")
+    print(f"gateway latency: mean {timer.get('mean_ms', 0):.1f} ms, p50 {timer.get('p50_ms', 0):.1f} ms, "
+          f"p99 {timer.get('p99_ms', 0):.1f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,112 @@
+"""
+Writes the captions of a synthetic multi-hour transcript two ways: the old
+create_vtt_content, which concatenated one string with += and wrote it once
+transcription had finished, and SubtitleWriter, which appends each chunk's
+cues to .vtt, .srt and .cues.json as they arrive. Reports time and peak
+memory for each and when the first cues reach the disk, and checks the
+streamed .vtt against create_vtt_content. No audio or model is involved;
+importing process_video still needs openai-whisper.
+
+Usage: python benchmarks/subtitle_writer.py [--hours 1 4 12] [--cue-seconds 3] [--chunk-seconds 300]
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import process_video
+
+WORDS = ('the', 'integral', 'of', 'a', 'function', 'is', 'área', 'bajo', 'la', 'curva', 'derivada', 'límite')
+
+
+def segments_for(hours, cue_seconds, seed=0):
+    rng = random.Random(seed)
+    start = 0.0
+    segments = []
+    while start < hours * 3600:
+        length = cue_seconds * rng.uniform(0.5, 1.5)
+        segments.append({'start': start, 'end': start + length,
+                         'text': ' ' + ' '.join(rng.choice(WORDS) for _ in range(rng.randint(4, 14)))})
+        start += length + rng.uniform(0.0, 0.5)
+    return segments
+
+
+def old_vtt(segments):
+    """create_vtt_content as it was: one string grown with +=."""
+    vtt_content = "WEBVTT\n\n"
+    for segment in segments:
+        start = process_video.format_timestamp(segment['start'])
+        end = process_video.format_timestamp(segment['end'])
+        text = segment['text'].strip()
+        vtt_content += f"{start} --> {end}\n{text}\n\n"
+    return vtt_content
+
+
+def measure(fn):
+    """(seconds, peak bytes); timed without tracemalloc, which slows allocation down."""
+    start = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - start
+    tracemalloc.start()
+    fn()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return elapsed, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--hours', type=float, nargs='+', default=[1, 4, 12])
+    parser.add_argument('--cue-seconds', type=float, default=3.0)
+    parser.add_argument('--chunk-seconds', type=float, default=300.0)
+    args = parser.parse_args()
+
+    for hours in args.hours:
+        segments = segments_for(hours, args.cue_seconds)
+        # What Transcriber.stream yields with a pool: one list of segments per chunk
+        batches, batch, boundary = [], [], args.chunk_seconds
+        for segment in segments:
+            if segment['start'] >= boundary:
+                batches.append(batch)
+                batch, boundary = [], boundary + args.chunk_seconds
+            batch.append(segment)
+        batches.append(batch)
+
+        with tempfile.TemporaryDirectory() as tmp:
+            old_path = os.path.join(tmp, 'old.vtt')
+
+            def run_old():
+                content = old_vtt(segments)
+                with open(old_path, 'w', encoding='utf-8') as f:
+                    f.write(content)
+
+            def run_new():
+                with process_video.SubtitleWriter(tmp, 'new') as writer:
+                    for batch in batches:
+                        writer.write(batch)
+
+            old_s, old_peak = measure(run_old)
+            new_s, new_peak = measure(run_new)
+            with open(os.path.join(tmp, 'new.vtt'), encoding='utf-8') as f:
+                same = f.read() == process_video.create_vtt_content({'segments': segments})
+            with open(os.path.join(tmp, 'new.cues.json'), encoding='utf-8') as f:
+                cues = len(json.load(f))
+            sizes = {fmt: os.path.getsize(os.path.join(tmp, f'new.{fmt}')) / 1e6
+                     for fmt in process_video.SubtitleWriter.FORMATS}
+
+        print(f"{hours:g} h, {len(segments)} cues in {len(batches)} chunk(s):")
+        print(f"  += string, .vtt only:        {old_s * 1000:8.1f} ms, peak {old_peak / 1e6:6.1f} MB")
+        print(f"  SubtitleWriter, 3 formats:   {new_s * 1000:8.1f} ms, peak {new_peak / 1e6:6.1f} MB "
+              f"({', '.join(f'{fmt} {size:.1f} MB' for fmt, size in sizes.items())})")
+        print(f"  first cues on disk after chunk 1 of {len(batches)} (was: after all of them); "
+              f"same .vtt: {same}; cue index entries: {cues}")
+
+
+if __name__ == '__main__':
+    main()
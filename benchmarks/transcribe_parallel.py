@@ -0,0 +1,67 @@
+"""
+Transcribes one video twice with Whisper: once in a single pass on one
+process, once cut at silences into chunks transcribed by a process pool.
+Reports wall-clock time for each (model loading excluded), the speed-up, and
+how closely the chunked output matches: detected language, segment count,
+word-level similarity of the text and the last timestamp. Needs ffmpeg and
+openai-whisper, as in the captioning Docker image.
+
+Usage: python benchmarks/transcribe_parallel.py VIDEO [--model base] [--workers 4] [--chunk-seconds 300]
+"""
+import argparse
+import difflib
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import process_video
+
+
+def timed(transcriber, audio):
+    start = time.perf_counter()
+    result = transcriber.transcribe(audio)
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('video')
+    parser.add_argument('--model', default='base')
+    parser.add_argument('--workers', type=int, default=max(2, (os.cpu_count() or 2) // 2))
+    parser.add_argument('--chunk-seconds', type=float, default=300.0)
+    args = parser.parse_args()
+
+    audio = process_video.load_audio(args.video)
+    duration = len(audio) / process_video.SAMPLE_RATE
+    chunks = process_video.split_at_silences(audio, args.chunk_seconds)
+    print(f"audio: {duration / 60:.1f} min, {len(chunks)} chunk(s) of ~{args.chunk_seconds:.0f}s at silences")
+
+    single = process_video.Transcriber(args.model)
+    single_result, single_s = timed(single, audio)
+    single.close()
+
+    parallel = process_video.Transcriber(args.model, workers=args.workers, chunk_seconds=args.chunk_seconds)
+    parallel_result, parallel_s = timed(parallel, audio)
+    parallel.close()
+
+    single_words = ' '.join(s['text'] for s in single_result['segments']).lower().split()
+    parallel_words = ' '.join(s['text'] for s in parallel_result['segments']).lower().split()
+    similarity = difflib.SequenceMatcher(None, single_words, parallel_words, autojunk=False).ratio()
+
+    def last_end(result):
+        return result['segments'][-1]['end'] if result['segments'] else 0.0
+
+    print(f"single pass: {single_s:.1f}s ({duration / single_s:.1f}x realtime), "
+          f"language {single_result['language']}, {len(single_result['segments'])} segments, "
+          f"ends at {last_end(single_result):.1f}s")
+    print(f"{args.workers} workers:   {parallel_s:.1f}s ({duration / parallel_s:.1f}x realtime), "
+          f"language {parallel_result['language']}, {len(parallel_result['segments'])} segments, "
+          f"ends at {last_end(parallel_result):.1f}s")
+    print(f"speed-up: {single_s / parallel_s:.2f}x; word similarity to single pass: {similarity:.3f} "
+          f"({len(single_words)} vs {len(parallel_words)} words)")
+
+
+if __name__ == '__main__':
+    main()
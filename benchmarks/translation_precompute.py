@@ -0,0 +1,135 @@
+"""
+Opens a course whose captions are Spanish with many students at once, against
+a local stand-in for the MyMemory API that takes --delay seconds per call.
+Reports page latency (which should not include the translation), how many
+calls reached the translation server (one batch of distinct lines, however
+many viewers), and how long the background worker took to produce the
+English track that the page then picks up from the subtitles endpoint.
+
+Usage: python benchmarks/translation_precompute.py [--viewers 20] [--delay 2] [--cues 200] [--distinct 50]
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    """Answers MyMemory-style GETs by upper-casing the text after `delay` seconds."""
+    delay = 0.0
+    calls = 0
+    lock = threading.Lock()
+
+    def do_GET(self):
+        with type(self).lock:
+            type(self).calls += 1
+        time.sleep(self.delay)
+        query = parse_qs(urlparse(self.path).query)
+        body = json.dumps({'responseStatus': 200,
+                           'responseData': {'translatedText': query.get('q', [''])[0].upper()}}).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--viewers', type=int, default=20)
+    parser.add_argument('--delay', type=float, default=2.0)
+    parser.add_argument('--cues', type=int, default=200)
+    parser.add_argument('--distinct', type=int, default=50, help='different lines among the cues')
+    args = parser.parse_args()
+
+    StandInHandler.delay = args.delay
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StandInHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(tmp, 'bench.db')
+        os.environ['TRANSLATION_API_URL'] = f'http://127.0.0.1:{server.server_address[1]}/get'
+        from app import create_app, db, jobs, media, subtitles
+        from app.models import User, Course, Purchase, Job
+
+        app = create_app()
+        key = f'bench-{uuid.uuid4().hex[:8]}'
+        with app.app_context():
+            db.create_all()
+            teacher = User(username='t', email='t@example.com', password='x', role='teacher')
+            db.session.add(teacher)
+            db.session.commit()
+            course = Course(title='Curso', description='d', price=0, teacher_id=teacher.id,
+                            video_url=f'static/uploads/{key}.mp4')
+            db.session.add(course)
+            db.session.commit()
+            db.session.execute(User.__table__.insert(), [
+                {'username': f's{i}', 'email': f's{i}@example.com', 'password': 'x', 'role': 'student'}
+                for i in range(args.viewers)])
+            student_ids = [uid for (uid,) in db.session.query(User.id).filter_by(role='student')]
+            db.session.execute(Purchase.__table__.insert(), [
+                {'student_id': sid, 'course_id': course.id, 'amount': 0.0} for sid in student_ids])
+            db.session.commit()
+            course_id = course.id
+            store = media.subtitles_dir()
+        os.makedirs(store, exist_ok=True)
+        created = [os.path.join(store, f'{key}{suffix}') for suffix in ('.vtt', '.json', '.en.vtt')]
+        with open(created[0], 'w', encoding='utf-8') as f:
+            f.write('WEBVTT\n\n' + ''.join(
+                f'0:00:{i % 60:02d}.000 --> 0:00:{i % 60:02d}.900\nfrase número {i % args.distinct}\n\n' for i in range(args.cues)))
+        with open(created[1], 'w', encoding='utf-8') as f:
+            json.dump({'language_code': 'es', 'language_name': 'Spanish'}, f)
+        with app.app_context():
+            subtitles.record_track(key, 'es', f'{key}.vtt', True, 'Spanish')
+            db.session.commit()
+
+        def view(student_id):
+            client = app.test_client()
+            with client.session_transaction() as sess:
+                sess['_user_id'] = str(student_id)
+                sess['_fresh'] = True
+            start = time.perf_counter()
+            response = client.get(f'/student/course/{course_id}')
+            return time.perf_counter() - start, response.status_code, client
+
+        try:
+            with ThreadPoolExecutor(max_workers=args.viewers) as pool:
+                views = list(pool.map(view, student_ids))
+            latencies = sorted(v[0] for v in views)
+
+            start = time.perf_counter()
+            jobs.run_worker(app, kinds=['translate'], once=True)
+            translate_s = time.perf_counter() - start
+            status = views[0][2].get(f'/student/course/{course_id}/subtitles').get_json()
+            with app.app_context():
+                summary = Job.query.filter_by(kind='translate').one().result
+        finally:
+            for path in created:
+                if os.path.exists(path):
+                    os.remove(path)
+            with app.app_context():
+                db.engine.dispose()
+
+    server.shutdown()
+    print(f"{args.viewers} concurrent first views: median {statistics.median(latencies) * 1000:.0f} ms, "
+          f"max {latencies[-1] * 1000:.0f} ms (statuses {sorted({v[1] for v in views})})")
+    print(f"translation server calls: {StandInHandler.calls} (stand-in delay {args.delay:.1f}s)")
+    print(f"background translation of {args.cues} cues: {translate_s:.2f}s; subtitles endpoint now says {status}")
+    print(f"job summary: {summary}")
+
+
+if __name__ == '__main__':
+    main()
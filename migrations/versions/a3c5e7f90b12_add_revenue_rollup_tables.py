@@ -0,0 +1,53 @@
+"""Add revenue and enrollment rollup tables
+
+Revision ID: a3c5e7f90b12
+Revises: 4eb0c6929d15
+Create Date: 2026-10-18 09:12:44.512930
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a3c5e7f90b12'
+down_revision = '4eb0c6929d15'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Existing databases start with empty rollups: run `flask rollups rebuild` after upgrading.
+    op.create_table('course_stats',
+    sa.Column('course_id', sa.Integer(), nullable=False),
+    sa.Column('revenue', sa.Float(), nullable=False),
+    sa.Column('enrollments', sa.Integer(), nullable=False),
+    sa.Column('sales', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['course_id'], ['course.id'], ),
+    sa.PrimaryKeyConstraint('course_id')
+    )
+    op.create_table('teacher_stats',
+    sa.Column('teacher_id', sa.Integer(), nullable=False),
+    sa.Column('revenue', sa.Float(), nullable=False),
+    sa.Column('earnings', sa.Float(), nullable=False),
+    sa.Column('enrollments', sa.Integer(), nullable=False),
+    sa.Column('students', sa.Integer(), nullable=False),
+    sa.Column('best_course_id', sa.Integer(), nullable=True),
+    sa.ForeignKeyConstraint(['best_course_id'], ['course.id'], ),
+    sa.ForeignKeyConstraint(['teacher_id'], ['user.id'], ),
+    sa.PrimaryKeyConstraint('teacher_id')
+    )
+    op.create_table('daily_stats',
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('revenue', sa.Float(), nullable=False),
+    sa.Column('platform_earnings', sa.Float(), nullable=False),
+    sa.Column('enrollments', sa.Integer(), nullable=False),
+    sa.Column('sales', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('day')
+    )
+
+
+def downgrade():
+    op.drop_table('daily_stats')
+    op.drop_table('teacher_stats')
+    op.drop_table('course_stats')
@@ -0,0 +1,39 @@
+"""Add full-text course search index
+
+Revision ID: a9c3e5f7b214
+Revises: f6a2d8b0c394
+Create Date: 2026-10-18 22:14:51.608342
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a9c3e5f7b214'
+down_revision = 'f6a2d8b0c394'
+branch_labels = None
+depends_on = None
+
+# The same expression as app.search.POSTGRES_DOCUMENT
+POSTGRES_DOCUMENT = ("setweight(to_tsvector('simple', coalesce(title, '')), 'A') || "
+                     "setweight(to_tsvector('simple', coalesce(description, '')), 'B')")
+
+
+def upgrade():
+    dialect = op.get_bind().dialect.name
+    if dialect == 'sqlite':
+        op.execute(sa.text("CREATE VIRTUAL TABLE course_fts USING fts5("
+                           "title, description, tokenize = 'unicode61 remove_diacritics 2')"))
+        op.execute(sa.text("INSERT INTO course_fts (rowid, title, description) "
+                           "SELECT id, coalesce(title, ''), coalesce(description, '') FROM course"))
+    elif dialect == 'postgresql':
+        op.execute(sa.text(f'CREATE INDEX ix_course_fts ON course USING GIN (({POSTGRES_DOCUMENT}))'))
+
+
+def downgrade():
+    dialect = op.get_bind().dialect.name
+    if dialect == 'sqlite':
+        op.execute(sa.text('DROP TABLE course_fts'))
+    elif dialect == 'postgresql':
+        op.execute(sa.text('DROP INDEX ix_course_fts'))
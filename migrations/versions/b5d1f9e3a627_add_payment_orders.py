@@ -0,0 +1,35 @@
+"""Add payment orders
+
+Revision ID: b5d1f9e3a627
+Revises: a9c3e5f7b214
+Create Date: 2026-10-18 22:41:07.215836
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b5d1f9e3a627'
+down_revision = 'a9c3e5f7b214'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('payment_order',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('razorpay_order_id', sa.String(length=100), nullable=False),
+    sa.Column('student_id', sa.Integer(), nullable=False),
+    sa.Column('course_id', sa.Integer(), nullable=False),
+    sa.Column('amount', sa.Integer(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['course_id'], ['course.id'], ),
+    sa.ForeignKeyConstraint(['student_id'], ['user.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('razorpay_order_id')
+    )
+
+
+def downgrade():
+    op.drop_table('payment_order')
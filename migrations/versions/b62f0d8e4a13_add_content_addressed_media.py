@@ -0,0 +1,40 @@
+"""Add content-addressed media blobs
+
+Revision ID: b62f0d8e4a13
+Revises: a81c4e9d2b57
+Create Date: 2026-10-18 18:49:05.662180
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b62f0d8e4a13'
+down_revision = 'a81c4e9d2b57'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('media_blob',
+    sa.Column('sha256', sa.String(length=64), nullable=False),
+    sa.Column('size', sa.BigInteger(), nullable=False),
+    sa.Column('ext', sa.String(length=16), nullable=False),
+    sa.Column('refcount', sa.Integer(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('sha256')
+    )
+    with op.batch_alter_table('course', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('media_sha256', sa.String(length=64), nullable=True))
+        batch_op.create_index(batch_op.f('ix_course_media_sha256'), ['media_sha256'], unique=False)
+        batch_op.create_foreign_key('fk_course_media_sha256_media_blob', 'media_blob', ['media_sha256'], ['sha256'])
+
+
+def downgrade():
+    with op.batch_alter_table('course', schema=None) as batch_op:
+        batch_op.drop_constraint('fk_course_media_sha256_media_blob', type_='foreignkey')
+        batch_op.drop_index(batch_op.f('ix_course_media_sha256'))
+        batch_op.drop_column('media_sha256')
+
+    op.drop_table('media_blob')
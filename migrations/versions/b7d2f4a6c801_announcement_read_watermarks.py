@@ -0,0 +1,65 @@
+"""Track announcement reads with a per-user watermark
+
+Revision ID: b7d2f4a6c801
+Revises: a3c5e7f90b12
+Create Date: 2026-10-18 11:03:27.184402
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b7d2f4a6c801'
+down_revision = 'a3c5e7f90b12'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('announcement_watermark',
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('read_up_to', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['user.id'], ),
+    sa.PrimaryKeyConstraint('user_id')
+    )
+
+    # Drop duplicate read rows, keeping the oldest one per (user, announcement)
+    op.execute(sa.text('''
+        DELETE FROM announcement_read
+        WHERE id NOT IN (
+            SELECT MIN(id) FROM announcement_read GROUP BY user_id, announcement_id
+        )
+    '''))
+
+    # Each reader's watermark sits just below their oldest unread announcement,
+    # or at the newest announcement if they have read everything
+    op.execute(sa.text('''
+        INSERT INTO announcement_watermark (user_id, read_up_to)
+        SELECT readers.user_id,
+               COALESCE(
+                   (SELECT MIN(a.id) - 1 FROM announcement a
+                    WHERE NOT EXISTS (SELECT 1 FROM announcement_read r
+                                      WHERE r.user_id = readers.user_id AND r.announcement_id = a.id)),
+                   (SELECT MAX(a.id) FROM announcement a),
+                   0)
+        FROM (SELECT DISTINCT user_id FROM announcement_read) AS readers
+    '''))
+
+    # Rows at or below the watermark are now implied by it
+    op.execute(sa.text('''
+        DELETE FROM announcement_read
+        WHERE announcement_id <= (SELECT w.read_up_to FROM announcement_watermark w
+                                  WHERE w.user_id = announcement_read.user_id)
+    '''))
+
+
+def downgrade():
+    # Expand each watermark back into one read row per announcement
+    op.execute(sa.text('''
+        INSERT INTO announcement_read (user_id, announcement_id)
+        SELECT w.user_id, a.id
+        FROM announcement_watermark w
+        JOIN announcement a ON a.id <= w.read_up_to
+    '''))
+    op.drop_table('announcement_watermark')
@@ -0,0 +1,47 @@
+"""Add background jobs and HLS packaging status
+
+Revision ID: c17a9e3f6b58
+Revises: b62f0d8e4a13
+Create Date: 2026-10-18 19:36:12.418903
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c17a9e3f6b58'
+down_revision = 'b62f0d8e4a13'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('job',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('kind', sa.String(length=50), nullable=False),
+    sa.Column('key', sa.String(length=200), nullable=False),
+    sa.Column('state', sa.String(length=20), nullable=False),
+    sa.Column('attempts', sa.Integer(), nullable=False),
+    sa.Column('claimed_by', sa.String(length=64), nullable=True),
+    sa.Column('error', sa.Text(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('started_at', sa.DateTime(), nullable=True),
+    sa.Column('finished_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('uq_job_kind_key', 'job', ['kind', 'key'], unique=True)
+    op.create_index('ix_job_state_kind_id', 'job', ['state', 'kind', 'id'], unique=False)
+    with op.batch_alter_table('media_blob', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('hls_status', sa.String(length=20), nullable=True))
+        batch_op.add_column(sa.Column('hls_renditions', sa.String(length=100), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('media_blob', schema=None) as batch_op:
+        batch_op.drop_column('hls_renditions')
+        batch_op.drop_column('hls_status')
+
+    op.drop_index('ix_job_state_kind_id', table_name='job')
+    op.drop_index('uq_job_kind_key', table_name='job')
+    op.drop_table('job')
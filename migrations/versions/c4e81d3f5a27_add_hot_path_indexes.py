@@ -0,0 +1,61 @@
+"""Add indexes and unique constraints for the hot lookup paths
+
+Revision ID: c4e81d3f5a27
+Revises: b7d2f4a6c801
+Create Date: 2026-10-18 13:40:09.562117
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c4e81d3f5a27'
+down_revision = 'b7d2f4a6c801'
+branch_labels = None
+depends_on = None
+
+
+def _refuse_duplicates(table, columns):
+    """Unique indexes cannot be built over duplicate rows; those need a human decision, not a silent delete."""
+    cols = ', '.join(columns)
+    duplicates = op.get_bind().execute(sa.text(
+        f'SELECT COUNT(*) FROM (SELECT {cols} FROM "{table}" GROUP BY {cols} HAVING COUNT(*) > 1) AS d'
+    )).scalar()
+    if duplicates:
+        raise RuntimeError(
+            f'{duplicates} duplicate ({cols}) group(s) in "{table}"; resolve them before running this migration.'
+        )
+
+
+def upgrade():
+    _refuse_duplicates('purchase', ['student_id', 'course_id'])
+    _refuse_duplicates('transaction', ['purchase_id'])
+    op.execute(sa.text('''
+        DELETE FROM announcement_read
+        WHERE id NOT IN (
+            SELECT MIN(id) FROM announcement_read GROUP BY user_id, announcement_id
+        )
+    '''))
+
+    op.create_index('uq_purchase_student_course', 'purchase', ['student_id', 'course_id'], unique=True)
+    op.create_index('ix_purchase_course_id', 'purchase', ['course_id'], unique=False)
+    op.create_index('ix_course_teacher_id_id', 'course', ['teacher_id', 'id'], unique=False)
+    op.create_index('uq_announcement_read_user_announcement', 'announcement_read', ['user_id', 'announcement_id'], unique=True)
+    op.create_index('ix_announcement_timestamp', 'announcement', ['timestamp'], unique=False)
+    op.create_index('ix_support_message_timestamp_id', 'support_message', ['timestamp', 'id'], unique=False)
+    op.create_index('uq_transaction_purchase_id', 'transaction', ['purchase_id'], unique=True)
+    op.create_index('ix_transaction_status_id', 'transaction', ['status', 'id'], unique=False)
+    op.create_index('ix_user_role_id', 'user', ['role', 'id'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_user_role_id', table_name='user')
+    op.drop_index('ix_transaction_status_id', table_name='transaction')
+    op.drop_index('uq_transaction_purchase_id', table_name='transaction')
+    op.drop_index('ix_support_message_timestamp_id', table_name='support_message')
+    op.drop_index('ix_announcement_timestamp', table_name='announcement')
+    op.drop_index('uq_announcement_read_user_announcement', table_name='announcement_read')
+    op.drop_index('ix_course_teacher_id_id', table_name='course')
+    op.drop_index('ix_purchase_course_id', table_name='purchase')
+    op.drop_index('uq_purchase_student_course', table_name='purchase')
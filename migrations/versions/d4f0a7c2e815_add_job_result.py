@@ -0,0 +1,26 @@
+"""Add job result summary
+
+Revision ID: d4f0a7c2e815
+Revises: c17a9e3f6b58
+Create Date: 2026-10-18 20:12:47.305116
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd4f0a7c2e815'
+down_revision = 'c17a9e3f6b58'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('job', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('result', sa.Text(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('job', schema=None) as batch_op:
+        batch_op.drop_column('result')
@@ -0,0 +1,29 @@
+"""Add cache version counters
+
+Revision ID: d9a0b6e2f413
+Revises: c4e81d3f5a27
+Create Date: 2026-10-18 15:21:52.043118
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd9a0b6e2f413'
+down_revision = 'c4e81d3f5a27'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    cache_version = op.create_table('cache_version',
+    sa.Column('name', sa.String(length=50), nullable=False),
+    sa.Column('version', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('name')
+    )
+    op.bulk_insert(cache_version, [{'name': 'catalog', 'version': 0}])
+
+
+def downgrade():
+    op.drop_table('cache_version')
@@ -0,0 +1,39 @@
+"""Add payment ledger keyed by gateway payment id
+
+Revision ID: e5f27c8d1b94
+Revises: d9a0b6e2f413
+Create Date: 2026-10-18 17:05:36.870214
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e5f27c8d1b94'
+down_revision = 'd9a0b6e2f413'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('payment',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('razorpay_payment_id', sa.String(length=100), nullable=False),
+    sa.Column('razorpay_order_id', sa.String(length=100), nullable=True),
+    sa.Column('student_id', sa.Integer(), nullable=False),
+    sa.Column('course_id', sa.Integer(), nullable=False),
+    sa.Column('purchase_id', sa.Integer(), nullable=True),
+    sa.Column('amount', sa.Float(), nullable=False),
+    sa.Column('status', sa.String(length=50), nullable=False),
+    sa.Column('timestamp', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['course_id'], ['course.id'], ),
+    sa.ForeignKeyConstraint(['purchase_id'], ['purchase.id'], ),
+    sa.ForeignKeyConstraint(['student_id'], ['user.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('razorpay_payment_id')
+    )
+
+
+def downgrade():
+    op.drop_table('payment')
@@ -0,0 +1,34 @@
+"""Add translation memory
+
+Revision ID: e83b1c5d9f27
+Revises: d4f0a7c2e815
+Create Date: 2026-10-18 20:41:08.552731
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e83b1c5d9f27'
+down_revision = 'd4f0a7c2e815'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('translation_memory',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('lang_pair', sa.String(length=20), nullable=False),
+    sa.Column('source_hash', sa.String(length=64), nullable=False),
+    sa.Column('source_text', sa.Text(), nullable=False),
+    sa.Column('translated_text', sa.Text(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('uq_translation_memory_pair_hash', 'translation_memory', ['lang_pair', 'source_hash'], unique=True)
+
+
+def downgrade():
+    op.drop_index('uq_translation_memory_pair_hash', table_name='translation_memory')
+    op.drop_table('translation_memory')
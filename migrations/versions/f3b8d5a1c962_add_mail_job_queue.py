@@ -0,0 +1,61 @@
+"""Add durable outbound mail queue
+
+Revision ID: f3b8d5a1c962
+Revises: e5f27c8d1b94
+Create Date: 2026-10-18 17:41:12.508331
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f3b8d5a1c962'
+down_revision = 'e5f27c8d1b94'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # live_class was added to the models without a migration; databases built
+    # with `flask db upgrade` alone do not have it yet.
+    if not sa.inspect(op.get_bind()).has_table('live_class'):
+        op.create_table('live_class',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('title', sa.String(length=150), nullable=False),
+        sa.Column('class_time', sa.DateTime(), nullable=False),
+        sa.Column('meeting_link', sa.String(length=300), nullable=False),
+        sa.Column('course_id', sa.Integer(), nullable=False),
+        sa.Column('teacher_id', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['course_id'], ['course.id'], ),
+        sa.ForeignKeyConstraint(['teacher_id'], ['user.id'], ),
+        sa.PrimaryKeyConstraint('id')
+        )
+    op.create_table('mail_job',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('kind', sa.String(length=50), nullable=False),
+    sa.Column('recipient', sa.String(length=150), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=True),
+    sa.Column('live_class_id', sa.Integer(), nullable=True),
+    sa.Column('subject', sa.String(length=200), nullable=True),
+    sa.Column('body', sa.Text(), nullable=True),
+    sa.Column('status', sa.String(length=20), nullable=False),
+    sa.Column('attempts', sa.Integer(), nullable=False),
+    sa.Column('next_attempt_at', sa.DateTime(), nullable=False),
+    sa.Column('claimed_by', sa.String(length=64), nullable=True),
+    sa.Column('claimed_at', sa.DateTime(), nullable=True),
+    sa.Column('sent_at', sa.DateTime(), nullable=True),
+    sa.Column('last_error', sa.Text(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['live_class_id'], ['live_class.id'], ),
+    sa.ForeignKeyConstraint(['user_id'], ['user.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_mail_job_status_next_attempt_at', 'mail_job', ['status', 'next_attempt_at', 'id'], unique=False)
+    op.create_index('uq_mail_job_live_class_user', 'mail_job', ['live_class_id', 'user_id'], unique=True)
+
+
+def downgrade():
+    op.drop_index('uq_mail_job_live_class_user', table_name='mail_job')
+    op.drop_index('ix_mail_job_status_next_attempt_at', table_name='mail_job')
+    op.drop_table('mail_job')
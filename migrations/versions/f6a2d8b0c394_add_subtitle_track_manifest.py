@@ -0,0 +1,78 @@
+"""Add subtitle track manifest
+
+Revision ID: f6a2d8b0c394
+Revises: e83b1c5d9f27
+Create Date: 2026-10-18 21:05:33.190428
+
+"""
+import json
+import os
+import re
+from datetime import datetime
+
+from alembic import op
+import sqlalchemy as sa
+from flask import current_app
+
+
+# revision identifiers, used by Alembic.
+revision = 'f6a2d8b0c394'
+down_revision = 'e83b1c5d9f27'
+branch_labels = None
+depends_on = None
+
+
+LANGUAGE_CODE = re.compile(r'^[a-z]{2,3}(-[A-Za-z0-9]+)?$')
+LANGUAGE_NAMES = {'en': 'English', 'es': 'Spanish', 'ja': 'Japanese', 'fr': 'French', 'de': 'German',
+                  'hi': 'Hindi', 'it': 'Italian', 'pt': 'Portuguese', 'zh': 'Chinese'}
+
+
+def _existing_tracks(store):
+    """Rows for the caption files already in the store, as app.subtitles.index_store records them."""
+    names = set(os.listdir(store)) if os.path.isdir(store) else set()
+    rows = []
+    for name in sorted(names):
+        if not name.endswith('.vtt') or name.startswith('.'):
+            continue
+        stem = name[:-len('.vtt')]
+        prefix, _, lang = stem.rpartition('.')
+        if prefix and LANGUAGE_CODE.match(lang) and f'{prefix}.vtt' in names:
+            key, label, is_original = prefix, LANGUAGE_NAMES.get(lang, lang.capitalize()), False
+        else:
+            key, lang, label, is_original = stem, 'en', 'English', True
+            try:
+                with open(os.path.join(store, f'{stem}.json'), encoding='utf-8') as f:
+                    metadata = json.load(f)
+                lang, label = metadata.get('language_code', 'en'), metadata.get('language_name', 'English')
+            except (IOError, ValueError):
+                pass
+        rows.append({'key': key, 'lang': lang, 'label': label, 'filename': name,
+                     'is_original': is_original, 'created_at': datetime.utcnow()})
+    # One row per (key, lang); an original wins over a translation file of the same language
+    unique = {}
+    for row in sorted(rows, key=lambda row: row['is_original']):
+        unique[(row['key'], row['lang'])] = row
+    return list(unique.values())
+
+
+def upgrade():
+    subtitle_track = op.create_table('subtitle_track',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('key', sa.String(length=200), nullable=False),
+    sa.Column('lang', sa.String(length=16), nullable=False),
+    sa.Column('label', sa.String(length=50), nullable=False),
+    sa.Column('filename', sa.String(length=255), nullable=False),
+    sa.Column('is_original', sa.Boolean(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('uq_subtitle_track_key_lang', 'subtitle_track', ['key', 'lang'], unique=True)
+    # Caption files written before the manifest existed
+    rows = _existing_tracks(os.path.join(current_app.root_path, 'static', 'subtitles'))
+    if rows:
+        op.bulk_insert(subtitle_track, rows)
+
+
+def downgrade():
+    op.drop_index('uq_subtitle_track_key_lang', table_name='subtitle_track')
+    op.drop_table('subtitle_track')
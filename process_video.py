@@ -1,70 +1,563 @@
+import argparse
+import collections
+import itertools
+import multiprocessing
 import sys
 import os
 import subprocess
+import threading
+import time
+import numpy as np
 import whisper
 import datetime
 import json
 
-def format_timestamp(seconds: float) -> str:
-    """Converts seconds to VTT timestamp format HH:MM:SS.sss"""
+SAMPLE_RATE = 16000  # what Whisper expects: 16 kHz mono
+READ_BYTES = 1 << 20
+
+def format_timestamp(seconds: float, separator: str = ".") -> str:
+    """Converts seconds to VTT timestamp format HH:MM:SS.sss (HH:MM:SS,sss for SRT)"""
     assert seconds >= 0, "non-negative timestamp required"
-    mss = f"{(seconds - int(seconds)) * 1000:03.0f}"
-    return f"{datetime.timedelta(seconds=int(seconds))}.{mss}"
+    hours, milliseconds = divmod(int(round(seconds * 1000)), 3600000)
+    minutes, milliseconds = divmod(milliseconds, 60000)
+    return f"{hours:02d}:{minutes:02d}:{milliseconds // 1000:02d}{separator}{milliseconds % 1000:03d}"
+
+def cue_text(segment: dict) -> str:
+    """A segment's text as one cue: no blank lines, which would end it early, and no '-->'."""
+    return "\n".join(line.strip() for line in segment['text'].replace("-->", "->").splitlines() if line.strip())
 
 def create_vtt_content(result: dict) -> str:
     """Formats the Whisper transcription result into VTT content."""
-    vtt_content = "WEBVTT\n\n"
-    for segment in result["segments"]:
-        start = format_timestamp(segment['start'])
-        end = format_timestamp(segment['end'])
-        text = segment['text'].strip()
-        vtt_content += f"{start} --> {end}\n{text}\n\n"
-    return vtt_content
-
-def process_video_to_subtitle(video_path: str, output_dir: str):
+    cues = ((segment, cue_text(segment)) for segment in result["segments"])
+    return "WEBVTT\n\n" + "".join(f"{format_timestamp(segment['start'])} --> {format_timestamp(segment['end'])}\n{text}\n\n"
+                                  for segment, text in cues if text)
+
+
+class SubtitleWriter:
+    """
+    Writes <base>.vtt, <base>.srt and a compact <base>.cues.json index
+    ([[start, end, text], ...]) in one pass, appending each batch of segments
+    as it is transcribed and flushing it to disk, so the captions of a video
+    still being transcribed can already be read. Nothing is held in memory
+    but the batch being written. The JSON index is complete once closed.
+    """
+    FORMATS = ("vtt", "srt", "cues.json")
+
+    def __init__(self, output_dir: str, base_filename: str):
+        self.paths = {fmt: os.path.join(output_dir, f"{base_filename}.{fmt}") for fmt in self.FORMATS}
+        self.count = 0
+        self._files = {fmt: open(path, "w", encoding="utf-8") for fmt, path in self.paths.items()}
+        self._files["vtt"].write("WEBVTT\n\n")
+        self._files["cues.json"].write("[")
+        self.flush()
+
+    def write(self, segments: list):
+        vtt, srt, rows = [], [], []
+        for segment in segments:
+            text = cue_text(segment)
+            if not text:
+                continue
+            start, end = segment['start'], segment['end']
+            timing = f"{format_timestamp(start)} --> {format_timestamp(end)}"
+            vtt.append(f"{timing}\n{text}\n\n")
+            srt.append(f"{self.count + len(rows) + 1}\n{timing.replace('.', ',')}\n{text}\n\n")
+            rows.append([round(start, 3), round(end, 3), text])
+        if rows:
+            self._files["vtt"].write("".join(vtt))
+            self._files["srt"].write("".join(srt))
+            # One array per batch with its brackets dropped, so the entries continue the file's array
+            self._files["cues.json"].write(("," if self.count else "") + json.dumps(
+                rows, ensure_ascii=False, separators=(",", ":"))[1:-1])
+            self.count += len(rows)
+            self.flush()
+
+    def flush(self):
+        for f in self._files.values():
+            f.flush()
+
+    def close(self):
+        if self._files:
+            self._files["cues.json"].write("]\n")
+            for f in self._files.values():
+                f.close()
+            self._files = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def _open_audio(video_path: str):
+    """Starts ffmpeg decoding the audio track to raw 16-bit PCM on its stdout."""
+    command = ["ffmpeg", "-nostdin", "-v", "error", "-i", video_path, "-vn",
+               "-f", "s16le", "-acodec", "pcm_s16le", "-ar", str(SAMPLE_RATE), "-ac", "1", "-"]
+    process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    # Drain stderr alongside stdout so a chatty ffmpeg can never block on a full pipe
+    errors = collections.deque(maxlen=20)
+    drain = threading.Thread(target=lambda: errors.extend(process.stderr), daemon=True)
+    drain.start()
+    return process, errors, drain
+
+
+def _finish_audio(process, errors, drain, video_path: str):
+    process.stdout.close()
+    drain.join()
+    if process.wait() != 0:
+        message = b"".join(errors).decode(errors="replace").strip()
+        raise RuntimeError(f"ffmpeg could not decode audio from {video_path}: {message}")
+
+
+def iter_audio(video_path: str, window_seconds: float = 30.0):
+    """
+    Yields the audio as float32 arrays of `window_seconds` (the last one
+    shorter), so callers that work window by window hold only one at a time.
+    """
+    process, errors, drain = _open_audio(video_path)
+    window_bytes = int(window_seconds * SAMPLE_RATE) * 2
+    try:
+        for data in iter(lambda: process.stdout.read(window_bytes), b""):
+            yield np.frombuffer(data, np.int16).astype(np.float32) / 32768.0
+    except GeneratorExit:
+        # Stopped early: ffmpeg is killed by the closed pipe, which is not an error
+        process.kill()
+        process.stdout.close()
+        process.wait()
+        raise
+    _finish_audio(process, errors, drain, video_path)
+
+
+def load_audio(video_path: str) -> np.ndarray:
+    """
+    Decodes the whole audio track straight from ffmpeg's stdout into a float32
+    array, without a temporary file. Samples are buffered as 16-bit while
+    reading and converted once at the end (6 bytes per sample at peak, about
+    350 MB per hour of audio). Transcriber.process streams the track through
+    iter_audio instead; this is for callers that need all of it at once.
+    """
+    process, errors, drain = _open_audio(video_path)
+    pcm = bytearray()
+    for block in iter(lambda: process.stdout.read(READ_BYTES), b""):
+        pcm += block
+    _finish_audio(process, errors, drain, video_path)
+    samples = np.frombuffer(pcm, np.int16).astype(np.float32)
+    samples /= 32768.0
+    return samples
+
+VIDEO_EXTENSIONS = {'.mp4', '.mkv', '.mov', '.webm', '.avi', '.m4v'}
+
+
+FRAME_SECONDS = 0.02
+SILENCE_DB = -50.0  # a chunk that never gets louder than this is skipped rather than transcribed
+PROMPT_CHARS = 800  # of one chunk's text passed on to the next; Whisper keeps its last 223 tokens
+
+# The model of a chunk worker process, loaded once by _init_chunk_worker
+_worker_model = None
+
+
+def frame_levels(audio: np.ndarray) -> np.ndarray:
+    """Loudness in dBFS of each FRAME_SECONDS frame."""
+    frame = int(SAMPLE_RATE * FRAME_SECONDS)
+    frames = audio[:len(audio) // frame * frame].reshape(-1, frame)
+    power = np.einsum('ij,ij->i', frames, frames) / frame  # without squaring a copy of the whole track
+    return 10 * np.log10(power + 1e-10)
+
+
+def _quietest_cut(audio: np.ndarray, low: int, high: int) -> int:
+    """The frame boundary in [low, high) (frame-aligned sample indexes) centred on the quietest half-second."""
+    frame = int(SAMPLE_RATE * FRAME_SECONDS)
+    half = int(0.5 / FRAME_SECONDS) // 2
+    first = max(0, low // frame - half)
+    levels = frame_levels(audio[first * frame:high + half * frame])
+    # Edge-padded, so the moving average lines up with the frames however few there are
+    smooth = np.convolve(np.pad(levels, half, mode='edge'), np.ones(2 * half + 1) / (2 * half + 1), mode='valid')
+    offset = low // frame - first
+    return low + int(np.argmin(smooth[offset:offset + (high - low) // frame])) * frame
+
+
+def iter_chunks(windows, chunk_seconds: float, search_seconds: float = 30.0):
+    """
+    Regroups a stream of audio windows (e.g. iter_audio) into (start sample,
+    audio) chunks of roughly `chunk_seconds`, each cut placed in the quietest
+    half-second within `search_seconds` of the target so no word is split
+    between chunks. At most one chunk, the search margin and one window are
+    held at a time.
+    """
+    frame = int(SAMPLE_RATE * FRAME_SECONDS)
+    per_chunk = max(1, int(chunk_seconds / FRAME_SECONDS)) * frame
+    search = min(int(search_seconds / FRAME_SECONDS), per_chunk // frame // 2) * frame  # cuts stay in order
+    # A cut waits for the quarter second after the search range, so where it lands never depends on the windows
+    lookahead = int(0.5 / FRAME_SECONDS) // 2 * frame
+    buffer, start = np.zeros(0, np.float32), 0
+    for window in itertools.chain(windows, [None]):
+        if window is not None:
+            buffer = np.concatenate((buffer, window))
+        while len(buffer) >= per_chunk + search + frame + (lookahead if window is not None else 0):
+            cut = _quietest_cut(buffer, per_chunk - search, per_chunk + search + frame)
+            yield start, buffer[:cut]
+            buffer, start = buffer[cut:], start + cut
+    if len(buffer) or not start:
+        yield start, buffer
+
+
+def split_at_silences(audio: np.ndarray, chunk_seconds: float, search_seconds: float = 30.0) -> list:
+    """Splits `audio` into the (start, end) sample ranges iter_chunks would cut it into."""
+    return [(start, start + len(chunk)) for start, chunk in iter_chunks([audio], chunk_seconds, search_seconds)]
+
+
+def _init_chunk_worker(model_name: str, threads: int, ready):
+    global _worker_model
+    import torch
+    torch.set_num_threads(threads)
+    _worker_model = whisper.load_model(model_name)
+    ready.release()
+
+
+def _is_silent(audio: np.ndarray) -> bool:
+    return len(audio) == 0 or frame_levels(audio).max(initial=-100.0) < SILENCE_DB
+
+
+def _detect_language(audio: np.ndarray, model=None) -> str:
+    """Detects the language from the first 30 seconds of speech, with the chunk worker's model by default."""
+    model = model or _worker_model
+    loud = np.flatnonzero(frame_levels(audio) > SILENCE_DB)
+    start = int(loud[0] * SAMPLE_RATE * FRAME_SECONDS) if len(loud) else 0
+    clip = whisper.pad_or_trim(audio[start:start + 30 * SAMPLE_RATE])
+    mel = whisper.log_mel_spectrogram(clip, model.dims.n_mels).to(model.device)
+    _, probs = model.detect_language(mel)
+    return max(probs, key=probs.get)
+
+
+def _transcribe_chunk(audio: np.ndarray, offset: float, language: str, prompt: str = None, model=None) -> dict:
+    """
+    Transcribes one chunk and returns its segments on the whole video's
+    timeline. `prompt` is the text before the chunk, if known.
+    """
+    model = model or _worker_model
+    if _is_silent(audio):
+        return {'language': language, 'segments': []}
+    result = model.transcribe(audio, language=language, initial_prompt=prompt, verbose=None,
+                              fp16=str(model.device) != "cpu")
+    duration = len(audio) / SAMPLE_RATE
+    segments = [{'start': offset + min(segment['start'], duration),
+                 'end': offset + min(segment['end'], duration),
+                 'text': segment['text']} for segment in result['segments']]
+    return {'language': result.get('language', language), 'segments': segments}
+
+
+class Transcriber:
+    """
+    Holds loaded Whisper models and reuses them for every video it is given.
+
+    The audio is read from ffmpeg in windows and a video longer than
+    `chunk_seconds` is cut at silences into chunks as it is read, so memory
+    holds about one chunk per worker. The language is detected once, on the
+    first chunk with any sound, and every chunk is transcribed in it; the
+    segments are stitched back together with their chunk's offset added.
+    With one worker the chunks are transcribed in order and each is prompted
+    with the end of the text before it, as a single pass conditions each
+    30-second window on the previous one. With `workers` > 1, a pool of
+    that many processes each loads the model once, splits the CPU cores
+    between them and transcribes the chunks in parallel, without prompts.
+    """
+
+    def __init__(self, model_name: str = "base", workers: int = 1, chunk_seconds: float = 300.0):
+        started = time.perf_counter()
+        self.workers = max(1, workers)
+        self.chunk_seconds = chunk_seconds
+        self.model = None
+        self.pool = None
+        if self.workers == 1:
+            self.model = whisper.load_model(model_name)
+        else:
+            # spawn, not fork: forking a process that has torch loaded can deadlock
+            context = multiprocessing.get_context("spawn")
+            ready = context.Semaphore(0)
+            threads = max(1, (os.cpu_count() or 1) // self.workers)
+            self.pool = context.Pool(self.workers, _init_chunk_worker, (model_name, threads, ready))
+            for _ in range(self.workers):  # wait until every worker has its model
+                if not ready.acquire(timeout=900):
+                    raise RuntimeError("Whisper workers did not start")
+        self.load_seconds = time.perf_counter() - started
+        print(f"Loaded Whisper model '{model_name}' in {self.load_seconds:.1f}s"
+              + (f" ({self.workers} workers)" if self.pool else ""))
+
+    def transcribe(self, audio: np.ndarray) -> dict:
+        """Returns Whisper's result dict ('language', 'segments') for 16 kHz float32 audio."""
+        if self.pool is None:
+            return self.model.transcribe(audio, verbose=False)
+        language, segments = None, []
+        for language, batch in self.stream(iter_chunks([audio], self.chunk_seconds)):
+            segments += batch
+        return {'language': language or 'en', 'segments': segments}
+
+    def stream(self, chunks):
+        """
+        Transcribes (start sample, audio) chunks, as from iter_chunks, and
+        yields (language, segments) for each in order as soon as it is done,
+        so captions can be written as they go. The language is None until a
+        chunk with any sound has been seen. A pool is given at most one chunk
+        per worker beyond the one being waited on, so memory stays bounded
+        however long the video is.
+        """
+        language, prompt, pending = None, None, collections.deque()
+        for start, audio in chunks:
+            if language is None and not _is_silent(audio):
+                language = (_detect_language(audio, self.model) if self.pool is None
+                            else self.pool.apply(_detect_language, (audio,)))
+            if self.pool is None:
+                result = _transcribe_chunk(audio, start / SAMPLE_RATE, language, prompt, self.model)
+                text = "".join(segment['text'] for segment in result['segments'])
+                prompt = text[-PROMPT_CHARS:] if text.strip() else prompt
+                yield language, result['segments']
+                continue
+            pending.append(self.pool.apply_async(_transcribe_chunk, (audio, start / SAMPLE_RATE, language)))
+            if len(pending) > self.workers:
+                yield language, pending.popleft().get()['segments']
+        while pending:
+            yield language, pending.popleft().get()['segments']
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.close()
+            self.pool.join()
+            self.pool = None
+
+    def process(self, video_path: str, output_dir: str) -> dict:
+        """Extracts audio, transcribes it, and saves .vtt/.srt/.cues.json and metadata. Returns per-step timings in seconds."""
+        timings = {}
+        started = time.perf_counter()
+        print(f"Starting processing for: {video_path}")
+        if not os.path.exists(video_path):
+            raise FileNotFoundError(f"Video file not found at {video_path}")
+
+        # Step 1: Extract audio, piped from ffmpeg window by window as the chunks need it, so concurrent runs
+        # share no files and memory holds about one chunk however long the video is
+        print("Step 1/3: Extracting audio...")
+        decoding = 0.0
+
+        def windows():
+            nonlocal decoding
+            audio = iter_audio(video_path)
+            while True:
+                read = time.perf_counter()
+                window = next(audio, None)
+                decoding += time.perf_counter() - read
+                if window is None:
+                    return
+                yield window
+
+        video_filename = os.path.basename(video_path)
+        base_filename = os.path.splitext(video_filename)[0]
+        os.makedirs(output_dir, exist_ok=True)
+
+        # Step 2: Transcribe with Whisper, appending each chunk's cues to the subtitle files as it is done
+        print("Step 2/3: Transcribing audio with Whisper...")
+        step = time.perf_counter()
+        writing = 0.0
+        language = None
+        with SubtitleWriter(output_dir, base_filename) as writer:
+            for language, segments in self.stream(iter_chunks(windows(), self.chunk_seconds)):
+                written = time.perf_counter()
+                writer.write(segments)
+                writing += time.perf_counter() - written
+        language = language or 'en'
+        timings['extract'] = decoding
+        timings['transcribe'] = time.perf_counter() - step - writing - decoding
+        print(f"✅ {writer.count} cues saved to: {', '.join(writer.paths.values())}")
+
+        # Step 3: Save Language Metadata
+        print("Step 3/3: Saving language metadata...")
+        step = time.perf_counter()
+        detected_language_code = language
+        lang_map = {'en': 'English', 'es': 'Spanish', 'ja': 'Japanese', 'fr': 'French', 'de': 'German'}
+        detected_language_name = lang_map.get(detected_language_code, detected_language_code.capitalize())
+        metadata = {'language_code': detected_language_code, 'language_name': detected_language_name}
+        metadata_path = os.path.join(output_dir, f"{base_filename}.json")
+        with open(metadata_path, "w", encoding="utf-8") as f:
+            json.dump(metadata, f, indent=2)
+        print(f"✅ Metadata saved to: {metadata_path}")
+
+        timings['write'] = writing + time.perf_counter() - step
+        timings['total'] = time.perf_counter() - started
+        print(f"\n✨ Transcription complete for {video_filename}! ({format_timings(timings)})")
+        return timings
+
+
+def format_timings(timings: dict) -> str:
+    return ", ".join(f"{step} {seconds:.1f}s" for step, seconds in timings.items())
+
+
+def process_video_to_subtitle(video_path: str, output_dir: str, transcriber: Transcriber = None):
     """Extracts audio, transcribes it, and saves it as a .vtt file."""
-    print(f"Starting processing for: {video_path}")
-    if not os.path.exists(video_path):
-        print(f"Error: Video file not found at {video_path}")
-        return
-
-    # Step 1: Extract audio
-    temp_audio_path = "temp_audio.wav"
-    ffmpeg_command = ["ffmpeg", "-i", video_path, "-vn", "-acodec", "pcm_s16le", "-ar", "16000", "-ac", "1", "-y", temp_audio_path]
-    print("Step 1/3: Extracting audio...")
-    subprocess.run(ffmpeg_command, check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-
-    # Step 2: Transcribe with Whisper
-    print("Step 2/3: Transcribing audio with Whisper...")
-    model = whisper.load_model("base")
-    result = model.transcribe(temp_audio_path, verbose=False)
-    
-    video_filename = os.path.basename(video_path)
-    base_filename = os.path.splitext(video_filename)[0]
-    os.makedirs(output_dir, exist_ok=True)
-    
-    # Step 3: Save Original VTT and Language Metadata
-    print("Step 3/3: Saving original language .vtt and metadata...")
-    vtt_content = create_vtt_content(result)
-    output_vtt_path = os.path.join(output_dir, f"{base_filename}.vtt")
-    with open(output_vtt_path, "w", encoding="utf-8") as f:
-        f.write(vtt_content)
-    print(f"✅ Subtitle file saved to: {output_vtt_path}")
-
-    detected_language_code = result.get('language', 'en')
-    lang_map = {'en': 'English', 'es': 'Spanish', 'ja': 'Japanese', 'fr': 'French', 'de': 'German'}
-    detected_language_name = lang_map.get(detected_language_code, detected_language_code.capitalize())
-    metadata = {'language_code': detected_language_code, 'language_name': detected_language_name}
-    metadata_path = os.path.join(output_dir, f"{base_filename}.json")
-    with open(metadata_path, "w", encoding="utf-8") as f:
-        json.dump(metadata, f, indent=2)
-    print(f"✅ Metadata saved to: {metadata_path}")
-
-    os.remove(temp_audio_path)
-    print(f"\n✨ Transcription complete for {video_filename}!")
+    transcriber = transcriber or Transcriber()
+    try:
+        return transcriber.process(video_path, output_dir)
+    except FileNotFoundError as e:
+        print(f"Error: {e}")
+
+
+def run_batch(transcriber: Transcriber, video_paths: list, output_dir: str, report_path: str = None) -> int:
+    """Transcribes each video in turn with the same model. Returns the number that failed."""
+    failures = 0
+    for video_path in video_paths:
+        try:
+            timings = transcriber.process(video_path, output_dir)
+            record = {'video': video_path, 'status': 'done', **timings}
+        except Exception as e:
+            failures += 1
+            print(f"❌ {video_path}: {e}")
+            record = {'video': video_path, 'status': 'failed', 'error': str(e)}
+        write_report(report_path, record)
+    print(f"Batch finished: {len(video_paths) - failures} done, {failures} failed")
+    return failures
+
+
+def write_report(report_path: str, record: dict):
+    """Appends one job's outcome and timings as a JSON line."""
+    if report_path:
+        record = {key: round(value, 3) if isinstance(value, float) else value for key, value in record.items()}
+        record['finished_at'] = datetime.datetime.now().isoformat(timespec='seconds')
+        with open(report_path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record) + "\n")
+
+
+def claim_next(inbox: str):
+    """
+    Moves the oldest video in `inbox` into inbox/processing and returns its new
+    path. The rename is atomic, so several workers can share one inbox.
+    Producers should copy files in under a dot-name and rename them when
+    complete; dot-files are ignored.
+    """
+    processing = os.path.join(inbox, "processing")
+    os.makedirs(processing, exist_ok=True)
+    candidates = []
+    for name in os.listdir(inbox):
+        path = os.path.join(inbox, name)
+        if not name.startswith('.') and os.path.splitext(name)[1].lower() in VIDEO_EXTENSIONS and os.path.isfile(path):
+            candidates.append((os.path.getmtime(path), name))
+    for _, name in sorted(candidates):
+        claimed = os.path.join(processing, name)
+        try:
+            os.rename(os.path.join(inbox, name), claimed)
+        except FileNotFoundError:
+            continue  # another worker took it
+        return claimed
+    return None
+
+
+def run_watch(transcriber: Transcriber, inbox: str, output_dir: str, poll_interval: float = 2.0,
+              once: bool = False, report_path: str = None):
+    """
+    Processes videos dropped into `inbox` back-to-back until interrupted (or,
+    with `once`, until the inbox is empty). Finished videos move to inbox/done,
+    failures to inbox/failed next to a .error file. A video left in
+    inbox/processing by a worker that was killed can be moved back to retry it.
+    """
+    print(f"Watching {inbox} for videos; subtitles go to {output_dir}")
+    for folder in ("done", "failed"):
+        os.makedirs(os.path.join(inbox, folder), exist_ok=True)
+    try:
+        while True:
+            video_path = claim_next(inbox)
+            if video_path is None:
+                if once:
+                    return
+                time.sleep(poll_interval)
+                continue
+            name = os.path.basename(video_path)
+            try:
+                timings = transcriber.process(video_path, output_dir)
+                os.replace(video_path, os.path.join(inbox, "done", name))
+                write_report(report_path, {'video': name, 'status': 'done', **timings})
+            except Exception as e:
+                print(f"❌ {name}: {e}")
+                os.replace(video_path, os.path.join(inbox, "failed", name))
+                with open(os.path.join(inbox, "failed", name + ".error"), "w", encoding="utf-8") as f:
+                    f.write(f"{type(e).__name__}: {e}\n")
+                write_report(report_path, {'video': name, 'status': 'failed', 'error': str(e)})
+    except KeyboardInterrupt:
+        print("Stopping watcher.")
+
+
+def _watch_worker(transcriber_args: tuple, *args):
+    run_watch(Transcriber(*transcriber_args), *args)
+
+
+def run_watch_pool(transcriber_args: tuple, workers: int, *args):
+    """
+    Runs `workers` watcher processes on the same inbox, each with its own
+    Transcriber. Audio is piped rather than written to disk, so they share no files.
+    """
+    processes = [multiprocessing.Process(target=_watch_worker, args=(transcriber_args,) + args, name=f"watch-{i}")
+                 for i in range(workers)]
+    for process in processes:
+        process.start()
+    try:
+        for process in processes:
+            process.join()
+    except KeyboardInterrupt:
+        for process in processes:
+            process.join()
+
+
+def positive_float(value: str) -> float:
+    number = float(value)
+    if number <= 0:
+        raise argparse.ArgumentTypeError(f"must be greater than 0, got {value}")
+    return number
+
+
+def main(argv: list) -> int:
+    parser = argparse.ArgumentParser(description="Generate subtitles for course videos with Whisper.")
+    parser.add_argument("--model", default=os.getenv("WHISPER_MODEL", "base"), help="Whisper model name (default: base)")
+    parser.add_argument("--report", help="append per-video timings to this JSON-lines file")
+    parser.add_argument("--parallel", type=int, default=int(os.getenv("TRANSCRIBE_WORKERS", 1)),
+                        help="transcribe long videos as this many chunks at once (default: 1, in order)")
+    parser.add_argument("--chunk-seconds", type=positive_float, default=300.0,
+                        help="target length of the chunks whose captions are written as each finishes (default: 300)")
+    modes = parser.add_subparsers(dest="mode", required=True)
+    one = modes.add_parser("run", help="transcribe a single video")
+    one.add_argument("video")
+    one.add_argument("output_dir")
+    batch = modes.add_parser("batch", help="transcribe several videos with one model load")
+    batch.add_argument("output_dir")
+    batch.add_argument("videos", nargs="+")
+    watch = modes.add_parser("watch", help="keep the model loaded and transcribe videos dropped into a directory")
+    watch.add_argument("inbox")
+    watch.add_argument("output_dir")
+    watch.add_argument("--poll-interval", type=float, default=2.0)
+    watch.add_argument("--once", action="store_true", help="exit when the inbox is empty")
+    watch.add_argument("--workers", type=int, default=1, help="videos to transcribe at once, one model per worker")
+
+    # Keep the original `process_video.py <video> <output_dir>` form working
+    index = 0
+    while index < len(argv) and argv[index].startswith('-'):
+        index += 2 if argv[index] in ("--model", "--report", "--parallel", "--chunk-seconds") else 1
+    if index < len(argv) and argv[index] not in modes.choices:
+        argv = argv[:index] + ["run"] + argv[index:]
+    args = parser.parse_args(argv)
+
+    transcriber_args = (args.model, args.parallel, args.chunk_seconds)
+    if args.mode == "watch" and args.workers > 1:
+        run_watch_pool(transcriber_args, args.workers, args.inbox, args.output_dir, args.poll_interval, args.once, args.report)
+        return 0
+    transcriber = Transcriber(*transcriber_args)
+    try:
+        if args.mode == "run":
+            try:
+                write_report(args.report, {'video': args.video, 'status': 'done', **transcriber.process(args.video, args.output_dir)})
+            except FileNotFoundError as e:
+                print(f"Error: {e}")
+                return 1
+            return 0
+        if args.mode == "batch":
+            return 1 if run_batch(transcriber, args.videos, args.output_dir, args.report) else 0
+        run_watch(transcriber, args.inbox, args.output_dir, args.poll_interval, args.once, args.report)
+        return 0
+    finally:
+        transcriber.close()
+
 
 if __name__ == "__main__":
-    if len(sys.argv) != 3:
-        print("Usage: python process_video.py <path_to_video> <output_directory>")
-        sys.exit(1)
-    process_video_to_subtitle(sys.argv[1], sys.argv[2])
\ No newline at end of file
+    sys.exit(main(sys.argv[1:]))
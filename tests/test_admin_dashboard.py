@@ -0,0 +1,65 @@
+"""
+/admin/dashboard must issue the same number of SQL statements however many
+purchases and transactions there are (platform_stats in app/routes/admin.py).
+"""
+import pytest
+from sqlalchemy import event
+
+from app import create_app, db, models, rollups
+
+
+def seed(n_transactions):
+    """One teacher, one admin, and n_transactions paid purchases over distinct (student, course) pairs."""
+    n_students = max(1, n_transactions // 5)
+    n_courses = -(-n_transactions // n_students)
+    users = [{'username': 'admin', 'email': 'admin@example.com', 'password': 'x', 'role': 'admin'},
+             {'username': 't', 'email': 't@example.com', 'password': 'x', 'role': 'teacher'}]
+    users += [{'username': f's{i}', 'email': f's{i}@example.com', 'password': 'x', 'role': 'student'}
+              for i in range(n_students)]
+    db.session.execute(models.User.__table__.insert(), users)
+    db.session.execute(models.Course.__table__.insert(), [
+        {'title': f'Course {i}', 'description': 'd', 'price': 100.0, 'teacher_id': 2} for i in range(n_courses)
+    ])
+    db.session.execute(models.Purchase.__table__.insert(), [
+        {'student_id': 3 + i % n_students, 'course_id': 1 + i // n_students, 'amount': 100.0}
+        for i in range(n_transactions)
+    ])
+    db.session.execute(models.Transaction.__table__.insert(), [
+        {'purchase_id': i + 1, 'teacher_amount': 90.0, 'admin_amount': 10.0, 'status': 'paid'}
+        for i in range(n_transactions)
+    ])
+    db.session.commit()
+    rollups.rebuild()
+
+
+def dashboard_statements(tmp_path, monkeypatch, n_transactions):
+    """Seeds a fresh database and returns the statements one render of /admin/dashboard issued."""
+    monkeypatch.setenv('DATABASE_URL', 'sqlite:///' + str(tmp_path / f'{n_transactions}.db'))
+    app = create_app()
+    app.config['TESTING'] = True
+    with app.app_context():
+        db.create_all()
+        seed(n_transactions)
+        client = app.test_client()
+        with client.session_transaction() as sess:
+            sess['_user_id'] = '1'
+            sess['_fresh'] = True
+
+        statements = []
+        listener = lambda conn, cursor, statement, *args: statements.append(statement)
+        event.listen(db.engine, 'before_cursor_execute', listener)
+        try:
+            response = client.get('/admin/dashboard')
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', listener)
+            db.session.remove()
+            db.engine.dispose()
+    assert response.status_code == 200
+    return statements
+
+
+@pytest.mark.parametrize('small, large', [(10, 2000)])
+def test_dashboard_query_count_does_not_grow(tmp_path, monkeypatch, small, large):
+    few = dashboard_statements(tmp_path, monkeypatch, small)
+    many = dashboard_statements(tmp_path, monkeypatch, large)
+    assert len(few) == len(many), '\n'.join(many)